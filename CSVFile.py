@@ -1,11 +1,13 @@
-import csv
+# -*- coding: utf-8 -*-
+"""
+CSVReader of sampleApp/csv_reader.py: streams rows and skips spaces after delimiter,
+so 'QuestionID, QuestionAnswer' header gives 'QuestionAnswer' column.
+"""
+import os
+import sys
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "sampleApp"))
 
-class CSVReader:
-    def __init__(self, pathToFile):
-        self.file_path = pathToFile
+import csv_reader
 
-    def read(self):
-        with open(self.file_path) as answerList:
-            reader = csv.DictReader(answerList, delimiter=',')
-            return list(reader)
\ No newline at end of file
+CSVReader = csv_reader.CSVReader
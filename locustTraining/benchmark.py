@@ -0,0 +1,289 @@
+"""
+Headless benchmark of sampleApp. For each scenario from benchmark_scenarios.yaml it seeds temporary databases
+with sampleApp/generate_data.py, starts the service on a free port, runs locustfile.py with --headless and
+collects p50/p95/p99, requests per second and failure ratio of each endpoint to benchmark_results/report.json
+and report.csv. If baseline exists, results are compared with it and exit code is 1 when any threshold is exceeded.
+
+python benchmark.py --scenario smoke
+python benchmark.py --save-baseline
+python benchmark.py --service-python ../sampleApp/.venv/bin/python
+"""
+import argparse
+import csv
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import yaml
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_APP_DIR = os.path.join(SCRIPT_DIR, os.pardir, "sampleApp")
+DEFAULT_SCENARIOS_PATH = os.path.join(SCRIPT_DIR, "benchmark_scenarios.yaml")
+DEFAULT_BASELINE_PATH = os.path.join(SCRIPT_DIR, "benchmark_baseline.json")
+DEFAULT_OUTPUT_DIR = os.path.join(SCRIPT_DIR, "benchmark_results")
+DEFAULT_THRESHOLDS = {
+    # allowed relative growth of p50/p95/p99, growth smaller than latency_slack_ms is never a regression
+    "latency_increase": 0.2,
+    "latency_slack_ms": 5,
+    # allowed relative drop of requests per second
+    "rps_decrease": 0.2,
+    # allowed growth of failure ratio (0.01 = 1 percentage point)
+    "failure_ratio_increase": 0.01,
+}
+PERCENTILE_COLUMNS = {"p50": "50%", "p95": "95%", "p99": "99%"}
+REPORT_COLUMNS = ["scenario", "endpoint", "requests", "failures", "failure_ratio", "rps", "p50", "p95", "p99"]
+AGGREGATED = "Aggregated"
+
+
+def load_yaml(file_path):
+    with open(file_path, "r") as yaml_file:
+        return yaml.safe_load(yaml_file)
+
+
+def write_yaml(file_path, data):
+    with open(file_path, "w") as yaml_file:
+        yaml.safe_dump(data, yaml_file, default_flow_style=False)
+
+
+def get_free_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+    finally:
+        sock.close()
+
+
+def prepare_event(work_dir, scenario, service_python, port):
+    """
+    Seeds databases and writes config of the service. Locust teams get IDs which have no answers in seeded data,
+    so their answers are not rejected as duplicates.
+    :return: tuple: (path of service config, path of team list used by Locust, path of question list)
+    """
+    data = scenario.get("data", {})
+    subprocess.check_call([service_python, "generate_data.py", "--output-dir", work_dir,
+                           "--teams", str(data.get("teams", 100)),
+                           "--questions", str(data.get("questions", 50)),
+                           "--bugs", str(data.get("bugs", 10000)),
+                           "--answers", str(data.get("answers", 100000)),
+                           "--seed", str(data.get("seed", 1))], cwd=SAMPLE_APP_DIR)
+
+    team_list_path = os.path.join(work_dir, "team_list.yaml")
+    load_team_list_path = os.path.join(work_dir, "load_team_list.yaml")
+    team_list = load_yaml(team_list_path)
+    load_teams = dict(("LoadTeam{0}".format(number), {"id": "LOAD{0:05d}".format(number)})
+                      for number in range(1, data.get("load_teams", 100) + 1))
+    team_list["teams"].update(load_teams)
+    write_yaml(team_list_path, team_list)
+    write_yaml(load_team_list_path, {"teams": load_teams})
+
+    settings = load_yaml(os.path.join(SAMPLE_APP_DIR, "config", "config.yaml"))
+    db_config = settings["db_config"]
+    db_config["primary_db_path"] = os.path.join(work_dir, "primary.db")
+    db_config["secondary_db_path"] = os.path.join(work_dir, "secondary.db")
+    db_config["result_db_path"] = os.path.join(work_dir, "results.db")
+    db_config["shared_state_path"] = os.path.join(work_dir, "shared.db")
+    for files_path in ("bug_files_path", "open_questions_files_path", "closed_questions_files_path"):
+        db_config[files_path] = os.path.join(work_dir, "files", files_path)
+    settings["log"]["output"] = os.path.join(work_dir, "logs")
+    service_config = settings["service_config"]
+    service_config["port"] = port
+    service_config["team_list"] = team_list_path
+    service_config["question_list"] = os.path.join(work_dir, "question_list.yaml")
+    service_config["post_delay"] = 0
+    service_config["rate_limit"]["enabled"] = False
+    service_config["server"]["debug"] = False
+    service_config["server"]["host"] = "127.0.0.1"
+    service_config["server"].update(scenario.get("server", {}))
+    config_path = os.path.join(work_dir, "config.yaml")
+    write_yaml(config_path, settings)
+    return config_path, load_team_list_path, service_config["question_list"]
+
+
+def wait_for_service(url, process, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise Exception("Service stopped with exit code {0}".format(process.returncode))
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return
+        except (OSError, ValueError):
+            pass
+        time.sleep(0.2)
+    raise Exception("Service did not start in {0} seconds: {1}".format(timeout, url))
+
+
+def stop_service(process):
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def read_locust_stats(stats_path):
+    """
+    :return: dictionary where key is endpoint ('METHOD name' or 'Aggregated') and value is its statistics
+    """
+    endpoints = dict()
+    with open(stats_path, newline="") as stats_file:
+        for row in csv.DictReader(stats_file):
+            requests = int(row["Request Count"])
+            failures = int(row["Failure Count"])
+            endpoint = AGGREGATED if row["Name"] == AGGREGATED else "{0} {1}".format(row["Type"], row["Name"])
+            stats = {"requests": requests,
+                     "failures": failures,
+                     "failure_ratio": failures / requests if requests else 0.0,
+                     "rps": float(row["Requests/s"])}
+            for name, column in PERCENTILE_COLUMNS.items():
+                stats[name] = float(row[column]) if row[column] not in ("", "N/A") else 0.0
+            endpoints[endpoint] = stats
+    return endpoints
+
+
+def run_scenario(name, scenario, service_python, locust_command, output_dir, keep_data=False):
+    """
+    :return: statistics of endpoints, see read_locust_stats
+    """
+    work_dir = tempfile.mkdtemp(prefix="benchmark_{0}_".format(name))
+    port = get_free_port()
+    service = None
+    try:
+        config_path, load_team_list_path, question_list_path = prepare_event(work_dir, scenario, service_python, port)
+        env = dict(os.environ, SAMPLEAPP_CONFIG=config_path)
+        with open(os.path.join(output_dir, "{0}_service.log".format(name)), "w") as service_log:
+            service = subprocess.Popen([service_python, "wsgi.py"], cwd=SAMPLE_APP_DIR, env=env,
+                                       stdout=service_log, stderr=subprocess.STDOUT)
+            host = "http://127.0.0.1:{0}".format(port)
+            wait_for_service(host + "/", service, scenario.get("start_timeout", 60))
+
+            env = dict(os.environ, TEAM_LIST=load_team_list_path, QUESTION_LIST=question_list_path)
+            env.update(dict((key, str(value)) for key, value in scenario.get("env", {}).items()))
+            csv_prefix = os.path.join(output_dir, name)
+            subprocess.call(locust_command + ["-f", "locustfile.py", "--headless", "--only-summary",
+                                              "--host", host,
+                                              "-u", str(scenario.get("users", 10)),
+                                              "-r", str(scenario.get("spawn_rate", 10)),
+                                              "-t", "{0}s".format(scenario.get("run_time", 60)),
+                                              "--csv", csv_prefix], cwd=SCRIPT_DIR, env=env)
+        return read_locust_stats(csv_prefix + "_stats.csv")
+    finally:
+        if service is not None:
+            stop_service(service)
+        if keep_data:
+            print("Data of scenario '{0}' kept in {1}".format(name, work_dir))
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def write_report(report, output_dir):
+    with open(os.path.join(output_dir, "report.json"), "w") as json_file:
+        json.dump(report, json_file, indent=2, sort_keys=True)
+    with open(os.path.join(output_dir, "report.csv"), "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(REPORT_COLUMNS)
+        for scenario_name in sorted(report):
+            for endpoint in sorted(report[scenario_name]):
+                stats = report[scenario_name][endpoint]
+                writer.writerow([scenario_name, endpoint] + [stats[column] for column in REPORT_COLUMNS[2:]])
+
+
+def compare(report, baseline, thresholds):
+    """
+    :return: list of regressions (texts), empty when all endpoints of baseline are within thresholds
+    """
+    regressions = list()
+    for scenario_name in sorted(report):
+        for endpoint, base in sorted(baseline.get(scenario_name, {}).items()):
+            current = report[scenario_name].get(endpoint, None)
+            if current is None:
+                regressions.append("{0} / {1}: missing in results".format(scenario_name, endpoint))
+                continue
+            for name in PERCENTILE_COLUMNS:
+                limit = max(base[name] * (1 + thresholds["latency_increase"]), base[name] + thresholds["latency_slack_ms"])
+                if current[name] > limit:
+                    regressions.append("{0} / {1}: {2} {3:.0f}ms > {4:.0f}ms (baseline {5:.0f}ms)".format(
+                        scenario_name, endpoint, name, current[name], limit, base[name]))
+            limit = base["rps"] * (1 - thresholds["rps_decrease"])
+            if current["rps"] < limit:
+                regressions.append("{0} / {1}: rps {2:.1f} < {3:.1f} (baseline {4:.1f})".format(
+                    scenario_name, endpoint, current["rps"], limit, base["rps"]))
+            limit = base["failure_ratio"] + thresholds["failure_ratio_increase"]
+            if current["failure_ratio"] > limit:
+                regressions.append("{0} / {1}: failure ratio {2:.3f} > {3:.3f} (baseline {4:.3f})".format(
+                    scenario_name, endpoint, current["failure_ratio"], limit, base["failure_ratio"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs Locust scenarios against seeded sampleApp and compares "
+                                                 "results with baseline.")
+    parser.add_argument("--scenarios", default=DEFAULT_SCENARIOS_PATH)
+    parser.add_argument("--scenario", action="append", help="name of scenario to run, all by default")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="save results as new baseline")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--service-python", default=sys.executable,
+                        help="Python with sampleApp packages, used to seed data and start service")
+    parser.add_argument("--locust-command", default="{0} -m locust".format(sys.executable))
+    parser.add_argument("--keep-data", action="store_true", help="do not remove seeded databases and logs")
+    for name, value in DEFAULT_THRESHOLDS.items():
+        parser.add_argument("--" + name.replace("_", "-"), type=float, help="default: {0}".format(value))
+    args = parser.parse_args()
+
+    config = load_yaml(args.scenarios)
+    thresholds = dict(DEFAULT_THRESHOLDS, **config.get("thresholds", {}))
+    for name in DEFAULT_THRESHOLDS:
+        if getattr(args, name) is not None:
+            thresholds[name] = getattr(args, name)
+    scenarios = config["scenarios"]
+    for name in args.scenario or ():
+        if name not in scenarios:
+            parser.error("Unknown scenario: {0}".format(name))
+    if not os.path.isdir(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    report = dict()
+    for name in args.scenario or sorted(scenarios):
+        print("Scenario '{0}'".format(name))
+        report[name] = run_scenario(name, scenarios[name], args.service_python, args.locust_command.split(),
+                                    args.output_dir, keep_data=args.keep_data)
+        aggregated = report[name].get(AGGREGATED, None)
+        if aggregated:
+            print("  {requests} requests, {rps:.1f} rps, p50 {p50:.0f}ms, p95 {p95:.0f}ms, p99 {p99:.0f}ms, "
+                  "failures {failure_ratio:.2%}".format(**aggregated))
+    write_report(report, args.output_dir)
+
+    if args.save_baseline:
+        baseline = dict()
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as baseline_file:
+                baseline = json.load(baseline_file)
+        baseline.update(report)
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+        print("Baseline saved: {0}".format(args.baseline))
+        return 0
+    if not os.path.exists(args.baseline):
+        print("No baseline: {0}, run with --save-baseline".format(args.baseline))
+        return 0
+    with open(args.baseline) as baseline_file:
+        regressions = compare(report, json.load(baseline_file), thresholds)
+    for regression in regressions:
+        print("REGRESSION " + regression)
+    print("FAIL" if regressions else "PASS")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
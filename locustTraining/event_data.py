@@ -0,0 +1,80 @@
+"""
+Teams and questions of the tested event, read from team and question lists of sampleApp.
+"""
+import collections
+import os
+import random
+
+import yaml
+
+DEFAULT_CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "sampleApp", "config")
+CLOSED_ANSWERS = ("A", "B", "C", "D")
+
+
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def env_float(name, default):
+    return float(os.environ.get(name, default))
+
+
+def load_yaml(file_path):
+    with open(file_path, "r") as yaml_file:
+        return yaml.safe_load(yaml_file)
+
+
+class EventData(object):
+    """
+    Gives each simulated team user a team ID and questions it has not answered yet, so answers are not rejected
+    as duplicates. Questions are shared by all users of the same team in this Locust process.
+    """
+    def __init__(self, team_list_path, question_list_path, correct_rate=0.5, rng=None):
+        self.rng = rng or random.Random()
+        self.correct_rate = correct_rate
+        self.team_ids = [team["id"] for team in load_yaml(team_list_path)["teams"].values()]
+        self.questions = dict((str(question["id"]), question)
+                              for question in load_yaml(question_list_path)["questions"].values())
+        self._next_team = 0
+        self._unanswered = dict()  # key is (team ID, question type), value is deque of question IDs
+
+    @classmethod
+    def from_environment(cls):
+        """
+        Paths are taken from TEAM_LIST and QUESTION_LIST or from EVENT_CONFIG_DIR (default: ../sampleApp/config).
+        """
+        config_dir = os.environ.get("EVENT_CONFIG_DIR", DEFAULT_CONFIG_DIR)
+        return cls(os.environ.get("TEAM_LIST", os.path.join(config_dir, "team_list.yaml")),
+                   os.environ.get("QUESTION_LIST", os.path.join(config_dir, "question_list.yaml")),
+                   correct_rate=env_float("CORRECT_ANSWER_RATE", 0.5))
+
+    def next_team_id(self):
+        """
+        :return: team IDs in turn, the same team is given again when there are more users than teams
+        """
+        team_id = self.team_ids[self._next_team % len(self.team_ids)]
+        self._next_team += 1
+        return team_id
+
+    def take_question(self, team_id, question_type):
+        """
+        :return: ID of question of given type (open/closed) not answered by the team yet, None if all are answered
+        """
+        key = (team_id, question_type)
+        if key not in self._unanswered:
+            question_ids = [question_id for question_id, question in self.questions.items()
+                            if question["type"] == question_type]
+            self.rng.shuffle(question_ids)
+            self._unanswered[key] = collections.deque(question_ids)
+        if self._unanswered[key]:
+            return self._unanswered[key].popleft()
+        return None
+
+    def closed_answer(self, question_id):
+        """
+        :return: correct answer with probability correct_rate, otherwise other one
+        """
+        correct_answer = str(self.questions[question_id].get("answer", "A"))
+        if self.rng.random() < self.correct_rate:
+            return correct_answer
+        return self.rng.choice([answer for answer in CLOSED_ANSWERS if answer != correct_answer.upper()])
@@ -0,0 +1,47 @@
+"""
+Load shapes of the event day. locustfile.py uses one of them when LOAD_SHAPE is 'step' or 'spike'.
+Parameters are read from environment variables.
+"""
+from locust import LoadTestShape
+
+from event_data import env_float, env_int
+
+
+class StepLoadShape(LoadTestShape):
+    """
+    Adds STEP_USERS users every STEP_SECONDS until STEP_COUNT steps are done, then keeps the last step
+    for STEP_SECONDS and stops. Shows at which number of users response times start to grow.
+    """
+    step_users = env_int("STEP_USERS", 10)
+    step_seconds = env_int("STEP_SECONDS", 60)
+    step_count = env_int("STEP_COUNT", 10)
+    spawn_rate = env_float("SPAWN_RATE", 10)
+
+    def tick(self):
+        run_time = self.get_run_time()
+        step = int(run_time // self.step_seconds) + 1
+        if step > self.step_count + 1:
+            return None
+        return min(step, self.step_count) * self.step_users, self.spawn_rate
+
+
+class SpikeLoadShape(LoadTestShape):
+    """
+    Keeps BASE_USERS users, at SPIKE_AT second starts SPIKE_USERS users at once for SPIKE_SECONDS
+    (e.g. all teams sending answers just before the deadline), then goes back to BASE_USERS until DURATION.
+    """
+    base_users = env_int("BASE_USERS", 20)
+    spike_users = env_int("SPIKE_USERS", 200)
+    spike_at = env_int("SPIKE_AT", 120)
+    spike_seconds = env_int("SPIKE_SECONDS", 60)
+    duration = env_int("DURATION", 600)
+    spawn_rate = env_float("SPAWN_RATE", 10)
+    spike_spawn_rate = env_float("SPIKE_SPAWN_RATE", 100)
+
+    def tick(self):
+        run_time = self.get_run_time()
+        if run_time >= self.duration:
+            return None
+        if self.spike_at <= run_time < self.spike_at + self.spike_seconds:
+            return self.spike_users, self.spike_spawn_rate
+        return self.base_users, self.spike_spawn_rate if run_time >= self.spike_at else self.spawn_rate
@@ -1,10 +1,150 @@
+"""
+Event day traffic: teams send bugs and answers, judges mark them and spectators watch results.
+Users of each persona are started in proportion to TEAM_WEIGHT, JUDGE_WEIGHT and SPECTATOR_WEIGHT.
+LOAD_SHAPE=step or LOAD_SHAPE=spike replaces number of users given in web interface with load_shapes.py.
 
-from locust import HttpUser, task, between
+Run against fresh databases: answers sent in earlier runs are rejected as duplicates.
+"""
+import os
+import re
 
+from locust import HttpUser, between, task
 
-class QuickstartUser(HttpUser):
-    wait_time = between(1, 2)
+from event_data import EventData, env_float, env_int
 
-    @task
-    def index_page(self):
-        self.client.get("/")
+LOAD_SHAPE = os.environ.get("LOAD_SHAPE", "").lower()
+if LOAD_SHAPE == "step":
+    from load_shapes import StepLoadShape
+elif LOAD_SHAPE == "spike":
+    from load_shapes import SpikeLoadShape
+elif LOAD_SHAPE:
+    raise ValueError("Unknown LOAD_SHAPE: '{0}', expected step or spike".format(LOAD_SHAPE))
+
+event_data = EventData.from_environment()
+
+VERIFICATION_FORM_RE = re.compile(r'<form action="[^"]*update_points" method="post">(.*?)</form>', re.DOTALL)
+FORM_INPUT_RE = re.compile(r'<input name="(\w+)"[^>]*?value="([^"]*)"')
+
+
+def parse_verification_forms(page):
+    """
+    :return: list of dictionaries with hidden fields of marking forms on /answer_verification page
+    """
+    return [dict(FORM_INPUT_RE.findall(form)) for form in VERIFICATION_FORM_RE.findall(page)]
+
+
+class TeamUser(HttpUser):
+    """
+    Team which opens forms and sends bugs, open and closed answers. Each question is answered once.
+    """
+    weight = env_int("TEAM_WEIGHT", 10)
+    wait_time = between(env_float("TEAM_MIN_WAIT", 1), env_float("TEAM_MAX_WAIT", 5))
+
+    def on_start(self):
+        self.team_id = event_data.next_team_id()
+        self.sent_bugs = 0
+
+    def _check_message(self, response, expected_text):
+        if response.status_code == 429:
+            response.failure("Rate limited")
+        elif expected_text not in response.text:
+            response.failure("Unexpected response {0}: {1}".format(response.status_code, response.text[:200]))
+        else:
+            response.success()
+
+    @task(3)
+    def send_bug(self):
+        self.client.get("/send_bug")
+        self.sent_bugs += 1
+        with self.client.post("/postformbug", catch_response=True,
+                              data={"team_id": self.team_id,
+                                    "bug_content": "Bug {0} of team {1}".format(self.sent_bugs, self.team_id)}) as response:
+            self._check_message(response, "Note created")
+
+    @task(2)
+    def send_open_answer(self):
+        question_id = event_data.take_question(self.team_id, "open")
+        if question_id is None:
+            return
+        self.client.get("/send_open_answer")
+        with self.client.post("/postformanswer/open", catch_response=True,
+                              data={"team_id": self.team_id, "question_id": question_id,
+                                    "answer": "Answer of team {0} for question {1}".format(self.team_id, question_id)}) as response:
+            self._check_message(response, "added")
+
+    @task(4)
+    def send_closed_answer(self):
+        question_id = event_data.take_question(self.team_id, "closed")
+        if question_id is None:
+            return
+        self.client.get("/send_closed_answer")
+        with self.client.post("/postformanswer/closed", catch_response=True,
+                              data={"team_id": self.team_id, "question_id": question_id,
+                                    "answer": event_data.closed_answer(question_id)}) as response:
+            self._check_message(response, "added")
+
+    @task(1)
+    def check_results(self):
+        self.client.get("/results")
+
+
+class JudgeUser(HttpUser):
+    """
+    Judge who browses not marked bugs and open answers and gives them points.
+    """
+    weight = env_int("JUDGE_WEIGHT", 1)
+    wait_time = between(env_float("JUDGE_MIN_WAIT", 1), env_float("JUDGE_MAX_WAIT", 3))
+
+    def _verification_page(self, params, name):
+        with self.client.get("/answer_verification", params=params, name=name, catch_response=True) as response:
+            if response.status_code != 200:
+                response.failure("Unexpected response {0}".format(response.status_code))
+                return list()
+            response.success()
+            return parse_verification_forms(response.text)
+
+    def _mark(self, form):
+        data = dict(form)
+        data.update({"base_points": event_data.rng.randint(0, 3), "bonus_for_first": 0,
+                     "bonus_for_unique": 0, "other_bonus": 0, "comment": "load test"})
+        with self.client.post("/answer_verification/update_points", data=data, allow_redirects=False,
+                              catch_response=True) as response:
+            if response.status_code != 302:
+                response.failure("Unexpected response {0}".format(response.status_code))
+            else:
+                response.success()
+
+    @task(5)
+    def mark_not_checked(self):
+        forms = self._verification_page({"not_checked": 0}, "/answer_verification?not_checked")
+        if forms:
+            self._mark(forms[0])
+
+    @task(2)
+    def mark_team_answers(self):
+        team_id = event_data.rng.choice(event_data.team_ids)
+        forms = self._verification_page({"not_checked": 0, "team_id": team_id}, "/answer_verification?team_id")
+        if forms:
+            self._mark(event_data.rng.choice(forms))
+
+    @task(1)
+    def review_already_checked(self):
+        forms = self._verification_page({"already_checked": 1}, "/answer_verification?already_checked")
+        if forms:
+            self._mark(event_data.rng.choice(forms))
+
+
+class SpectatorUser(HttpUser):
+    """
+    Spectator who keeps results page open and refreshes it.
+    """
+    weight = env_int("SPECTATOR_WEIGHT", 5)
+    wait_time = between(env_float("SPECTATOR_MIN_WAIT", 2), env_float("SPECTATOR_MAX_WAIT", 5))
+
+    @task(5)
+    def results(self):
+        self.client.get("/results")
+
+    @task(1)
+    def raw_results(self):
+        self.client.get("/rawresults")
@@ -3,7 +3,14 @@ import yaml
 
 import common
 import data_manager
+import database_init
+import fault_injection
 import logger
+import metrics
+import profiler
+import rate_limiter
+import response_cache
+import shared_state
 import logging
 
 class Bonuses():
@@ -13,7 +20,7 @@ class Bonuses():
 class AppContext():
     def __init__(self):
         script_dir = os.path.dirname(__file__)
-        config_path = os.path.join(script_dir, 'config', 'config.yaml')
+        config_path = common.get_config_path(script_dir)
         if os.path.exists(config_path) is False:
             raise Exception("Missing configuration file:" + config_path)
 
@@ -23,24 +30,76 @@ class AppContext():
         primary_db_path = self.settings["db_config"]["primary_db_path"]
         result_db_path = self.settings["db_config"]["result_db_path"]
 
+        freshness_window = self.settings["service_config"]["config_freshness_window"]
+        watch_interval = self.settings["service_config"]["config_watch_interval"]
         team_list_path = os.path.join(script_dir, self.settings["service_config"]["team_list"])
-        self.team_loader = common.YamlConfigFileLoader(team_list_path)
+        self.team_loader = common.YamlConfigFileLoader(team_list_path, index_builder=common.build_team_index,
+                                                       freshness_window=freshness_window,
+                                                       watch_interval=watch_interval)
         question_list_path = os.path.join(script_dir, self.settings["service_config"]["question_list"])
-        self.question_loader = common.YamlConfigFileLoader(question_list_path)
-
+        self.question_loader = common.YamlConfigFileLoader(question_list_path,
+                                                           index_builder=common.build_question_index,
+                                                           freshness_window=freshness_window,
+                                                           watch_interval=watch_interval)
+
+        # State shared by worker processes, see service_config.server
+        self.server_config = self.settings["service_config"]["server"]
+        self.shared_state = None
+        if self.server_config["shared_state"] or \
+                (self.server_config["mode"] == "gunicorn" and self.server_config["workers"] > 1):
+            self.shared_state = shared_state.SharedState(os.path.join(script_dir, self.settings["db_config"]["shared_state_path"]),
+                                                         pragmas=self.settings["db_config"]["pragmas"])
+
+        self.metrics = None
+        if self.settings["service_config"]["metrics"]["enabled"]:
+            self.metrics = metrics.Metrics()
+        # Admin-only profiling of requests, see /admin/profile
+        self.profiler = profiler.Profiler()
+
+        # Creates missing tables and upgrades schema of existing databases
+        database_init.init(os.path.join(script_dir, primary_db_path), os.path.join(script_dir, result_db_path))
         self.data_manager = data_manager.DataManager(primary_db_path=primary_db_path,
                                                      result_db_path=result_db_path,
                                                      bug_files_path=self.settings["db_config"]["bug_files_path"],
                                                      open_questions_files_path=self.settings["db_config"]["open_questions_files_path"],
-                                                     closed_questions_files_path=self.settings["db_config"]["closed_questions_files_path"])
-
-        self.spam_table = dict()  # the key is team ID, value is datetime
-        self.answers_table = self.data_manager.get_answered_qestions()  # the key is team ID, value is list with answered questions IDs
+                                                     closed_questions_files_path=self.settings["db_config"]["closed_questions_files_path"],
+                                                     pool_size=self.settings["db_config"]["pool_size"],
+                                                     pragmas=self.settings["db_config"]["pragmas"],
+                                                     group_commit_config=self.settings["db_config"]["group_commit"],
+                                                     file_mirror_config=self.settings["db_config"]["file_mirror"],
+                                                     shared_state=self.shared_state,
+                                                     metrics=self.metrics,
+                                                     profiler=self.profiler)
+
+        if self.shared_state is not None:
+            self.spam_table = shared_state.SharedSpamTable(self.shared_state)
+        else:
+            self.spam_table = common.SpamTable()
+        self.rate_limiter = None
+        rate_limit_config = self.settings["service_config"]["rate_limit"]
+        if rate_limit_config["enabled"]:
+            if self.shared_state is not None:
+                self.rate_limiter = shared_state.SharedRateLimiter(self.shared_state,
+                                                                   rate_limit_config["requests_per_minute"],
+                                                                   rate_limit_config["burst"],
+                                                                   idle_seconds=rate_limit_config["idle_seconds"])
+            else:
+                self.rate_limiter = rate_limiter.TokenBucketRateLimiter(rate_limit_config["requests_per_minute"],
+                                                                        rate_limit_config["burst"],
+                                                                        stripes=rate_limit_config["stripes"],
+                                                                        max_teams=rate_limit_config["max_teams"],
+                                                                        idle_seconds=rate_limit_config["idle_seconds"])
+        self.answers_table = self.data_manager.get_answered_qestions()  # answered questions IDs per team
+        self.first_correct_answers = self.data_manager.get_first_correct_answers()  # IDs of questions with correct answer
 
         self.results = None
         self.answers = None
-        self.last_results_request = None
-        self.results_generation_delay = self.settings["service_config"]["results_generation_delay"]
+        self.response_cache = None
+        response_cache_config = self.settings["service_config"]["response_cache"]
+        if response_cache_config["enabled"]:
+            self.response_cache = response_cache.ResponseCache(gzip_min_size=response_cache_config["gzip_min_size"])
+
+        self.fault_injector = fault_injection.FaultInjector(self.settings["service_config"]["fault_injection"])
 
         self.bonuses = Bonuses()
         self.bonuses.QUICKEST_ANSWER_BONUS = self.settings["service_config"]["quickest_answer_bonus"]
@@ -69,4 +128,6 @@ class AppContext():
         if self.settings['log']['level'] == 'WARNING':
             log_level = logging.WARNING
 
-        logger.basicConfig(logging_file_name, log_level, logging_format, log_on_console)
\ No newline at end of file
+        logger.basicConfig(logging_file_name, log_level, logging_format, log_on_console,
+                           query_log_sample_rate=self.settings['log']['query_log_sample_rate'],
+                           query_log_max_length=self.settings['log']['query_log_max_length'])
\ No newline at end of file
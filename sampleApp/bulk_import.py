@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Imports answers from CSV file (columns: TeamID, QuestionID, Answer and optional CreatedTs - microseconds
+since 1970, current time if missing or blank) straight to ANSWERS table, then grades closed question answers
+and writes their RESULTS. Like the service, only the first answer of each team to each question is accepted:
+rows of team and question which are already in ANSWERS or earlier in the file are skipped.
+Correct answers can be taken from question list or from answer key CSV file (columns: QuestionID, QuestionAnswer).
+Run it when service is stopped.
+
+python bulk_import.py answers.csv --answer-key ../QuestionAnswers.csv
+"""
+import argparse
+import os
+import sqlite3
+import time
+import uuid
+
+import common
+import csv_reader
+import data_manager
+import database_init
+import grading
+import id_generator
+import recompute_results
+
+
+def optional_int(value):
+    """
+    :return: int, None for blank value
+    """
+    if value is None or not value.strip():
+        return None
+    return int(value)
+
+
+ANSWER_COLUMN_TYPES = {'TeamID': str, 'QuestionID': int, 'Answer': str, 'CreatedTs': optional_int}
+ANSWER_KEY_COLUMN_TYPES = {'QuestionID': int, 'QuestionAnswer': str}
+
+# Bulk import is the only writer, so commit is not waited for
+IMPORT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "OFF",
+    "cache_size": -64000,
+}
+
+
+def read_answer_key(file_path, questions):
+    """
+    :param: questions - 'questions' section of question list, copied with answers replaced by answer key
+    :return: grading.GradingEngine
+    """
+    questions = dict((question_id, dict(questions[question_id])) for question_id in questions or {})
+    for row in csv_reader.CSVReader(file_path, column_types=ANSWER_KEY_COLUMN_TYPES).iter_rows():
+        question = questions.get(row['QuestionID'], None)
+        if question is None:
+            raise Exception("Answer key contains question which is not on question list: {0}".format(row['QuestionID']))
+        question['answer'] = row['QuestionAnswer']
+    return grading.GradingEngine(questions)
+
+
+def import_answers(db_path, file_path, chunk_size=10000, chunks_per_transaction=10, pragmas=None):
+    """
+    Inserts answers from CSV file to ANSWERS table with executemany, many chunks in one transaction.
+    Only one chunk is kept in memory. Answer is skipped if ANSWERS already has answer of the team to the question,
+    which is checked in the same statement with index of TEAM_ID and QUESTION_ID.
+    :return: dictionary with number of imported and skipped answers, time and speed
+    """
+    start = time.time()
+    generator = id_generator.IdGenerator()
+    query = "INSERT INTO ANSWERS (QUESTION_ID, QUESTION_GUID, CREATED_DATE_TIME, TEAM_ID, ANSWER_CONTENT, ID, CREATED_TS) " \
+            "SELECT ?1, ?2, ?3, ?4, ?5, ?6, ?7 " \
+            "WHERE NOT EXISTS (SELECT 1 FROM ANSWERS WHERE TEAM_ID = ?4 AND QUESTION_ID = ?1)"
+    imported_answers = 0
+    skipped_answers = 0
+    connection = sqlite3.connect(db_path)
+    try:
+        for name, value in (IMPORT_PRAGMAS if pragmas is None else pragmas).items():
+            connection.execute("PRAGMA {0} = {1}".format(name, value))
+        reader = csv_reader.CSVReader(file_path, column_types=ANSWER_COLUMN_TYPES)
+        for chunk_number, chunk in enumerate(reader.iter_chunks(chunk_size), 1):
+            params = list()
+            for row in chunk:
+                created_ts = row.get('CreatedTs', None) or generator.timestamp_us()
+                params.append((str(row['QuestionID']),
+                               str(uuid.uuid4()),
+                               time.strftime('%H:%M:%S', time.localtime(created_ts / 1000000.0)),
+                               row['TeamID'],
+                               str(row['Answer'].encode('utf-8')),
+                               generator.next_id(),
+                               created_ts))
+            changes = connection.total_changes
+            connection.executemany(query, params)
+            inserted = connection.total_changes - changes
+            imported_answers += inserted
+            skipped_answers += len(params) - inserted
+            if chunk_number % chunks_per_transaction == 0:
+                connection.commit()
+        connection.commit()
+    finally:
+        connection.close()
+    seconds = time.time() - start
+    return {"answers": imported_answers, "skipped_answers": skipped_answers, "seconds": seconds,
+            "rows_per_second": imported_answers / seconds if seconds > 0 else 0.0}
+
+
+if __name__ == '__main__':
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Imports answers from CSV file and grades them.")
+    parser.add_argument("answers_file")
+    parser.add_argument("--answer-key", help="CSV file with correct answers, question list is used if not given")
+    parser.add_argument("--config", default=common.get_config_path(script_dir))
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--no-results", action="store_true", help="only import answers, do not grade them")
+    args = parser.parse_args()
+
+    settings = recompute_results.load_settings(args.config)
+    question_list_path = os.path.join(script_dir, settings["service_config"]["question_list"])
+    question_loader = common.YamlConfigFileLoader(question_list_path, index_builder=common.build_question_index)
+    if args.answer_key:
+        grading_engine = read_answer_key(args.answer_key, question_loader.get_key('questions'))
+    else:
+        grading_engine = question_loader.get_index().grading_engine
+    primary_db_path = os.path.join(script_dir, settings["db_config"]["primary_db_path"])
+    result_db_path = os.path.join(script_dir, settings["db_config"]["result_db_path"])
+    database_init.init(primary_db_path, result_db_path)
+
+    stats = import_answers(primary_db_path, args.answers_file, chunk_size=args.chunk_size)
+    print(u"Imported answers: {answers}, skipped answers of already answered questions: {skipped_answers}, "
+          u"time: {seconds:.2f}s, {rows_per_second:.0f} answers/s".format(**stats))
+    if not args.no_results:
+        manager = data_manager.DataManager(primary_db_path=primary_db_path,
+                                           result_db_path=result_db_path,
+                                           bug_files_path=os.path.join(script_dir, settings["db_config"]["bug_files_path"]),
+                                           open_questions_files_path=os.path.join(script_dir, settings["db_config"]["open_questions_files_path"]),
+                                           closed_questions_files_path=os.path.join(script_dir, settings["db_config"]["closed_questions_files_path"]),
+                                           pragmas=settings["db_config"]["pragmas"])
+        try:
+            stats = manager.recompute_results(grading_engine,
+                                              quickest_answer_bonus=settings["service_config"]["quickest_answer_bonus"],
+                                              batch_size=args.chunk_size)
+            print(recompute_results.format_stats(stats))
+        finally:
+            manager.close()
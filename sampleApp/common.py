@@ -4,6 +4,10 @@ import time
 import yaml
 import os
 import operator
+import threading
+
+import grading
+from enums.question import QuestionTypes
 
 
 def get_float_from_string(str_to_parse):
@@ -36,6 +40,13 @@ def database_connect(db_path):
     return cursor, connection
 
 
+def get_config_path(script_dir):
+    """
+    :return: path of config file given in SAMPLEAPP_CONFIG environment variable, config/config.yaml by default
+    """
+    return os.environ.get('SAMPLEAPP_CONFIG') or os.path.join(script_dir, 'config', 'config.yaml')
+
+
 def get_date_time():
     """
     Returns current Date Time with zone information.
@@ -44,6 +55,8 @@ def get_date_time():
 
 
 def check_question_type(question_id, question_type, question_dict):
+    if isinstance(question_dict, QuestionIndex):
+        return question_dict.is_question_type(question_id, question_type)
     question = question_dict.get(int(question_id), None)
     if question is not None and str(question.get("type", None)).lower() == str(question_type).lower():
         return True
@@ -58,6 +71,8 @@ def is_question_correct(question_id, answer, question_dict):
     :param: question_dict
     :return: bool
     """
+    if isinstance(question_dict, QuestionIndex):
+        return question_dict.grading_engine.is_correct(question_id, answer)
     question = question_dict.get(int(question_id), None)
     answer_list = answer.strip().lower().split(' ')
     if question is not None:
@@ -89,6 +104,8 @@ def get_closed_answer_points(question_id, question_dict):
 
 
 def is_id_present(id, dict_obj, id_key='id'):
+    if isinstance(dict_obj, (TeamIndex, QuestionIndex)):
+        return id in dict_obj
     for key_ in dict_obj:
         if id == str(dict_obj[key_].get(id_key, None)):
             return True
@@ -96,6 +113,8 @@ def is_id_present(id, dict_obj, id_key='id'):
 
 
 def check_if_spam(team_id, spam_table, seconds=5):
+    if isinstance(spam_table, SpamTable):
+        return spam_table.check_and_update(team_id, seconds)
     if team_id not in spam_table:
         spam_table[team_id] = time.time()
         return False
@@ -107,6 +126,8 @@ def check_if_spam(team_id, spam_table, seconds=5):
 
 
 def check_if_was_answered(team_id, question_id, answered_question_table):
+    if isinstance(answered_question_table, AnsweredQuestionsIndex):
+        return answered_question_table.check_and_add(team_id, question_id)
     if team_id not in answered_question_table:
         answered_question_table[team_id] = list()
     if question_id not in answered_question_table[team_id]:
@@ -115,33 +136,303 @@ def check_if_was_answered(team_id, question_id, answered_question_table):
     return True
 
 
+class AnsweredQuestionsIndex(object):
+    """
+    Set of answered questions per team used for duplicate answer detection.
+    Check and add is done under lock, so only one of parallel answers for the same question is accepted.
+    """
+    def __init__(self, answered_questions=None):
+        """
+        :param: answered_questions - dictionary where key is team ID and value is set of question IDs
+        """
+        self._answered_questions = dict()
+        self._lock = threading.Lock()
+        if answered_questions:
+            for team_id in answered_questions:
+                self._answered_questions[team_id] = set(str(question_id) for question_id in answered_questions[team_id])
+
+    def __contains__(self, team_question):
+        team_id, question_id = team_question
+        return str(question_id) in self._answered_questions.get(team_id, ())
+
+    def __len__(self):
+        return sum(len(question_ids) for question_ids in list(self._answered_questions.values()))
+
+    def get_question_ids(self, team_id):
+        return frozenset(self._answered_questions.get(team_id, ()))
+
+    def add(self, team_id, question_id):
+        with self._lock:
+            self._answered_questions.setdefault(team_id, set()).add(str(question_id))
+
+    def check_and_add(self, team_id, question_id):
+        """
+        Marks question as answered by team.
+        :return: bool - True if question was already answered
+        """
+        question_id = str(question_id)
+        with self._lock:
+            question_ids = self._answered_questions.setdefault(team_id, set())
+            if question_id in question_ids:
+                return True
+            question_ids.add(question_id)
+            return False
+
+
+class FirstCorrectAnswerIndex(object):
+    """
+    IDs of questions which already got correct answer, used to give bonus for the quickest answer
+    without querying results. Check and add is done under lock, so only one answer gets the bonus.
+    """
+    def __init__(self, question_ids=None):
+        self._question_ids = set(str(question_id) for question_id in question_ids or ())
+        self._lock = threading.Lock()
+
+    def __contains__(self, question_id):
+        return str(question_id) in self._question_ids
+
+    def __len__(self):
+        return len(self._question_ids)
+
+    def check_and_add(self, question_id):
+        """
+        Marks question as correctly answered.
+        :return: bool - True if question already had correct answer
+        """
+        question_id = str(question_id)
+        with self._lock:
+            if question_id in self._question_ids:
+                return True
+            self._question_ids.add(question_id)
+            return False
+
+    def discard(self, question_id):
+        """
+        Releases question marked by check_and_add, e.g. when result of the answer was not saved.
+        """
+        with self._lock:
+            self._question_ids.discard(str(question_id))
+
+    def reset(self, question_ids):
+        with self._lock:
+            self._question_ids = set(str(question_id) for question_id in question_ids)
+
+
+class SpamTable(object):
+    """
+    Time of last request of each team. Check and update is done under lock.
+    """
+    def __init__(self):
+        self._last_requests = dict()  # the key is team ID, value is time of last accepted request
+        self._lock = threading.Lock()
+
+    def check_and_update(self, team_id, seconds):
+        """
+        Saves time of the request if previous one was made more than given number of seconds ago.
+        :return: bool - True if request is a spam
+        """
+        with self._lock:
+            now = time.time()
+            last_request = self._last_requests.get(team_id, None)
+            if last_request is None or now - last_request > seconds:
+                self._last_requests[team_id] = now
+                return False
+            return True
+
+
+class TeamIndex(object):
+    """
+    Id-keyed lookup table built once from the 'teams' section of team list.
+    """
+    def __init__(self, teams):
+        self.names_by_id = dict()  # the key is team ID (str), value is team name
+        if teams:
+            for team_name in teams:
+                self.names_by_id[str(teams[team_name].get('id', None))] = team_name
+
+    def __contains__(self, team_id):
+        return str(team_id) in self.names_by_id
+
+    def get_name(self, team_id):
+        return self.names_by_id.get(str(team_id), None)
+
+
+class QuestionIndex(object):
+    """
+    Id-keyed lookup table built once from the 'questions' section of question list.
+    """
+    def __init__(self, questions):
+        self.questions_by_id = dict()  # the key is question ID (str), value is question dict
+        open_questions_ids = set()
+        if questions:
+            for question_key in questions:
+                question = questions[question_key]
+                self.questions_by_id[str(question.get('id', None))] = question
+                if str(question.get('type', None)).lower() == QuestionTypes.OPEN:
+                    open_questions_ids.add(question.get('id', None))
+        self.open_questions_ids = frozenset(open_questions_ids)
+        self.grading_engine = grading.GradingEngine(questions)
+
+    def __contains__(self, question_id):
+        return str(question_id) in self.questions_by_id
+
+    def get_question(self, question_id):
+        return self.questions_by_id.get(str(question_id), None)
+
+    def is_question_type(self, question_id, question_type):
+        question = self.get_question(question_id)
+        return question is not None and str(question.get("type", None)).lower() == str(question_type).lower()
+
+
+def build_team_index(json_data):
+    return TeamIndex((json_data or dict()).get('teams', None))
+
+
+def build_question_index(json_data):
+    return QuestionIndex((json_data or dict()).get('questions', None))
+
+
+class ConfigSnapshot(object):
+    """
+    Fully parsed content of a config file. Snapshots are never modified, loader swaps them as a whole.
+    """
+    def __init__(self, json_data, index, modification_time):
+        self.json_data = json_data
+        self.index = index
+        self.modification_time = modification_time
+
+
 class YamlConfigFileLoader(object):
-    def __init__(self, file_name, check_modification_time=True):
+    def __init__(self, file_name, check_modification_time=True, index_builder=None, freshness_window=0,
+                 watch_interval=None):
+        """
+        :param: file_name
+        :param: check_modification_time - reload file when its modification time changes
+        :param: index_builder - function called with loaded data, its result is returned by get_index()
+        :param: freshness_window - number of seconds during which loaded file is treated as up to date
+                                   (modification time is not checked)
+        :param: watch_interval - if given, background thread checks modification time with given period
+                                 and readers never check the file
+        """
         self.file_name = file_name
-        self._json_data = None
-        self._modification_time = None
+        self._snapshot = None
+        self._index_builder = index_builder
         self._check_modification_time = check_modification_time
+        self._freshness_window = freshness_window
+        self._next_check_time = 0
+        self._load_lock = threading.Lock()
+
+        self.reload_counter = 0
+        self.failed_reload_counter = 0
+        self.last_reload_latency = None
+        self.last_reload_time = None
+
+        self._watcher = None
+        self._watcher_stop = threading.Event()
+        if watch_interval:
+            self._load_data()
+            self._watcher = threading.Thread(target=self._watch, args=(watch_interval,),
+                                             name="config-watcher-{0}".format(os.path.basename(file_name)))
+            self._watcher.daemon = True
+            self._watcher.start()
+
+    def _parse(self):
+        """
+        Reads and validates file content. Raises exception if content is not valid.
+        :return: ConfigSnapshot
+        """
+        modification_time = self._get_last_modification_date()
+        with open(self.file_name) as data_file:
+            json_data = yaml.load(data_file)
+        if json_data is None:
+            json_data = dict()
+        if not isinstance(json_data, dict):
+            raise ValueError("Unexpected content of '{0}': {1}".format(self.file_name, type(json_data).__name__))
+        index = None
+        if self._index_builder is not None:
+            index = self._index_builder(json_data)
+        return ConfigSnapshot(json_data, index, modification_time)
 
     def _load_data(self):
-        try:
-            with open(self.file_name) as data_file:
-                self._json_data = yaml.load(data_file)
-            self._modification_time = self._get_last_modification_date()
-        except IOError as ex:
-            print (ex)
-            self._json_data = dict()
+        with self._load_lock:
+            start_time = time.time()
+            try:
+                snapshot = self._parse()
+            except (IOError, OSError) as ex:
+                print (ex)
+                self.failed_reload_counter += 1
+                if self._snapshot is None:
+                    self._snapshot = ConfigSnapshot(dict(), self._index_builder(dict()) if self._index_builder else None, None)
+                return
+            except Exception as ex:
+                # Broken file - previous snapshot is kept and file is parsed again after next modification
+                print ("Could not load '{0}': {1}".format(self.file_name, ex))
+                self.failed_reload_counter += 1
+                if self._snapshot is None:
+                    raise
+                self._snapshot = ConfigSnapshot(self._snapshot.json_data, self._snapshot.index,
+                                                self._get_last_modification_date())
+                return
+            self._snapshot = snapshot
+            self.reload_counter += 1
+            self.last_reload_time = time.time()
+            self.last_reload_latency = self.last_reload_time - start_time
 
     def _get_last_modification_date(self):
         (mode, ino, dev, nlink, uid, gid, size, atime, mtime, ctime) = os.stat(self.file_name)
         return mtime
 
-    def get_key(self, key, force_load=False):
-        if force_load or self._json_data is None or len(self._json_data) == 0:
-            self._load_data()
-        if self._check_modification_time:
-            if self._modification_time < self._get_last_modification_date():
+    def _is_modified(self):
+        try:
+            return self._snapshot.modification_time != self._get_last_modification_date()
+        except OSError:
+            return False
+
+    def _watch(self, watch_interval):
+        while not self._watcher_stop.wait(watch_interval):
+            if self._is_modified():
                 self._load_data()
-        if key in self._json_data.keys():
-            return self._json_data[key]
-        else:
-            return None
+
+    def stop_watcher(self):
+        if self._watcher is not None:
+            self._watcher_stop.set()
+            self._watcher.join()
+            self._watcher = None
+
+    def _get_snapshot(self, force_load=False):
+        snapshot = self._snapshot
+        if force_load or snapshot is None or len(snapshot.json_data) == 0:
+            self._load_data()
+        elif self._check_modification_time and self._watcher is None:
+            if self._freshness_window <= 0:
+                if self._is_modified():
+                    self._load_data()
+            else:
+                now = time.time()
+                if now >= self._next_check_time:
+                    self._next_check_time = now + self._freshness_window
+                    if self._is_modified():
+                        self._load_data()
+        return self._snapshot
+
+    def get_key(self, key, force_load=False):
+        return self._get_snapshot(force_load).json_data.get(key, None)
+
+    def get_index(self, force_load=False):
+        """
+        Returns index built by index_builder from the current content of the file.
+        Index is rebuilt only when the file is reloaded.
+        """
+        return self._get_snapshot(force_load).index
+
+    def get_stats(self):
+        """
+        Returns reload counters of the loader.
+        """
+        return {
+            "file_name": self.file_name,
+            "reload_counter": self.reload_counter,
+            "failed_reload_counter": self.failed_reload_counter,
+            "last_reload_latency": self.last_reload_latency,
+            "last_reload_time": self.last_reload_time,
+        }
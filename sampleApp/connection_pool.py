@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import logger
+
+# Used when no pragmas are given in config.yaml. WAL lets readers work while a write is in progress.
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -16000,
+    "busy_timeout": 5000,
+}
+
+
+class ConnectionPool(object):
+    """
+    Bounded pool of SQLite connections to a single database file.
+    Each thread takes own connection for the time of a query, so cursors are never shared between threads.
+    """
+    def __init__(self, db_path, pool_size=5, pragmas=None, timeout=30):
+        """
+        :param: db_path - path to database file
+        :param: pool_size - max number of open connections
+        :param: pragmas - dictionary of PRAGMA name and value executed for each new connection
+        :param: timeout - number of seconds to wait for free connection and for database lock
+        """
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self._pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+        self._timeout = timeout
+        self._idle_connections = queue.LifoQueue(maxsize=pool_size)
+        self._number_of_connections = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _create_connection(self):
+        connection = sqlite3.connect(self.db_path, check_same_thread=False, timeout=self._timeout)
+        connection.text_factory = str
+        for name, value in self._pragmas.items():
+            connection.execute("PRAGMA {0} = {1}".format(name, value))
+        return connection
+
+    def _acquire(self):
+        try:
+            return self._idle_connections.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create_new = self._number_of_connections < self.pool_size
+            if create_new:
+                self._number_of_connections += 1
+        if create_new:
+            try:
+                return self._create_connection()
+            except Exception:
+                with self._lock:
+                    self._number_of_connections -= 1
+                raise
+        try:
+            return self._idle_connections.get(timeout=self._timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError("No free connection to '{0}' after {1}s".format(self.db_path,
+                                                                                          self._timeout))
+
+    def _release(self, connection):
+        if self._closed:
+            self._close_connection(connection)
+            return
+        self._idle_connections.put_nowait(connection)
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager which lends connection from the pool.
+        """
+        connection = self._acquire()
+        try:
+            yield connection
+        finally:
+            self._release(connection)
+
+    def _close_connection(self, connection):
+        try:
+            connection.close()
+        except Exception as e:
+            logger.console_fatal('Error occurred while closing connection to database. Reason: {0}'.format(str(e)))
+        with self._lock:
+            self._number_of_connections -= 1
+
+    def close(self):
+        """
+        Close all idle connections. Connections in use are closed when they are returned to the pool.
+        """
+        self._closed = True
+        while True:
+            try:
+                connection = self._idle_connections.get_nowait()
+            except queue.Empty:
+                break
+            self._close_connection(connection)
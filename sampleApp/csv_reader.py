@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import csv
+
+
+class CSVReader:
+    """
+    Reads CSV file with header. Spaces after delimiter are skipped, so 'QuestionID, QuestionAnswer'
+    gives 'QuestionAnswer' column.
+    """
+    def __init__(self, pathToFile, column_types=None, delimiter=','):
+        """
+        :param: pathToFile
+        :param: column_types - dictionary where key is column name and value is function converting
+                               text to value, e.g. {'QuestionID': int}
+        :param: delimiter
+        """
+        self.file_path = pathToFile
+        self.column_types = column_types or {}
+        self.delimiter = delimiter
+
+    def read(self):
+        return list(self.iter_rows())
+
+    def iter_rows(self):
+        """
+        Generator which yields rows one by one as dictionaries, file is never loaded to memory as a whole.
+        """
+        with open(self.file_path, newline='', encoding='utf-8') as answerList:
+            reader = csv.DictReader(answerList, delimiter=self.delimiter, skipinitialspace=True)
+            column_types = [(column, self.column_types[column]) for column in reader.fieldnames or ()
+                            if column in self.column_types]
+            for row in reader:
+                for column, column_type in column_types:
+                    try:
+                        row[column] = column_type(row[column])
+                    except (TypeError, ValueError) as e:
+                        raise ValueError("{0}:{1}: invalid value of column '{2}': {3}".format(
+                            self.file_path, reader.line_num, column, e))
+                yield row
+
+    def iter_chunks(self, chunk_size=10000):
+        """
+        Generator which yields lists of at most chunk_size rows.
+        """
+        chunk = list()
+        for row in self.iter_rows():
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = list()
+        if chunk:
+            yield chunk
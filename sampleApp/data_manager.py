@@ -1,77 +1,163 @@
 # -*- coding: utf-8 -*-
+import ast
 import os
+import sqlite3
+import threading
+import time
 import uuid
 from sqlite3 import OperationalError
 
 import logger
 import common
+import connection_pool
+import file_mirror
+import group_commit_writer
+import id_generator
+import scoreboard
+import shared_state
 
 
 class DataManager():
     def __init__(self, primary_db_path, result_db_path, bug_files_path, open_questions_files_path,
-                 closed_questions_files_path):
-        self._primary_cursor = None
-        self._primary_connection = None
-
-        self._result_cursor = None
-        self._result_connection = None
-
+                 closed_questions_files_path, pool_size=5, pragmas=None, group_commit_config=None, file_mirror_config=None,
+                 shared_state=None, metrics=None, profiler=None):
+        """
+        :param: shared_state - shared_state.SharedState, used when service runs in more than one process
+        :param: metrics - metrics.Metrics, queries and file writes are measured if given
+        :param: profiler - profiler.Profiler, records queries of requests when its session traces SQL
+        """
         self._db_table = "BUGS"
         self._db_answer_table = "ANSWERS"
         self._db_results_table = "RESULTS"
 
-        self._bugs_counter = 0
+        self._metrics = metrics
+        self._profiler = profiler
 
         self._bug_files_path = bug_files_path
         self._closed_questions_files_path = closed_questions_files_path
         self._open_questions_files_path = open_questions_files_path
-        self._primary_cursor, self._primary_connection = self._init_cursor(primary_db_path)
-        self._result_cursor, self._result_connection = self._init_cursor(result_db_path)
+        self._file_mirror = None
+        if file_mirror_config is not None and file_mirror_config.get("enabled", False):
+            self._file_mirror = file_mirror.FileMirror(max_queue_size=file_mirror_config.get("max_queue_size", 10000),
+                                                       batch_size=file_mirror_config.get("batch_size", 100),
+                                                       shard_directories=file_mirror_config.get("shard_directories", False))
+        group_commit_enabled = group_commit_config is not None and group_commit_config.get("enabled", False)
+        if group_commit_enabled:
+            # request is answered after its group is committed, which survives power failure only with FULL
+            pragmas = dict(connection_pool.DEFAULT_PRAGMAS if pragmas is None else pragmas, synchronous="FULL")
+        self._primary_pool = self._init_pool(primary_db_path, pool_size, pragmas)
+        self._result_pool = self._init_pool(result_db_path, pool_size, pragmas)
+
+        self.answered_questions = None
+        self.first_correct_answers = None
+        self._results_update_lock = threading.Lock()
+        self._shared_state = shared_state
+        self._results_version = None
+        self._worker_id = None
+        if shared_state is not None:
+            self._worker_id = shared_state.register_worker(self.get_answered_qestions_per_team(),
+                                                           self._get_correctly_answered_question_ids())
+            self._results_version = shared_state.get_results_version()
+        self._id_generator = id_generator.IdGenerator(self._worker_id)
+        self.scoreboard = scoreboard.Scoreboard(self.get_points_per_team())
+
+        self._primary_writer = None
+        self._result_writer = None
+        if group_commit_enabled:
+            flush_interval = group_commit_config.get("flush_interval_ms", 2) / 1000.0
+            max_batch_rows = group_commit_config.get("max_batch_rows", 500)
+            self._primary_writer = group_commit_writer.GroupCommitWriter(self._primary_pool, flush_interval, max_batch_rows)
+            self._result_writer = group_commit_writer.GroupCommitWriter(self._result_pool, flush_interval, max_batch_rows)
 
     def close(self):
         """
-        Close all cursors and connections
+        Commit queued rows, write queued files and close all connections
         """
-        self._close_connection(self._primary_cursor, self._primary_connection)
-        self._close_connection(self._result_cursor, self._result_connection)
-
-    def _close_connection(self, cursor, connection):
-        try:
-            cursor.close()
-            connection.close()
-        except Exception as e:
-            logger.console_fatal('Error occurred while closing connection to database. Reason: {0}'.format(str(e)))
-
-    def _init_cursor(self, db_path):
+        if self._file_mirror is not None:
+            self._file_mirror.close()
+        if self._primary_writer is not None:
+            self._primary_writer.close()
+        if self._result_writer is not None:
+            self._result_writer.close()
+        self._primary_pool.close()
+        self._result_pool.close()
+        if self._worker_id is not None:
+            self._shared_state.unregister_worker(self._worker_id)
+            self._worker_id = None
+
+    def _init_pool(self, db_path, pool_size, pragmas):
         db_path = os.path.join(os.path.dirname(__file__), db_path)
-        cursor, connection = common.database_connect(db_path)
-        if cursor is None or connection is None:
-            raise Exception("No connection to database at '{0}'!".format(db_path))
-        connection.text_factory = str
-        return cursor, connection
+        pool = connection_pool.ConnectionPool(db_path, pool_size=pool_size, pragmas=pragmas)
+        try:
+            with pool.connection() as connection:
+                data = connection.execute('SELECT SQLITE_VERSION()').fetchone()
+                logger.debug("SQLite version: %s" % data)
+        except sqlite3.Error as e:
+            raise Exception("No connection to database at '{0}'! {1}".format(db_path, e))
+        return pool
+
+    def _execute_query_on_cursor(self, pool, query, params):
+        response = None
+        wait_start = time.perf_counter()
+        with pool.connection() as connection:
+            if self._metrics is not None:
+                self._metrics.lock_wait.observe(time.perf_counter() - wait_start, (os.path.basename(pool.db_path),))
+            cursor = connection.cursor()
+            try:
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                response = cursor.fetchall()
+                connection.commit()
+            except OperationalError as ex:
+                connection.rollback()
+                response = ex
+            finally:
+                cursor.close()
+        return response
 
-    def _execute_query_on_cursor(self, cursor, connection, query, params):
+    def _execute_query(self, pool, query, params):
+        failure = False
         response = None
+        start = time.perf_counter()
         try:
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            connection.commit()
-            response = cursor.fetchall()
-        except OperationalError as ex:
-            response = ex
-        return response
+            response = self._execute_query_on_cursor(pool=pool, query=query, params=params)
+        except Exception as ex:
+            logger.console_fatal(ex)
+            failure = True
+        self._observe_query(pool, query, start, response, failure)
+        logger.query(query, response)
+        return failure, response
 
-    def _execute_query(self, cursor, connection, query, params):
+    def _observe_query(self, pool, query, start, response, failure):
+        if self._metrics is None and self._profiler is None:
+            return
+        seconds = time.perf_counter() - start
+        database = os.path.basename(pool.db_path)
+        if self._metrics is not None:
+            self._metrics.observe_query(database, query, seconds, response, failure)
+        if self._profiler is not None:
+            self._profiler.record_query(database, query, seconds, response)
+
+    def _execute_write(self, writer, pool, query, params):
+        """
+        Executes INSERT through group commit writer if enabled. Waits until row is committed.
+        :return: bool (failure)
+        :return: response from database
+        """
+        if writer is None:
+            return self._execute_query(pool=pool, query=query, params=params)
         failure = False
         response = None
+        start = time.perf_counter()
         try:
-            response = self._execute_query_on_cursor(cursor=cursor, connection=connection, query=query, params=params)
+            response = writer.execute(query, params)
         except Exception as ex:
             logger.console_fatal(ex)
             failure = True
-        logger.debug("query: {0}, response: {1}".format(query, response))
+        self._observe_query(pool, query, start, response, failure)
+        logger.query(query, response)
         return failure, response
 
     def _execute_databank_query(self, query, params=None):
@@ -80,7 +166,7 @@ class DataManager():
         :param params
         :return: response from database
         """
-        primary_failure, primary_response = self._execute_query(cursor=self._primary_cursor, connection=self._primary_connection, query=query, params=params)
+        primary_failure, primary_response = self._execute_query(pool=self._primary_pool, query=query, params=params)
         return primary_failure, primary_response
 
     def _execute_result_query(self, query, params=None):
@@ -90,16 +176,54 @@ class DataManager():
         :return: bool (failure)
         :return: response from database
         """
-        return self._execute_query(cursor=self._result_cursor, connection=self._result_connection, query=query, params=params)
+        return self._execute_query(pool=self._result_pool, query=query, params=params)
+
+    def _stream_query(self, pool, query, params=None, batch_size=1000):
+        """
+        Generator which yields rows of query response without loading whole response to memory.
+        Connection is kept until generator is exhausted or closed.
+        """
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(query, params or ())
+                rows = cursor.fetchmany(batch_size)
+                while rows:
+                    for row in rows:
+                        yield row
+                    rows = cursor.fetchmany(batch_size)
+            finally:
+                cursor.close()
 
     def get_answered_qestions(self):
         """
-        Returns answered qestions for each team. If number of answers differs in both DB logs error and returns larger list.
-        :return: bool - True if number of answers is equal for both tables
-        :return: answers_table
+        Returns answered qestions for each team. Index is loaded once and updated by add_answer.
+        :return: answers_table - common.AnsweredQuestionsIndex
         """
-        primary_answers_table = self.get_answered_qestions_per_team()
-        return primary_answers_table
+        if self.answered_questions is None:
+            if self._shared_state is not None:
+                # filled when worker was registered
+                self.answered_questions = shared_state.SharedAnsweredQuestionsIndex(self._shared_state)
+            else:
+                self.answered_questions = common.AnsweredQuestionsIndex(self.get_answered_qestions_per_team())
+        return self.answered_questions
+
+    def refresh_scoreboard(self):
+        """
+        Loads points again if they were changed by other worker process.
+        :return: scoreboard.Scoreboard
+        """
+        if self._shared_state is not None:
+            results_version = self._shared_state.get_results_version()
+            if results_version != self._results_version:
+                self.scoreboard.reset(self.get_points_per_team())
+                self._results_version = results_version
+        return self.scoreboard
+
+    def _add_points(self, team_id, points):
+        self.scoreboard.add_points(team_id, points)
+        if points and self._shared_state is not None:
+            self._shared_state.increment_results_version()
 
     def get_team_ids_from_answer_tabe(self):
         teams_query = 'SELECT DISTINCT TEAM_ID FROM {0}'.format(self._db_answer_table)
@@ -107,20 +231,34 @@ class DataManager():
         primary_team_list = [team_id[0] for team_id in primary_response]
         return primary_team_list
 
+    def get_first_correct_answers(self):
+        """
+        Returns IDs of questions which already got correct answer. Index is loaded once from RESULTS
+        (closed question answers with points) and updated by process_answer and recompute_results.
+        :return: common.FirstCorrectAnswerIndex
+        """
+        if self.first_correct_answers is None:
+            if self._shared_state is not None:
+                # filled when worker was registered
+                self.first_correct_answers = shared_state.SharedFirstCorrectAnswerIndex(self._shared_state)
+            else:
+                self.first_correct_answers = common.FirstCorrectAnswerIndex(self._get_correctly_answered_question_ids())
+        return self.first_correct_answers
+
+    def _get_correctly_answered_question_ids(self):
+        query = "SELECT DISTINCT QUESTION_ID FROM {0} " \
+                "WHERE BUG_GUID = 'NULL' AND QUESTION_GUID <> 'NULL' AND BASE_POINTS > 0".format(self._db_results_table)
+        return [row[0] for row in self._stream_query(self._result_pool, query)]
+
     def get_answered_qestions_per_team(self):
         """
-        Returns list of id of answered questions per team.
-        :return: dictionary of primary table - {team_1: [1, 2, ...], team_2: [3, 7, ...], ...}
+        Returns set of id of answered questions per team.
+        :return: dictionary of primary table - {team_1: {'1', '2', ...}, team_2: {'3', '7', ...}, ...}
         """
-        query = "SELECT DISTINCT QUESTION_ID FROM {0} WHERE TEAM_ID = ?".format(self._db_answer_table)
-        primary_team_list = self.get_team_ids_from_answer_tabe()
+        query = "SELECT DISTINCT TEAM_ID, QUESTION_ID FROM {0}".format(self._db_answer_table)
         primary_answers_table = dict()
-        for team_id in primary_team_list:
-            params = (team_id,)
-            failure, primary_response = self._execute_databank_query(query, params=params)
-            primary_question_list = [question_id[0] for question_id in primary_response]
-            primary_answers_table[team_id] = primary_question_list
-
+        for team_id, question_id in self._stream_query(self._primary_pool, query):
+            primary_answers_table.setdefault(team_id, set()).add(question_id)
         return primary_answers_table
 
     def get_number_of_bugs_in_databases(self):
@@ -144,43 +282,168 @@ class DataManager():
         number_of_bugs = self.get_number_of_bugs_in_databases()
         return number_of_bugs
 
-    def _update_counter(self):
-        if self._bugs_counter == 0:  # first bug added after server restart
-            self._bugs_counter = self.get_number_of_bugs()
-        self._bugs_counter += 1
+    def get_points_per_team(self, connection=None):
+        """
+        Returns sum of all points per team from RESULTS table.
+        :param: connection - connection to results database, taken from pool if not given
+        :return: dictionary where key is team ID and value is number of points
+        """
+        query = "SELECT TEAM_ID, total(BASE_POINTS) + total(BONUS_FOR_FIRST) + total(BONUS_FOR_UNIQUE) + total(OTHER_BONUS) " \
+                "FROM {0} GROUP BY TEAM_ID".format(self._db_results_table)
+        if connection is None:
+            rows = self._stream_query(self._result_pool, query)
+        else:
+            rows = connection.execute(query)
+        points_per_team = dict()
+        for team_id, points in rows:
+            points_per_team[team_id] = points
+        return points_per_team
 
     def get_results(self, teams):
         team_results_dict = dict()
+        team_names_by_id = dict()
         for team in teams:
             team_results_dict[team] = 0.0
-        points_query = "SELECT team_id, sum(BASE_POINTS), sum(BONUS_FOR_FIRST), sum(BONUS_FOR_UNIQUE), sum(OTHER_BONUS)" \
-                       "FROM RESULTS group by TEAM_ID"
-        query = points_query.format(self._db_results_table)
-        failure, response = self._execute_result_query(query)
-        for row in response:
-            team_name = [team_name for team_name in teams if teams[team_name]['id'] == row[0]]
-            if len(team_name) == 1:
-                team_results_dict[team_name[0]] = sum(row[1:])
+            team_names_by_id[teams[team]['id']] = team
+        for team_id, points in self.get_points_per_team().items():
+            if team_id in team_names_by_id:
+                team_results_dict[team_names_by_id[team_id]] = points
 
         return team_results_dict
 
-    def get_all_answers(self):
-        query = "SELECT * FROM ANSWERS"
-        failure, primary_response = self._execute_databank_query(query)
+    def _get_filter(self, **columns):
+        """
+        Returns WHERE clause and params for columns which values are not None.
+        """
+        conditions = list()
+        params = list()
+        for column in sorted(columns):
+            if columns[column] is not None:
+                conditions.append("{0} = ?".format(column))
+                params.append(str(columns[column]))
+        if len(conditions) == 0:
+            return "", None
+        return " WHERE " + " AND ".join(conditions), tuple(params)
+
+    def get_all_answers(self, team_id=None, question_id=None):
+        where, params = self._get_filter(TEAM_ID=team_id, QUESTION_ID=question_id)
+        query = "SELECT QUESTION_ID, QUESTION_GUID, CREATED_DATE_TIME, TEAM_ID, ANSWER_CONTENT FROM ANSWERS" + where
+        failure, primary_response = self._execute_databank_query(query, params=params)
         return primary_response
 
-    def get_bugs(self):
-        # answers = list()
-        query = "SELECT * FROM BUGS"
-        failure, primary_response = self._execute_databank_query(query)
+    def get_bugs(self, team_id=None):
+        where, params = self._get_filter(TEAM_ID=team_id)
+        query = "SELECT ID, BUG_GUID, CREATED_DATE_TIME, TEAM_ID, BUG_CONTENT FROM BUGS" + where
+        failure, primary_response = self._execute_databank_query(query, params=params)
         return primary_response
 
-    def get_already_checked_answers(self):
-        query = "SELECT * FROM RESULTS WHERE ALREADY_CHECKED > 0"
-        failure, primary_response = self._execute_result_query(query)
+    def get_already_checked_answers(self, team_id=None):
+        where, params = self._get_filter(TEAM_ID=team_id)
+        query = "SELECT * FROM RESULTS WHERE ALREADY_CHECKED > 0" + where.replace(" WHERE ", " AND ")
+        failure, primary_response = self._execute_result_query(query, params=params)
         return primary_response
 
-    def insert_answer_result(self, team_id, question_id, question_guid, points=0):
+    def _get_verification_query(self, columns, open_question_ids, already_checked, team_id, question_id):
+        """
+        Returns query of bugs and answers for open questions, each joined with its latest checked result
+        from RESULTS database attached as RESULTS_DB, and its params. Marked answers have their GUID
+        in BUG_GUID or QUESTION_GUID column of result (see mark_bug and mark_question_answer).
+        """
+        marks = ""
+        marked = "R.ROWID IS NULL"
+        if already_checked:
+            marks = ", R.BASE_POINTS, R.BONUS_FOR_FIRST, R.BONUS_FOR_UNIQUE, R.OTHER_BONUS, R.COMMENT"
+            marked = "R.ROWID IS NOT NULL"
+        selects = list()
+        params = list()
+        if question_id is None:
+            query = "SELECT 0 AS KIND, B.ROWID AS ROW_NUMBER, 'NULL', B.ID, B.BUG_GUID, B.CREATED_DATE_TIME, " \
+                    "B.TEAM_ID, B.BUG_CONTENT{0} FROM BUGS B LEFT JOIN RESULTS_DB.RESULTS R ON R.ROWID = " \
+                    "(SELECT max(ROWID) FROM RESULTS_DB.RESULTS " \
+                    "WHERE (BUG_GUID = B.BUG_GUID OR QUESTION_GUID = B.BUG_GUID) AND ALREADY_CHECKED > 0) " \
+                    "WHERE {1}".format(marks, marked)
+            if team_id is not None:
+                query += " AND B.TEAM_ID = ?"
+                params.append(str(team_id))
+            selects.append(query)
+        if open_question_ids:
+            query = "SELECT 1 AS KIND, A.ROWID AS ROW_NUMBER, CAST(A.QUESTION_ID AS INTEGER), A.QUESTION_ID, " \
+                    "A.QUESTION_GUID, A.CREATED_DATE_TIME, A.TEAM_ID, A.ANSWER_CONTENT{0} FROM ANSWERS A " \
+                    "LEFT JOIN RESULTS_DB.RESULTS R ON R.ROWID = (SELECT max(ROWID) FROM RESULTS_DB.RESULTS " \
+                    "WHERE (BUG_GUID = A.QUESTION_GUID OR QUESTION_GUID = A.QUESTION_GUID) AND ALREADY_CHECKED > 0) " \
+                    "WHERE {1} AND CAST(A.QUESTION_ID AS INTEGER) IN ({2})".format(
+                        marks, marked, ", ".join("?" * len(open_question_ids)))
+            params.extend(sorted(open_question_ids))
+            if team_id is not None:
+                query += " AND A.TEAM_ID = ?"
+                params.append(str(team_id))
+            if question_id is not None:
+                query += " AND A.QUESTION_ID = ?"
+                params.append(str(question_id))
+            selects.append(query)
+        if not selects:
+            return None, None
+        return "SELECT {0} FROM ({1})".format(columns, " UNION ALL ".join(selects)), tuple(params)
+
+    def _execute_query_with_results(self, query, params):
+        """
+        Executes SELECT on connection of primary database with RESULTS database attached as RESULTS_DB.
+        :return: bool (failure)
+        :return: response from database
+        """
+        failure = False
+        response = None
+        start = time.perf_counter()
+        try:
+            with self._primary_pool.connection() as connection:
+                connection.execute("ATTACH DATABASE ? AS RESULTS_DB", (self._result_pool.db_path,))
+                try:
+                    response = connection.execute(query, params).fetchall()
+                finally:
+                    connection.execute("DETACH DATABASE RESULTS_DB")
+        except Exception as ex:
+            logger.console_fatal(ex)
+            failure = True
+            response = ex
+        self._observe_query(self._primary_pool, query, start, response, failure)
+        logger.query(query, response)
+        return failure, response
+
+    def get_number_of_verification_answers(self, open_question_ids, already_checked, team_id=None, question_id=None):
+        """
+        :return: number of bugs and answers returned by get_verification_answers without limit
+        """
+        query, params = self._get_verification_query("count(*)", open_question_ids, already_checked,
+                                                     team_id, question_id)
+        if query is None:
+            return 0
+        failure, response = self._execute_query_with_results(query, params)
+        return 0 if failure else response[0][0]
+
+    def get_verification_answers(self, open_question_ids, already_checked, team_id=None, question_id=None,
+                                 limit=-1, offset=0):
+        """
+        Returns bugs and then answers for open questions in order they were added, joined with marks
+        of their latest checked result. Filters and page are applied in SQL.
+        :param: open_question_ids - answers for other questions are skipped
+        :param: already_checked - if True only marked bugs and answers are returned, otherwise only not marked
+        :param: team_id - optional filter
+        :param: question_id - optional filter, bugs are skipped if given
+        :param: limit - max number of returned rows, -1 for all
+        :param: offset - number of skipped rows
+        :return: list of tuples (question_id, id, guid, creation_time, team_id, content[, marks])
+        """
+        query, params = self._get_verification_query("*", open_question_ids, already_checked,
+                                                     team_id, question_id)
+        if query is None:
+            return list()
+        failure, response = self._execute_query_with_results(query + " ORDER BY KIND, ROW_NUMBER LIMIT ? OFFSET ?",
+                                                             params + (int(limit), int(offset)))
+        if failure:
+            return list()
+        return [row[2:] for row in response]
+
+    def insert_answer_result(self, team_id, question_id, question_guid, points=0, bonus_for_first=0):
         """
         Adds answer to DB or/and file.
         :param: team_id
@@ -188,17 +451,119 @@ class DataManager():
         :param: question_guid
         :param: answer_content
         :param: points=0
+        :param: bonus_for_first=0 - bonus for the quickest correct answer
         :return: failure, response
         """
         creation_time = common.get_date_time()
         bug_id = 'NULL'
         bug_guid = 'NULL'
         comment = 'NULL'
-        bonus_for_first = bonus_for_unique = other_bonus = 0
+        bonus_for_unique = other_bonus = 0
         return self._insert_answer_result_to_db(team_id, bug_id, bug_guid, question_id, question_guid, creation_time, \
                     base_points=points, bonus_for_first=bonus_for_first, bonus_for_unique=bonus_for_unique, \
                     other_bonus=other_bonus, comment=comment)
 
+    def recompute_results(self, grading_engine, quickest_answer_bonus=0, batch_size=1000):
+        """
+        Grades all closed question answers again, e.g. after correct answer or quickest_answer_bonus was changed,
+        and rewrites their base points and bonus for first correct answer in RESULTS.
+        Answers are read in order they were added, so first correct answer of each question is found in one pass.
+        Each batch is committed in own transaction, so results written in parallel wait at most for one batch.
+        Run which failed can be repeated, rows which are already correct are not changed.
+        :param: grading_engine - grading.GradingEngine
+        :param: quickest_answer_bonus - part of question points added to first correct answer
+        :param: batch_size - number of answers graded and written at once
+        :return: dictionary with number of answers, changed and inserted rows, time and speed
+        """
+        start = time.time()
+        query = "SELECT TEAM_ID, QUESTION_ID, QUESTION_GUID, CREATED_DATE_TIME, ANSWER_CONTENT, CREATED_TS " \
+                "FROM {0} ORDER BY CREATED_TS".format(self._db_answer_table)
+        stats = {"answers": 0, "closed_answers": 0, "correct_answers": 0, "changed_rows": 0, "inserted_rows": 0}
+        answered_correctly = set()  # IDs of questions which already have first correct answer
+        batch = list()
+        for row in self._stream_query(self._primary_pool, query, batch_size=batch_size):
+            stats["answers"] += 1
+            was_parsed, value = common.get_float_from_string(row[1])
+            if not was_parsed or int(value) not in grading_engine.answer_keys:
+                continue
+            batch.append(row)
+            if len(batch) >= batch_size:
+                self._write_recomputed_results(grading_engine, quickest_answer_bonus, batch, answered_correctly, stats)
+                batch = list()
+        self._write_recomputed_results(grading_engine, quickest_answer_bonus, batch, answered_correctly, stats)
+        if stats["changed_rows"] or stats["inserted_rows"]:
+            with self._results_update_lock, self._result_pool.connection() as connection:
+                self._reset_scoreboard(connection)
+        if self.first_correct_answers is not None:
+            self.first_correct_answers.reset(answered_correctly)
+        stats["seconds"] = time.time() - start
+        stats["rows_per_second"] = stats["answers"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+        return stats
+
+    def _write_recomputed_results(self, grading_engine, quickest_answer_bonus, answers, answered_correctly, stats):
+        """
+        Writes results of given answers in one transaction.
+        :param: answers - list of ANSWERS rows: (team_id, question_id, question_guid, creation_time, answer_content,
+                          created_ts)
+        :param: answered_correctly - set of question IDs which already have first correct answer, updated
+        """
+        if not answers:
+            return
+        grades = grading_engine.grade_many((row[1], self._decode_content(row[4])) for row in answers)
+        update_params = list()
+        insert_params = list()
+        for (team_id, question_id, question_guid, creation_time, _, created_ts), (is_correct, points) in zip(answers, grades):
+            bonus_for_first = 0
+            if is_correct:
+                stats["correct_answers"] += 1
+                if int(question_id) not in answered_correctly:
+                    answered_correctly.add(int(question_id))
+                    bonus_for_first = points * quickest_answer_bonus
+            update_params.append((str(points), str(bonus_for_first), str(question_guid), str(points), str(bonus_for_first)))
+            insert_params.append((self._id_generator.next_id(), str(team_id), str(question_guid), str(question_id),
+                                  'NULL', 'NULL', str(creation_time), str(points), str(bonus_for_first), '0', '0',
+                                  str('NULL'.encode('utf-8')), '1', created_ts, str(question_guid)))
+        stats["closed_answers"] += len(answers)
+        with self._results_update_lock, self._result_pool.connection() as connection, connection:
+            stats["changed_rows"] += connection.executemany(
+                "UPDATE {0} SET BASE_POINTS = ?, BONUS_FOR_FIRST = ? "
+                "WHERE QUESTION_GUID = ? AND BUG_GUID = 'NULL' "
+                "AND (BASE_POINTS IS NOT ? OR BONUS_FOR_FIRST IS NOT ?)".format(self._db_results_table),
+                update_params).rowcount
+            # answers without result, e.g. when result insert failed
+            stats["inserted_rows"] += connection.executemany(
+                "INSERT INTO {0} (ID, TEAM_ID, QUESTION_GUID, QUESTION_ID, BUG_GUID, BUG_ID, CREATED_DATE_TIME, "
+                "BASE_POINTS, BONUS_FOR_FIRST, BONUS_FOR_UNIQUE, OTHER_BONUS, COMMENT, ALREADY_CHECKED, CREATED_TS) "
+                "SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ? "
+                "WHERE NOT EXISTS (SELECT 1 FROM {0} WHERE QUESTION_GUID = ?)".format(self._db_results_table),
+                insert_params).rowcount
+
+    @staticmethod
+    def _decode_content(content):
+        """
+        Bugs and answers are saved as text of encoded content, e.g. "b'answer'".
+        :return: str
+        """
+        if isinstance(content, str) and content[:2] in ("b'", 'b"'):
+            if '\\' not in content:
+                # no escaped characters
+                return content[2:-1]
+            try:
+                content = ast.literal_eval(content)
+            except (ValueError, SyntaxError):
+                return content
+        if isinstance(content, bytes):
+            return content.decode('utf-8', errors='replace')
+        return content
+
+    def _reset_scoreboard(self, connection=None):
+        """
+        :param: connection - connection to results database, taken from pool if not given
+        """
+        self.scoreboard.reset(self.get_points_per_team(connection))
+        if self._shared_state is not None:
+            self._shared_state.increment_results_version()
+
     def mark_bug(self, team_id, question_id, bug_id, bug_guid, base_points,
                  bonus_for_first, bonus_for_unique, other_bonus, comment):
         """
@@ -233,13 +598,15 @@ class DataManager():
         :return: db_response
         :return: file_response
         :return: creation_time
-        :return: self._bugs_counter
+        :return: answer_id
         :return: question_guid
         """
         question_guid = uuid.uuid4()
         creation_time = common.get_date_time()
+        answer_id = self._id_generator.next_id()
+        created_ts = self._id_generator.timestamp_us()
 
-        self._update_counter()
+        db_failure = primary_response = file_response = None
         if add_to_file == True:
             if open_question is True:
                 file_path = self._open_questions_files_path
@@ -248,10 +615,13 @@ class DataManager():
             file_response = self._insert_answer_to_file(team_id, question_id, answer_content, question_guid, creation_time, file_path=file_path)
         # TODO: delete old answer if change in answers is allowed
         if add_to_db == True:
-            db_failure, primary_response = self._insert_answer_to_db(team_id, question_id, answer_content, question_guid, creation_time)
-        logger.console(u"Answer added. Responses: db_response: {0}. file_response: {1}, creation_time: {2}, {3}".format(primary_response, \
-                                                                    file_response, creation_time, self._bugs_counter))
-        return db_failure, file_response, creation_time, self._bugs_counter, question_guid
+            db_failure, primary_response = self._insert_answer_to_db(team_id, answer_id, question_id, answer_content,
+                                                                     question_guid, creation_time, created_ts)
+            if db_failure is False and self.answered_questions is not None:
+                self.answered_questions.add(team_id, question_id)
+        logger.console(u"Answer added. Responses: db_response: %s. file_response: %s, creation_time: %s, %s", primary_response,
+                       file_response, creation_time, answer_id)
+        return db_failure, file_response, creation_time, answer_id, question_guid
 
     def add_bug(self, team_id, bug_content, add_to_db=True, add_to_file=True):
         """
@@ -263,43 +633,50 @@ class DataManager():
         :return: db_response
         :return: file_response
         :return: creation_time
-        :return: self._bugs_counter
+        :return: bug_id
         """
         bug_guid = str(uuid.uuid4())
         creation_time = common.get_date_time()
+        bug_id = self._id_generator.next_id()
+        created_ts = self._id_generator.timestamp_us()
 
-        self._update_counter()
+        db_failure = primary_response = file_response = None
 
         if add_to_file == True:
-            file_response = self._insert_bug_to_file(team_id, self._bugs_counter, bug_content, bug_guid, creation_time)
+            file_response = self._insert_bug_to_file(team_id, bug_id, bug_content, bug_guid, creation_time)
         if add_to_db == True:
-            db_failure, primary_response = self._insert_bug_to_db(team_id, bug_content, bug_guid, creation_time)
-        logger.console(u"Bug added. Responses: db_response: {0}. file_response: {1}, creation_time: {2}, {3}".format(primary_response, \
-                                                                    file_response, creation_time, self._bugs_counter))
-        return db_failure, file_response, creation_time, self._bugs_counter
-
-    def _insert_bug_to_db(self, team_id, bug_content, bug_guid, creation_time):
-        query = "INSERT INTO {0} (ID, BUG_GUID, CREATED_DATE_TIME, TEAM_ID, BUG_CONTENT) \
-                VALUES(?, ?, ?, ?, ?)".format(self._db_table)
+            db_failure, primary_response = self._insert_bug_to_db(team_id, bug_id, bug_content, bug_guid, creation_time,
+                                                                  created_ts)
+        logger.console(u"Bug added. Responses: db_response: %s. file_response: %s, creation_time: %s, %s", primary_response,
+                       file_response, creation_time, bug_id)
+        return db_failure, file_response, creation_time, bug_id
+
+    def _insert_bug_to_db(self, team_id, bug_id, bug_content, bug_guid, creation_time, created_ts):
+        query = "INSERT INTO {0} (ID, BUG_GUID, CREATED_DATE_TIME, TEAM_ID, BUG_CONTENT, CREATED_TS) \
+                VALUES(?, ?, ?, ?, ?, ?)".format(self._db_table)
         params = (
-            self._bugs_counter,
+            bug_id,
             bug_guid,
             str(creation_time),
             str(team_id),
-            str(bug_content.encode('utf-8')),)
-        failure, primary_response = self._execute_databank_query(query, params=params)
+            str(bug_content.encode('utf-8')),
+            created_ts,)
+        failure, primary_response = self._execute_write(self._primary_writer, self._primary_pool, query, params)
         return failure, primary_response
 
-    def _insert_answer_to_db(self, team_id, question_id, answer_content, question_guid, creation_time):
-        query = "INSERT INTO {0} (QUESTION_ID, QUESTION_GUID, CREATED_DATE_TIME, TEAM_ID, ANSWER_CONTENT) \
-                 VALUES(?, ?, ?, ?, ?)".format(self._db_answer_table)
+    def _insert_answer_to_db(self, team_id, answer_id, question_id, answer_content, question_guid, creation_time,
+                             created_ts):
+        query = "INSERT INTO {0} (QUESTION_ID, QUESTION_GUID, CREATED_DATE_TIME, TEAM_ID, ANSWER_CONTENT, ID, CREATED_TS) \
+                 VALUES(?, ?, ?, ?, ?, ?, ?)".format(self._db_answer_table)
         params = (
             str(question_id),
             str(question_guid),
             str(creation_time),
             str(team_id),
-            str(answer_content.encode('utf-8')),)
-        failure, primary_response = self._execute_databank_query(query, params=params)
+            str(answer_content.encode('utf-8')),
+            answer_id,
+            created_ts,)
+        failure, primary_response = self._execute_write(self._primary_writer, self._primary_pool, query, params)
         return failure, primary_response
 
     def _update_answer_result_to_db(self, team_id, bug_guid,
@@ -321,7 +698,15 @@ class DataManager():
                 str(team_id),
                 str(bug_guid)
                 ,)
-        failure, response = self._execute_result_query(query, params=params)
+        with self._results_update_lock:
+            old_points_query = "SELECT total(BASE_POINTS) + total(BONUS_FOR_FIRST) + total(BONUS_FOR_UNIQUE) + total(OTHER_BONUS) " \
+                               "FROM {0} WHERE BUG_GUID = ? AND TEAM_ID = ?".format(self._db_results_table)
+            failure, response = self._execute_result_query(old_points_query, params=(str(bug_guid), str(team_id)))
+            old_points = response[0][0] if failure is False and isinstance(response, list) and response[0][0] else 0.0
+            failure, response = self._execute_result_query(query, params=params)
+            if failure is False and not isinstance(response, Exception):
+                self._add_points(str(team_id), self._sum_points(base_points, bonus_for_first,
+                                                                bonus_for_unique, other_bonus) - old_points)
         return failure, response
 
     def _insert_answer_result_to_db(self, team_id, bug_id, bug_guid, question_id, question_guid, \
@@ -348,10 +733,11 @@ class DataManager():
                 "BONUS_FOR_UNIQUE," \
                 "OTHER_BONUS," \
                 "COMMENT," \
-                "ALREADY_CHECKED)"\
-                "VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)".format(self._db_results_table)
+                "ALREADY_CHECKED," \
+                "CREATED_TS)"\
+                "VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)".format(self._db_results_table)
         params = (
-                self._bugs_counter,
+                self._id_generator.next_id(),
                 str(team_id),
                 str(question_guid),
                 str(question_id),
@@ -363,35 +749,66 @@ class DataManager():
                 str(bonus_for_unique),
                 str(other_bonus),
                 str(comment.encode('utf-8')),
-                "1"
+                "1",
+                self._id_generator.timestamp_us()
                 ,)
-        failure, response = self._execute_result_query(query, params=params)
+        failure, response = self._execute_write(self._result_writer, self._result_pool, query, params)
+        if failure is False and not isinstance(response, Exception):
+            self._add_points(str(team_id), self._sum_points(base_points, bonus_for_first,
+                                                            bonus_for_unique, other_bonus))
         return failure, response
 
-    def _insert_bug_to_file(self, team_id, bug_id, bug_content, bug_guid, creation_time):
+    def _sum_points(self, *points):
+        """
+        Sums points the same way database does - values which are not numbers are counted as 0.
+        """
+        points_sum = 0.0
+        for value in points:
+            if value is not None:
+                was_parsed, value = common.get_float_from_string(value)
+                points_sum += value
+        return points_sum
+
+    def _write_file(self, directory, file_name, content, guid, kind):
+        """
+        Writes file by file mirror if enabled, otherwise directly.
+        :param: kind - bug or answer, label of file write metrics
+        :return: bool - True if file was written or queued
+        :return: exception or None
+        """
+        if self._metrics is None:
+            return self._write_file_now(directory, file_name, content, guid)
+        start = time.perf_counter()
         try:
-            file_name = os.path.join(self._bug_files_path, '{0}_{1}_{2}_{3}.txt'.format(self._bugs_counter, \
-                                                                        str(creation_time.replace(":", "_")), team_id, bug_guid))
-            file_handler = open(file_name, "wb")
-            logger.console(u"Writing to file: '{0}' content:'{1}'".format(file_name, bug_content))
-            file_handler.write(self._format_bug_file_content(team_id, bug_id, bug_content, bug_guid, creation_time).encode('utf-8'))
-            file_handler.close()
-            return True, None
-        except IOError as exc:
-            return False, exc
+            return self._write_file_now(directory, file_name, content, guid)
+        finally:
+            self._metrics.file_write_latency.observe(time.perf_counter() - start, (kind,))
 
-    def _insert_answer_to_file(self, team_id, question_id, answer_content, question_guid, creation_time, file_path):
+    def _write_file_now(self, directory, file_name, content, guid):
+        if self._file_mirror is not None:
+            return self._file_mirror.write(directory, file_name, content, shard_key=guid)
         try:
-            file_name = os.path.join(file_path, '{0}_{1}_{2}_{3}.txt'.format(team_id, question_id, question_guid, \
-                                                                           str(creation_time.replace(":", "_"))))
-            file_handler = open(file_name, "wb")
-            logger.console(u"Writing to file: '{0}', question id: '{1}', content: '{2}'".format(file_name, question_id, answer_content))
-            file_handler.write(self._format_question_answer_file_content(team_id, question_id, answer_content, question_guid, creation_time).encode('utf-8'))
+            file_handler = open(os.path.join(directory, file_name), "wb")
+            file_handler.write(content)
             file_handler.close()
             return True, None
         except IOError as exc:
             return False, exc
 
+    def _insert_bug_to_file(self, team_id, bug_id, bug_content, bug_guid, creation_time):
+        file_name = '{0}_{1}_{2}_{3}.txt'.format(bug_id, str(creation_time.replace(":", "_")), team_id, bug_guid)
+        logger.console(u"Writing to file: '%s' content:'%s'", os.path.join(self._bug_files_path, file_name), bug_content)
+        content = self._format_bug_file_content(team_id, bug_id, bug_content, bug_guid, creation_time).encode('utf-8')
+        return self._write_file(self._bug_files_path, file_name, content, bug_guid, 'bug')
+
+    def _insert_answer_to_file(self, team_id, question_id, answer_content, question_guid, creation_time, file_path):
+        file_name = '{0}_{1}_{2}_{3}.txt'.format(team_id, question_id, question_guid, str(creation_time.replace(":", "_")))
+        logger.console(u"Writing to file: '%s', question id: '%s', content: '%s'", os.path.join(file_path, file_name),
+                       question_id, answer_content)
+        content = self._format_question_answer_file_content(team_id, question_id, answer_content, question_guid,
+                                                            creation_time).encode('utf-8')
+        return self._write_file(file_path, file_name, content, question_guid, 'answer')
+
     def _format_bug_file_content(self, team_id, bug_id, bug_content, bug_guid, creation_time):
         team_id_part = "team id: {0}".format(team_id)
         bug_id_part = "bug id: {0}".format(bug_id)
@@ -409,11 +826,12 @@ class DataManager():
         return "\r\n".join([team_id_part, bug_id_part, bug_guid_part, creation_time_part, content_part])
 
     def check_if_answer_in_results(self, team_id, question_guid, question_id=''):
-        query = "SELECT * FROM {0} \
-                 WHERE TEAM_ID = ? AND ((QUESTION_GUID = ? AND QUESTION_ID = ?)" \
-                "OR (BUG_GUID = ?))".format( self._db_results_table)
+        # UNION instead of OR, so both parts are searched by GUID index
+        query = "SELECT 1 FROM {0} WHERE QUESTION_GUID = ? AND TEAM_ID = ? AND QUESTION_ID = ? " \
+                "UNION ALL " \
+                "SELECT 1 FROM {0} WHERE BUG_GUID = ? AND TEAM_ID = ? LIMIT 1".format(self._db_results_table)
         params = (
-            team_id, str(question_guid), question_id, str(question_guid))
+            str(question_guid), team_id, question_id, str(question_guid), team_id)
         failure, response = self._execute_result_query(query, params)
         return len(response) > 0
 
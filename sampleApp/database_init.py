@@ -1,3 +1,4 @@
+import argparse
 import os
 
 from common import database_connect
@@ -5,6 +6,77 @@ from common import database_connect
 primary_db_path = os.path.join(os.path.dirname(__file__), "database/primary.db")
 results_db_path = os.path.join(os.path.dirname(__file__), "database/results.db")
 
+# Schema migrations. Position on the list (+1) is the schema version stored in PRAGMA user_version,
+# so new migrations must always be appended at the end.
+PRIMARY_MIGRATIONS = [
+    # 1: GUID uniqueness and indexes for duplicate answer checks
+    ["CREATE UNIQUE INDEX IF NOT EXISTS BUGS_BUG_GUID_IDX ON BUGS (BUG_GUID)",
+     "CREATE UNIQUE INDEX IF NOT EXISTS ANSWERS_QUESTION_GUID_IDX ON ANSWERS (QUESTION_GUID)",
+     "CREATE INDEX IF NOT EXISTS ANSWERS_TEAM_ID_QUESTION_ID_IDX ON ANSWERS (TEAM_ID, QUESTION_ID)"],
+    # 2: Sortable IDs (id_generator.IdGenerator) and creation time in microseconds since 1970 (CREATED_TS).
+    # Time of existing rows is not known precisely, so they get their ROWID, which keeps them in order
+    # they were added and before all new rows.
+    ["ALTER TABLE BUGS ADD COLUMN CREATED_TS INTEGER",
+     "ALTER TABLE ANSWERS ADD COLUMN ID INTEGER",
+     "ALTER TABLE ANSWERS ADD COLUMN CREATED_TS INTEGER",
+     "UPDATE BUGS SET CREATED_TS = ROWID",
+     "UPDATE ANSWERS SET CREATED_TS = ROWID, ID = ROWID",
+     "CREATE INDEX IF NOT EXISTS BUGS_CREATED_TS_IDX ON BUGS (CREATED_TS)",
+     "CREATE INDEX IF NOT EXISTS ANSWERS_CREATED_TS_IDX ON ANSWERS (CREATED_TS)",
+     "CREATE INDEX IF NOT EXISTS ANSWERS_QUESTION_ID_CREATED_TS_IDX ON ANSWERS (QUESTION_ID, CREATED_TS)"],
+]
+
+RESULTS_MIGRATIONS = [
+    # 1: GUID uniqueness, lookups by GUID and covering index for points summed per team.
+    # 'NULL' string is written to GUID column which does not apply to given row (bug or answer).
+    ["CREATE UNIQUE INDEX IF NOT EXISTS RESULTS_BUG_GUID_UNIQUE_IDX ON RESULTS (BUG_GUID) WHERE BUG_GUID <> 'NULL'",
+     "CREATE UNIQUE INDEX IF NOT EXISTS RESULTS_QUESTION_GUID_UNIQUE_IDX ON RESULTS (QUESTION_GUID) "
+     "WHERE QUESTION_GUID <> 'NULL'",
+     "CREATE INDEX IF NOT EXISTS RESULTS_BUG_GUID_IDX ON RESULTS (BUG_GUID)",
+     "CREATE INDEX IF NOT EXISTS RESULTS_QUESTION_GUID_IDX ON RESULTS (QUESTION_GUID)",
+     "CREATE INDEX IF NOT EXISTS RESULTS_TEAM_ID_IDX ON RESULTS (TEAM_ID, QUESTION_ID, "
+     "BASE_POINTS, BONUS_FOR_FIRST, BONUS_FOR_UNIQUE, OTHER_BONUS)"],
+    # 2: Creation time in microseconds since 1970, existing rows get their ROWID (see PRIMARY_MIGRATIONS)
+    ["ALTER TABLE RESULTS ADD COLUMN CREATED_TS INTEGER",
+     "UPDATE RESULTS SET CREATED_TS = ROWID",
+     "CREATE INDEX IF NOT EXISTS RESULTS_QUESTION_ID_CREATED_TS_IDX ON RESULTS (QUESTION_ID, CREATED_TS)"],
+]
+
+
+def get_schema_version(cursor):
+    cursor.execute("PRAGMA user_version")
+    return cursor.fetchone()[0]
+
+
+def migrate(cursor, connection, migrations):
+    """
+    Applies migrations which were not applied yet. Each migration is applied in own transaction
+    together with the version change, so failed migration leaves database at previous version.
+    :param: cursor
+    :param: connection
+    :param: migrations - list of lists of statements
+    :return: schema version
+    """
+    version = get_schema_version(cursor)
+    isolation_level = connection.isolation_level
+    connection.isolation_level = None
+    try:
+        for new_version in range(version + 1, len(migrations) + 1):
+            cursor.execute("BEGIN")
+            try:
+                for statement in migrations[new_version - 1]:
+                    cursor.execute(statement)
+                cursor.execute("PRAGMA user_version = {0}".format(new_version))
+                cursor.execute("COMMIT")
+            except Exception as ex:
+                cursor.execute("ROLLBACK")
+                raise Exception("Migration to schema version {0} failed: {1}".format(new_version, ex))
+            version = new_version
+    finally:
+        connection.isolation_level = isolation_level
+    return version
+
+
 def init(primary_db_path, results_db_path):
     primary_cursor, primary_connect = database_connect(primary_db_path)
     results_cursor, results_connect = database_connect(results_db_path)
@@ -41,5 +113,17 @@ def init(primary_db_path, results_db_path):
                    "ALREADY_CHECKED BOOL INT)"
     results_cursor.execute(create_query)
 
+    try:
+        migrate(primary_cursor, primary_connect, PRIMARY_MIGRATIONS)
+        migrate(results_cursor, results_connect, RESULTS_MIGRATIONS)
+    finally:
+        primary_connect.close()
+        results_connect.close()
+
+
 if __name__ == '__main__':
-    init(primary_db_path, results_db_path)
+    parser = argparse.ArgumentParser(description="Creates databases or upgrades existing ones to the latest schema.")
+    parser.add_argument("primary_db_path", nargs="?", default=primary_db_path)
+    parser.add_argument("results_db_path", nargs="?", default=results_db_path)
+    args = parser.parse_args()
+    init(args.primary_db_path, args.results_db_path)
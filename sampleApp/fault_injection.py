@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+import http.client
+import random
+import sys
+import threading
+import time
+
+DELAY_DISTRIBUTIONS = ("none", "fixed", "uniform", "exponential")
+DEFAULT_MAX_DELAYED_REQUESTS = 4
+
+
+def is_cooperative():
+    """
+    :return: bool - True if gevent patched time module (gevent workers), so sleep only switches to other requests
+    """
+    monkey = sys.modules.get("gevent.monkey", None)
+    return monkey is not None and monkey.is_module_patched("time")
+
+
+class FaultRule(object):
+    """
+    Delay and error rate of one endpoint.
+    """
+    def __init__(self, delay="none", seconds=0, min_seconds=0, max_seconds=0, mean_seconds=0, error_rate=0,
+                 error_code=http.client.INTERNAL_SERVER_ERROR):
+        """
+        :param: delay - distribution of delay: none, fixed (seconds), uniform (min_seconds - max_seconds),
+                        exponential (mean_seconds)
+        :param: error_rate - part of requests (0 - 1) which get error_code response
+        :param: error_code - HTTP status code of injected error
+        """
+        if delay not in DELAY_DISTRIBUTIONS:
+            raise ValueError("Unknown delay distribution: '{0}', expected one of: {1}".format(delay, DELAY_DISTRIBUTIONS))
+        if not 0 <= float(error_rate) <= 1:
+            raise ValueError("Error rate has to be between 0 and 1, actual: {0}".format(error_rate))
+        self.delay = delay
+        self.seconds = float(seconds)
+        self.min_seconds = float(min_seconds)
+        self.max_seconds = float(max_seconds)
+        self.mean_seconds = float(mean_seconds)
+        self.error_rate = float(error_rate)
+        self.error_code = int(error_code)
+
+    def get_delay(self, random_generator=random):
+        if self.delay == "fixed":
+            return self.seconds
+        if self.delay == "uniform":
+            return random_generator.uniform(self.min_seconds, self.max_seconds)
+        if self.delay == "exponential" and self.mean_seconds > 0:
+            return random_generator.expovariate(1.0 / self.mean_seconds)
+        return 0.0
+
+    def is_error(self, random_generator=random):
+        return self.error_rate > 0 and random_generator.random() < self.error_rate
+
+    def to_dict(self):
+        return {
+            "delay": self.delay,
+            "seconds": self.seconds,
+            "min_seconds": self.min_seconds,
+            "max_seconds": self.max_seconds,
+            "mean_seconds": self.mean_seconds,
+            "error_rate": self.error_rate,
+            "error_code": self.error_code,
+        }
+
+
+class FaultInjector(object):
+    """
+    Delays and fails requests of configured endpoints to model slow or unstable parts of the service.
+    Rules are loaded from config.yaml and can be changed at runtime.
+
+    Delay keeps request thread busy unless server uses cooperative workers
+    (service_config.server.worker_class : gevent), where sleep only switches to other requests.
+    Otherwise at most max_delayed_requests requests are delayed at once, like a slow dependency with limited
+    number of connections; requests above the limit wait in queue for free slot, so they get longer delay.
+    """
+    def __init__(self, config=None, random_generator=None):
+        """
+        :param: config - dictionary with 'enabled' flag, 'max_delayed_requests' and 'routes', where key
+                         is endpoint name (name of Flask view function) and value is FaultRule parameters
+        """
+        config = config or {}
+        self._lock = threading.Lock()
+        self._random = random_generator or random.Random()
+        self.enabled = bool(config.get("enabled", False))
+        self._rules = dict()
+        for endpoint, rule_config in (config.get("routes", None) or {}).items():
+            self._rules[endpoint] = FaultRule(**rule_config)
+        self.max_delayed_requests = int(config.get("max_delayed_requests", DEFAULT_MAX_DELAYED_REQUESTS))
+        self._delay_slots = threading.BoundedSemaphore(self.max_delayed_requests)
+        self._counters_lock = threading.Lock()
+        self.delayed_requests = 0
+        self.failed_requests = 0
+        self.queued_delays = 0
+
+    def set_rule(self, endpoint, rule_config):
+        """
+        :param: rule_config - FaultRule parameters, None removes rule of endpoint
+        """
+        rule = FaultRule(**rule_config) if rule_config is not None else None
+        with self._lock:
+            if rule is None:
+                self._rules.pop(endpoint, None)
+            else:
+                self._rules[endpoint] = rule
+
+    def get_config(self):
+        return {
+            "enabled": self.enabled,
+            "routes": dict((endpoint, rule.to_dict()) for endpoint, rule in list(self._rules.items())),
+            "max_delayed_requests": self.max_delayed_requests,
+            "delayed_requests": self.delayed_requests,
+            "failed_requests": self.failed_requests,
+            "queued_delays": self.queued_delays,
+        }
+
+    def _increment(self, counter):
+        with self._counters_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def apply(self, endpoint):
+        """
+        Waits for delay of endpoint and decides if request fails.
+        :return: None if request should be processed, otherwise tuple: (message, HTTP status code)
+        """
+        if not self.enabled:
+            return None
+        rule = self._rules.get(endpoint, None)
+        if rule is None:
+            return None
+        delay = rule.get_delay(self._random)
+        if delay > 0:
+            self._increment("delayed_requests")
+            if is_cooperative():
+                time.sleep(delay)
+            else:
+                if not self._delay_slots.acquire(blocking=False):
+                    self._increment("queued_delays")
+                    self._delay_slots.acquire()
+                try:
+                    time.sleep(delay)
+                finally:
+                    self._delay_slots.release()
+        if rule.is_error(self._random):
+            self._increment("failed_requests")
+            return u"Injected error of endpoint '{0}'".format(endpoint), rule.error_code
+        return None
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+import atexit
+import os
+import queue
+import threading
+import time
+
+import logger
+
+_STOP = object()
+
+
+class FileMirror(object):
+    """
+    Writes bug and answer text files in background thread, so requests do not wait for the file system.
+    Queue is bounded - when it is full the request waits for free place (backpressure) and the time
+    spent waiting is counted. All queued files are written on close() and at interpreter exit.
+    """
+    def __init__(self, max_queue_size=10000, batch_size=100, shard_directories=False):
+        """
+        :param: max_queue_size - max number of files waiting to be written
+        :param: batch_size - max number of files taken from the queue at once
+        :param: shard_directories - if True, files are written to subdirectories named after first
+                                    2 characters of shard key (GUID) to keep directories small
+        """
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._batch_size = batch_size
+        self._shard_directories = shard_directories
+        self._created_directories = set()
+
+        self.queued_files = 0
+        self.written_files = 0
+        self.failed_files = 0
+        self.blocked_puts = 0
+        self.blocked_time = 0.0
+        self.max_queue_depth = 0
+
+        self._thread = threading.Thread(target=self._run, name="file-mirror")
+        self._thread.daemon = True
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, directory, file_name, content, shard_key=None):
+        """
+        Queues file to be written.
+        :param: directory
+        :param: file_name
+        :param: content - bytes
+        :param: shard_key - used to choose subdirectory if sharding is enabled
+        :return: bool - True, file is always queued (request waits if queue is full)
+        :return: None
+        """
+        if self._shard_directories and shard_key:
+            directory = os.path.join(directory, str(shard_key)[:2])
+        item = (directory, file_name, content)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            start = time.time()
+            self._queue.put(item)
+            self.blocked_puts += 1
+            self.blocked_time += time.time() - start
+        self.queued_files += 1
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return True, None
+
+    def close(self):
+        """
+        Writes all queued files and stops writer thread.
+        """
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def get_stats(self):
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "queued_files": self.queued_files,
+            "written_files": self.written_files,
+            "failed_files": self.failed_files,
+            "blocked_puts": self.blocked_puts,
+            "blocked_time": self.blocked_time,
+        }
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch = [self._queue.get()]
+            while len(batch) < self._batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if _STOP in batch:
+                stop = True
+                batch = [item for item in batch if item is not _STOP]
+                # files queued after close() was called
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _STOP:
+                        batch.append(item)
+            for directory, file_name, content in batch:
+                self._write_file(directory, file_name, content)
+
+    def _write_file(self, directory, file_name, content):
+        try:
+            if directory not in self._created_directories:
+                if not os.path.isdir(directory):
+                    os.makedirs(directory)
+                self._created_directories.add(directory)
+            with open(os.path.join(directory, file_name), "wb") as file_handler:
+                file_handler.write(content)
+            self.written_files += 1
+        except (IOError, OSError) as exc:
+            self.failed_files += 1
+            logger.console_error(u"Could not write file '{0}'. Reason: {1}".format(os.path.join(directory, file_name), exc))
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+Generates team list, question list and BUGS/ANSWERS/RESULTS rows for performance tests.
+
+Teams send bugs and answers with skewed activity (team on position k of the ranking is 1/k^skew times
+as active as the first one). Answers are spread over the event evenly in time order; when there are more
+answers than team/question pairs, the rest are repeated answers. Part of closed answers is correct and
+the first correct answer of each question gets quickest answer bonus. Part of bugs and open answers is marked.
+Databases must be empty. Rows are loaded in one transaction per database, in which indexes are dropped
+and built again at the end, so failed load leaves databases as they were.
+
+python generate_data.py --teams 100 --questions 50 --bugs 100000 --answers 1000000 --output-dir generated
+"""
+import argparse
+import bisect
+import itertools
+import os
+import random
+import sqlite3
+import string
+import time
+
+import yaml
+
+import database_init
+import id_generator
+
+# Generator is the only writer, so commit is not waited for and temporary data is kept in memory
+RELAXED_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "OFF",
+    "cache_size": -200000,
+    "temp_store": "MEMORY",
+}
+CLOSED_ANSWERS = ("A", "B", "C", "D")
+
+
+def generate_team_ids(number_of_teams):
+    """
+    :return: list of team IDs: AAA, AAB, ..., ZZZ, AAAA, ...
+    """
+    team_ids = list()
+    length = 3
+    while len(team_ids) < number_of_teams:
+        for letters in itertools.product(string.ascii_uppercase, repeat=length):
+            team_ids.append("".join(letters))
+            if len(team_ids) == number_of_teams:
+                break
+        length += 1
+    return team_ids
+
+
+def generate_questions(number_of_questions, open_question_rate, rng):
+    """
+    :return: 'questions' section of question list, where key is question ID
+    """
+    questions = dict()
+    for question_id in range(1, number_of_questions + 1):
+        if rng.random() < open_question_rate:
+            questions[question_id] = {"id": question_id, "content": "content", "type": "open", "points": 2}
+        else:
+            questions[question_id] = {"id": question_id, "content": "content", "type": "closed",
+                                      "answer": rng.choice(CLOSED_ANSWERS), "points": rng.randint(1, 3)}
+    return questions
+
+
+def write_yaml(file_path, data):
+    directory = os.path.dirname(file_path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    with open(file_path, "w") as yaml_file:
+        yaml.safe_dump(data, yaml_file, default_flow_style=False)
+
+
+class RowGenerator(object):
+    """
+    Builds rows of BUGS, ANSWERS and RESULTS tables in the same format as DataManager writes them.
+    """
+    def __init__(self, team_ids, questions, rng, skew=1.1, correct_rate=0.5, marked_rate=0.5,
+                 quickest_answer_bonus=0.2, start_time=None, duration_hours=8):
+        self.team_ids = team_ids
+        self.questions = questions
+        self.question_ids = sorted(questions)
+        self.rng = rng
+        self.correct_rate = correct_rate
+        self.marked_rate = marked_rate
+        self.quickest_answer_bonus = quickest_answer_bonus
+        self.start_ts = int((time.time() - duration_hours * 3600 if start_time is None else start_time) * 1000000)
+        self.duration_us = int(duration_hours * 3600 * 1000000)
+        self._team_cum_weights = list(itertools.accumulate(1.0 / (rank ** skew) for rank in range(1, len(team_ids) + 1)))
+        self._id_generator = id_generator.IdGenerator()
+        self._answered_correctly = set()
+
+    def _guid(self):
+        value = "%032x" % self.rng.getrandbits(128)
+        return "{0}-{1}-4{2}-{3}-{4}".format(value[:8], value[8:12], value[13:16], value[16:20], value[20:])
+
+    def _team_id(self):
+        return self.team_ids[bisect.bisect(self._team_cum_weights, self.rng.random() * self._team_cum_weights[-1])]
+
+    def _times(self, number, total):
+        """
+        :return: tuple: (CREATED_TS, CREATED_DATE_TIME) of number-th of total rows
+        """
+        created_ts = self.start_ts + self.duration_us * number // max(total, 1)
+        return created_ts, time.strftime('%H:%M:%S', time.localtime(created_ts // 1000000))
+
+    def _result(self, team_id, question_guid, question_id, bug_guid, bug_id, created_ts, creation_time,
+                base_points, bonus_for_first=0):
+        return (self._id_generator.next_id(), team_id, question_guid, str(question_id), bug_guid, str(bug_id),
+                creation_time, str(base_points), str(bonus_for_first), '0', '0', str('NULL'.encode('utf-8')), '1',
+                created_ts)
+
+    def bug_rows(self, number, total):
+        """
+        :return: tuple: (BUGS row, RESULTS row or None)
+        """
+        team_id = self._team_id()
+        bug_guid = self._guid()
+        bug_id = self._id_generator.next_id()
+        created_ts, creation_time = self._times(number, total)
+        bug = (bug_id, bug_guid, creation_time, team_id, str(u"bug {0}".format(number).encode('utf-8')), created_ts)
+        result = None
+        if self.rng.random() < self.marked_rate:
+            result = self._result(team_id, 'NULL', 'NULL', bug_guid, bug_id, created_ts, creation_time,
+                                  self.rng.randint(0, 3))
+        return bug, result
+
+    def answer_rows(self, number, total):
+        """
+        :return: tuple: (ANSWERS row, RESULTS row or None)
+        """
+        team_id = self._team_id()
+        question_id = self.rng.choice(self.question_ids)
+        question = self.questions[question_id]
+        question_guid = self._guid()
+        created_ts, creation_time = self._times(number, total)
+        result = None
+        if question["type"] == "closed":
+            is_correct = self.rng.random() < self.correct_rate
+            content = question["answer"] if is_correct else \
+                self.rng.choice([answer for answer in CLOSED_ANSWERS if answer != question["answer"]])
+            points = question["points"] if is_correct else 0
+            bonus_for_first = 0
+            if is_correct and question_id not in self._answered_correctly:
+                self._answered_correctly.add(question_id)
+                bonus_for_first = points * self.quickest_answer_bonus
+            result = self._result(team_id, question_guid, question_id, 'NULL', 'NULL', created_ts, creation_time,
+                                  points, bonus_for_first)
+        else:
+            content = u"open answer {0}".format(number)
+            if self.rng.random() < self.marked_rate:
+                result = self._result(team_id, 'NULL', question_id, question_guid, 'NULL', created_ts, creation_time,
+                                      self.rng.randint(0, question["points"]))
+        answer = (str(question_id), question_guid, creation_time, team_id, str(content.encode('utf-8')),
+                  self._id_generator.next_id(), created_ts)
+        return answer, result
+
+
+def insert_rows(primary_connection, results_connection, row_factory, total, primary_query, chunk_size):
+    """
+    Inserts rows made by row_factory(number, total) with executemany, chunk_size rows at once.
+    :return: number of RESULTS rows
+    """
+    results_query = "INSERT INTO RESULTS (ID, TEAM_ID, QUESTION_GUID, QUESTION_ID, BUG_GUID, BUG_ID, CREATED_DATE_TIME, " \
+                    "BASE_POINTS, BONUS_FOR_FIRST, BONUS_FOR_UNIQUE, OTHER_BONUS, COMMENT, ALREADY_CHECKED, CREATED_TS) " \
+                    "VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    number_of_results = 0
+    for chunk_start in range(0, total, chunk_size):
+        primary_rows = list()
+        results_rows = list()
+        for number in range(chunk_start, min(chunk_start + chunk_size, total)):
+            row, result = row_factory(number, total)
+            primary_rows.append(row)
+            if result is not None:
+                results_rows.append(result)
+        primary_connection.executemany(primary_query, primary_rows)
+        results_connection.executemany(results_query, results_rows)
+        number_of_results += len(results_rows)
+    return number_of_results
+
+
+def connect(db_path):
+    """
+    :return: connection in autocommit mode, transactions are started and ended explicitly
+    """
+    connection = sqlite3.connect(db_path, isolation_level=None)
+    for name, value in RELAXED_PRAGMAS.items():
+        connection.execute("PRAGMA {0} = {1}".format(name, value))
+    return connection
+
+
+def check_empty(connection, tables):
+    """
+    Generated GUIDs are repeated by the next run with the same seed, so rows are never added to existing ones.
+    """
+    for table in tables:
+        if connection.execute("SELECT 1 FROM {0} LIMIT 1".format(table)).fetchone() is not None:
+            raise Exception("Table {0} is not empty, data can be generated only into empty databases".format(table))
+
+
+def drop_indexes(connection):
+    """
+    Index built once from sorted rows is much faster than index updated on every insert of random GUID.
+    :return: list of CREATE INDEX statements of dropped indexes
+    """
+    indexes = connection.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL").fetchall()
+    for name, _ in indexes:
+        connection.execute("DROP INDEX {0}".format(name))
+    return [sql for _, sql in indexes]
+
+
+def create_indexes(connection, index_statements):
+    for sql in index_statements:
+        connection.execute(sql)
+
+
+def generate(primary_db_path, results_db_path, team_list_path, question_list_path, number_of_teams=100,
+             number_of_questions=50, number_of_bugs=10000, number_of_answers=100000, open_question_rate=0.15,
+             skew=1.1, correct_rate=0.5, marked_rate=0.5, quickest_answer_bonus=0.2, chunk_size=50000, seed=None):
+    """
+    :return: dictionary with number of generated rows, time and speed
+    """
+    start = time.time()
+    rng = random.Random(seed)
+    team_ids = generate_team_ids(number_of_teams)
+    questions = generate_questions(number_of_questions, open_question_rate, rng)
+    write_yaml(team_list_path, {"teams": dict(("Team{0}".format(number), {"id": team_id})
+                                              for number, team_id in enumerate(team_ids, 1))})
+    write_yaml(question_list_path, {"questions": questions})
+
+    for db_path in (primary_db_path, results_db_path):
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+    database_init.init(primary_db_path, results_db_path)
+    row_generator = RowGenerator(team_ids, questions, rng, skew=skew, correct_rate=correct_rate,
+                                 marked_rate=marked_rate, quickest_answer_bonus=quickest_answer_bonus)
+    primary_connection = connect(primary_db_path)
+    results_connection = connect(results_db_path)
+    connections = (primary_connection, results_connection)
+    try:
+        check_empty(primary_connection, ("BUGS", "ANSWERS"))
+        check_empty(results_connection, ("RESULTS",))
+        for connection in connections:
+            connection.execute("BEGIN")
+        try:
+            primary_indexes = drop_indexes(primary_connection)
+            results_indexes = drop_indexes(results_connection)
+            number_of_results = insert_rows(primary_connection, results_connection, row_generator.bug_rows,
+                                            number_of_bugs,
+                                            "INSERT INTO BUGS (ID, BUG_GUID, CREATED_DATE_TIME, TEAM_ID, BUG_CONTENT, "
+                                            "CREATED_TS) VALUES(?, ?, ?, ?, ?, ?)", chunk_size)
+            number_of_results += insert_rows(primary_connection, results_connection, row_generator.answer_rows,
+                                             number_of_answers,
+                                             "INSERT INTO ANSWERS (QUESTION_ID, QUESTION_GUID, CREATED_DATE_TIME, "
+                                             "TEAM_ID, ANSWER_CONTENT, ID, CREATED_TS) VALUES(?, ?, ?, ?, ?, ?, ?)",
+                                             chunk_size)
+            create_indexes(primary_connection, primary_indexes)
+            create_indexes(results_connection, results_indexes)
+        except Exception:
+            # indexes are dropped in the same transaction, so rollback restores them
+            for connection in connections:
+                connection.execute("ROLLBACK")
+            raise
+        for connection in connections:
+            connection.execute("COMMIT")
+        for connection in connections:
+            connection.execute("ANALYZE")
+    finally:
+        for connection in connections:
+            connection.close()
+    seconds = time.time() - start
+    number_of_rows = number_of_bugs + number_of_answers + number_of_results
+    return {"bugs": number_of_bugs, "answers": number_of_answers, "results": number_of_results, "seconds": seconds,
+            "rows_per_second": number_of_rows / seconds if seconds > 0 else 0.0}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generates teams, questions, bugs, answers and results "
+                                                 "for performance tests. Databases must be new or empty.")
+    parser.add_argument("--output-dir", default="generated",
+                        help="directory for databases and config files which paths are not given")
+    parser.add_argument("--primary-db")
+    parser.add_argument("--results-db")
+    parser.add_argument("--team-list")
+    parser.add_argument("--question-list")
+    parser.add_argument("--teams", type=int, default=100)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--bugs", type=int, default=10000)
+    parser.add_argument("--answers", type=int, default=100000)
+    parser.add_argument("--open-question-rate", type=float, default=0.15)
+    parser.add_argument("--skew", type=float, default=1.1, help="0 = all teams equally active")
+    parser.add_argument("--correct-rate", type=float, default=0.5, help="part of closed answers which are correct")
+    parser.add_argument("--marked-rate", type=float, default=0.5, help="part of bugs and open answers which are marked")
+    parser.add_argument("--quickest-answer-bonus", type=float, default=0.2)
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    stats = generate(primary_db_path=args.primary_db or os.path.join(args.output_dir, "primary.db"),
+                     results_db_path=args.results_db or os.path.join(args.output_dir, "results.db"),
+                     team_list_path=args.team_list or os.path.join(args.output_dir, "team_list.yaml"),
+                     question_list_path=args.question_list or os.path.join(args.output_dir, "question_list.yaml"),
+                     number_of_teams=args.teams, number_of_questions=args.questions, number_of_bugs=args.bugs,
+                     number_of_answers=args.answers, open_question_rate=args.open_question_rate, skew=args.skew,
+                     correct_rate=args.correct_rate, marked_rate=args.marked_rate,
+                     quickest_answer_bonus=args.quickest_answer_bonus, chunk_size=args.chunk_size, seed=args.seed)
+    print(u"Bugs: {bugs}, answers: {answers}, results: {results}, time: {seconds:.2f}s, "
+          u"{rows_per_second:.0f} rows/s".format(**stats))
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+from collections import namedtuple
+
+from enums.question import QuestionTypes
+
+# Correct answer of one question compiled once when question list is loaded
+AnswerKey = namedtuple("AnswerKey", ["correct_words", "number_of_words", "points"])
+
+
+def normalize_answer(answer):
+    """
+    Splits answer to lowercase words the same way as common.is_question_correct.
+    :param: answer - str or bytes (utf-8)
+    :return: list of words
+    """
+    if isinstance(answer, bytes):
+        answer = answer.decode('utf-8', errors='replace')
+    return answer.strip().lower().split(' ')
+
+
+def compile_answer_key(question):
+    correct_answer_list = str(question['answer']).lower().split(' ')
+    return AnswerKey(correct_words=frozenset(word.strip() for word in correct_answer_list),
+                     number_of_words=len(correct_answer_list),
+                     points=question.get('points', 0))
+
+
+class GradingEngine(object):
+    """
+    Grades answers of closed questions from question list. Answer is correct if it has the same number of words
+    as correct answer and contains every word of it (case insensitive), like common.is_question_correct.
+    """
+    def __init__(self, questions):
+        """
+        :param: questions - 'questions' section of question list, where key is question ID
+        """
+        self.answer_keys = dict()  # the key is question ID (int), value is AnswerKey
+        for question_id in questions or {}:
+            question = questions[question_id]
+            if question is not None and 'answer' in question and \
+                    str(question.get('type', None)).lower() == QuestionTypes.CLOSED:
+                self.answer_keys[int(question_id)] = compile_answer_key(question)
+
+    def is_correct(self, question_id, answer):
+        answer_key = self.answer_keys.get(int(question_id), None)
+        if answer_key is None:
+            return False
+        answer_list = normalize_answer(answer)
+        return len(answer_list) == answer_key.number_of_words and answer_key.correct_words.issubset(answer_list)
+
+    def grade(self, question_id, answer):
+        """
+        :return: tuple: (bool - is answer correct, number of points for the answer)
+        """
+        if self.is_correct(question_id, answer):
+            return True, self.answer_keys[int(question_id)].points
+        return False, 0
+
+    def grade_many(self, submissions):
+        """
+        :param: submissions - iterable of tuples: (question_id, answer)
+        :return: list of tuples: (bool - is answer correct, number of points for the answer)
+        """
+        grade = self.grade
+        return [grade(question_id, answer) for question_id, answer in submissions]
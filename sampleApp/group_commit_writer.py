@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import logger
+
+_STOP = object()
+
+
+class GroupCommitWriter(object):
+    """
+    Background writer which commits queued INSERT statements in groups.
+    Rows collected during flush interval (or until max batch size is reached) are written with executemany
+    in a single transaction, so many concurrent requests share one fsync.
+    Committed rows survive power failure only if connections use PRAGMA synchronous = FULL
+    (in WAL mode NORMAL may lose the last transactions), DataManager sets it when group commit is enabled.
+    """
+    def __init__(self, pool, flush_interval=0.002, max_batch_rows=500):
+        """
+        :param: pool - ConnectionPool of the database
+        :param: flush_interval - max number of seconds the first queued row waits for other rows
+        :param: max_batch_rows - max number of rows committed in one transaction
+        """
+        self._pool = pool
+        self._flush_interval = flush_interval
+        self._max_batch_rows = max_batch_rows
+        self._queue = queue.Queue()
+        self.flushed_batches = 0
+        self.flushed_rows = 0
+        self._thread = threading.Thread(target=self._run, name="group-commit-{0}".format(pool.db_path))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, query, params):
+        """
+        Queues statement.
+        :return: Future resolved with query response when the row is committed
+        """
+        future = Future()
+        self._queue.put((query, params, future))
+        return future
+
+    def execute(self, query, params):
+        """
+        Queues statement and waits until it is committed.
+        :return: response from database
+        """
+        return self.submit(query, params).result()
+
+    def close(self):
+        """
+        Commits all queued rows and stops writer thread.
+        """
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.time() + self._flush_interval
+            while len(batch) < self._max_batch_rows:
+                timeout = deadline - time.time()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+
+    def _flush(self, batch):
+        try:
+            with self._pool.connection() as connection:
+                try:
+                    start = 0
+                    while start < len(batch):
+                        query = batch[start][0]
+                        end = start
+                        while end < len(batch) and batch[end][0] == query:
+                            end += 1
+                        connection.executemany(query, [params for _, params, _ in batch[start:end]])
+                        start = end
+                    connection.commit()
+                except Exception as ex:
+                    connection.rollback()
+                    logger.console_error("Group commit of {0} rows failed, committing one by one. Reason: {1}".format(
+                        len(batch), ex))
+                    self._flush_one_by_one(connection, batch)
+                    return
+        except Exception as ex:
+            for _, _, future in batch:
+                future.set_exception(ex)
+            return
+        self.flushed_batches += 1
+        self.flushed_rows += len(batch)
+        for _, _, future in batch:
+            future.set_result(list())
+
+    def _flush_one_by_one(self, connection, batch):
+        for query, params, future in batch:
+            try:
+                response = connection.execute(query, params).fetchall()
+                connection.commit()
+                future.set_result(response)
+            except Exception as ex:
+                connection.rollback()
+                future.set_exception(ex)
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+import time
+
+# 2015-01-01 00:00:00 UTC in milliseconds, start of time in IDs
+EPOCH_MS = 1420070400000
+WORKER_ID_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_ID_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+
+class IdGenerator(object):
+    """
+    Issues unique IDs sorted by creation time (Snowflake layout): 41 bits of milliseconds since EPOCH_MS,
+    10 bits of worker ID and 12 bits of sequence within millisecond. IDs of one generator always grow,
+    also when system clock goes back, so they can be used for ordering.
+    Also issues integer timestamps in microseconds, which never go back within the process.
+    """
+    def __init__(self, worker_id=None):
+        """
+        :param: worker_id - number of process (0 - 1023) which makes IDs unique across worker processes,
+                            see shared_state.SharedState.register_worker. By default taken from process ID,
+                            which is enough only when one process writes to the databases.
+        """
+        if worker_id is None:
+            worker_id = os.getpid() & MAX_WORKER_ID
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError("worker_id should be in range 0 - {0}".format(MAX_WORKER_ID))
+        self.worker_id = worker_id
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._sequence = 0
+        self._last_timestamp_us = 0
+
+    def next_id(self):
+        with self._lock:
+            now_ms = max(int(time.time() * 1000), self._last_ms)
+            if now_ms == self._last_ms:
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    # sequence exhausted, IDs of next millisecond are used
+                    now_ms += 1
+            else:
+                self._sequence = 0
+            self._last_ms = now_ms
+            return ((now_ms - EPOCH_MS) << (WORKER_ID_BITS + SEQUENCE_BITS)) | \
+                   (self.worker_id << SEQUENCE_BITS) | self._sequence
+
+    def timestamp_us(self):
+        """
+        :return: int - microseconds since 1970-01-01 UTC, greater than or equal to previous result
+        """
+        with self._lock:
+            self._last_timestamp_us = max(time.time_ns() // 1000, self._last_timestamp_us)
+            return self._last_timestamp_us
+
+
+def get_id_time(generated_id):
+    """
+    :return: float - time (seconds since 1970-01-01 UTC) when ID was issued
+    """
+    return ((generated_id >> (WORKER_ID_BITS + SEQUENCE_BITS)) + EPOCH_MS) / 1000.0
@@ -1,11 +1,57 @@
+import atexit
+import itertools
 import logging
-import inspect
+import logging.handlers
 import os
+import queue
+import sys
 
-from common import get_date_time
+# Listeners which write records put on queues by QueueHandlers, started by basicConfig
+_listeners = list()
 
+# Query logging settings, see basicConfig
+_query_log_sample_rate = 1
+_query_log_max_length = None
+_query_counter = itertools.count()
 
-def basicConfig(log_file_name, log_level, log_format, log_on_console):
+
+def _stop_listeners():
+    while _listeners:
+        logger_instance, queue_handler, listener = _listeners.pop()
+        logger_instance.removeHandler(queue_handler)
+        listener.stop()
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts record on queue without formatting it, so message arguments are formatted by listener thread.
+    Arguments should not be changed after logging.
+    """
+    def prepare(self, record):
+        return record
+
+
+def _add_queue_handler(logger_instance, *handlers):
+    """
+    Records are put on queue by the logging thread and written to handlers by listener thread.
+    """
+    records_queue = queue.Queue(-1)
+    queue_handler = _DeferredQueueHandler(records_queue)
+    logger_instance.addHandler(queue_handler)
+    listener = logging.handlers.QueueListener(records_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    _listeners.append((logger_instance, queue_handler, listener))
+
+
+def basicConfig(log_file_name, log_level, log_format, log_on_console, query_log_sample_rate=1, query_log_max_length=None):
+    """
+    :param: query_log_sample_rate - only every N-th database query is logged
+    :param: query_log_max_length - max number of characters of logged query response
+    """
+    global _query_log_sample_rate, _query_log_max_length
+    _query_log_sample_rate = max(int(query_log_sample_rate), 1)
+    _query_log_max_length = query_log_max_length
+    _stop_listeners()
 
     console_logger = logging.getLogger('CONSOLE')
     console_logger.setLevel(logging.DEBUG)
@@ -13,7 +59,7 @@ def basicConfig(log_file_name, log_level, log_format, log_on_console):
     stream_handler = logging.StreamHandler()
     formatter = logging.Formatter(log_format)
     stream_handler.setFormatter(formatter)
-    console_logger.addHandler(stream_handler)
+    _add_queue_handler(console_logger, stream_handler)
 
     logger = logging.getLogger()
     logger.setLevel(log_level)
@@ -22,19 +68,27 @@ def basicConfig(log_file_name, log_level, log_format, log_on_console):
     file_handler = logging.FileHandler(log_file_name, "w", encoding='utf-8')
     file_handler.setLevel(log_level)
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+    handlers = [file_handler]
 
     if log_on_console is True:
         stream_handler = logging.StreamHandler()
         stream_handler.setFormatter(formatter)
         stream_handler.setLevel(log_level)
-        logger.addHandler(stream_handler)
+        handlers.append(stream_handler)
+    _add_queue_handler(logger, *handlers)
 
     # Disabled logging for request packages
     requests_log = logging.getLogger("requests")
     requests_log.setLevel(logging.WARNING)
 
 
+atexit.register(_stop_listeners)
+
+
+def is_enabled(level, logger_name=''):
+    return logging.getLogger(logger_name).isEnabledFor(level)
+
+
 def log_separator(level=None):
     logger_instance = logging.getLogger()
     if level is None:
@@ -44,6 +98,9 @@ def log_separator(level=None):
 
 
 def log(level, *args):
+    """
+    Message can be a function returning message - it is called only if given level is enabled.
+    """
     if len(list(args)) == 2:
         logger_name = args[0]
         message = args[1]
@@ -52,15 +109,64 @@ def log(level, *args):
         logger_name = ''
     else:
         raise Exception("Not enough arguments!")
+    _log(level, logger_name, message, (), 3)
+
+
+def _log(level, logger_name, message, message_args, depth):
+    """
+    :param: message_args - arguments of %-style message, merged by listener thread
+    :param: depth - number of frames between caller and this function
+    """
     logger_instance = logging.getLogger(logger_name)
+    if not logger_instance.isEnabledFor(level):
+        return
+    if callable(message):
+        message = message()
 
     if logger_instance.getEffectiveLevel() == logging.DEBUG:
-        frame = inspect.getouterframes(inspect.currentframe())[2]
-        file_name = os.path.basename(frame[1])
-        trace = "%s.%s():%s" % (file_name.split(".")[0], frame[3], frame[2])
-        logger_instance.log(level, "[%s] %s" % (trace, message))
+        frame = sys._getframe(depth)
+        file_name = os.path.basename(frame.f_code.co_filename)
+        trace = "%s.%s():%s" % (file_name.split(".")[0], frame.f_code.co_name, frame.f_lineno)
+        message = "[" + trace + "] " + message
+    logger_instance.log(level, message, *message_args)
+
+
+def query(query, response):
+    """
+    Logs database query and its response on DEBUG level. Only every N-th query is logged
+    and long responses are cut, see basicConfig.
+    """
+    if not logging.getLogger().isEnabledFor(logging.DEBUG):
+        return
+    if _query_log_sample_rate > 1 and next(_query_counter) % _query_log_sample_rate != 0:
+        return
+    _log(logging.DEBUG, '', "query: %s, response: %s", (query, _format_response(response)), 2)
+
+
+def _format_response(response):
+    """
+    :return: text of query response cut to query_log_max_length characters. Rows of long response
+             are converted to text only until the limit is reached.
+    """
+    if _query_log_max_length is None:
+        return str(response)
+    if isinstance(response, list):
+        rows = list()
+        length = 0
+        for row in response:
+            if length > _query_log_max_length:
+                break
+            rows.append(repr(row))
+            length += len(rows[-1]) + 2
+        if len(rows) < len(response):
+            return "[{0}... ({1} rows)".format(", ".join(rows)[:_query_log_max_length], len(response))
+        response = "[" + ", ".join(rows) + "]"
     else:
-        logger_instance.log(level, message)
+        response = str(response)
+    if len(response) > _query_log_max_length:
+        response = "{0}... ({1} characters)".format(response[:_query_log_max_length], len(response))
+    return response
+
 
 def info(*args):
     """
@@ -115,22 +221,24 @@ def fatal(*args):
     """
     log(logging.FATAL, *args)
 
-def console(message, marker=logging.INFO):
-    info = u"[{0}] {1}".format(marker, message)
-    log(marker, info)
-    print (get_date_time(), info.encode("utf-8", errors='replace'))
+def console(message, *args, marker=logging.INFO):
+    """
+    Logs message to console (and log file if level is enabled) - written by listener thread.
+    :param: args - arguments of %-style message, e.g. console(u"Bug added: %s", bug_id), formatted by listener thread
+    """
+    _log(marker, 'CONSOLE', u"[{0}] ".format(marker) + str(message), args, 2)
 
-def console_fatal(message):
-    console(message=message, marker=logging.FATAL)
+def console_fatal(message, *args):
+    console(message, *args, marker=logging.FATAL)
 
-def console_error(message):
-    console(message=message, marker=logging.ERROR)
+def console_error(message, *args):
+    console(message, *args, marker=logging.ERROR)
 
-def console_warning(message):
-    console(message=message, marker=logging.WARNING)
+def console_warning(message, *args):
+    console(message, *args, marker=logging.WARNING)
 
-def console_debug(message):
-    console(message=message, marker=logging.DEBUG)
+def console_debug(message, *args):
+    console(message, *args, marker=logging.DEBUG)
 
 def logfile(message, marker=logging.INFO):
     info = u"[{0}] {1}".format(marker, message)
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+import bisect
+import re
+import threading
+
+# Upper bounds (seconds) of latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_STATEMENT_RE = re.compile(r"^\s*(\w+)")
+_TABLE_RE = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+(\w+)", re.IGNORECASE)
+_MAX_STATEMENT_LABELS = 1000
+_statement_labels = dict()  # key is query text
+
+
+class _ShardedMetric(object):
+    """
+    Each thread updates own shard (dictionary of labels and list of values), so updates need no lock.
+    Shards are summed when metrics are rendered. Shards of finished threads are merged into one,
+    so threads started per request do not make the list grow.
+    """
+    metric_type = None
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._local = threading.local()
+        self._shards = list()  # list of (thread, shard)
+        self._retired_shard = dict()
+        self._shards_lock = threading.Lock()
+
+    def _new_values(self):
+        raise NotImplementedError()
+
+    def _get_values(self, labels):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._local.shard = dict()
+            with self._shards_lock:
+                self._merge_finished_threads()
+                self._shards.append((threading.current_thread(), shard))
+        values = shard.get(labels, None)
+        if values is None:
+            values = shard[labels] = self._new_values()
+        return values
+
+    def _merge_finished_threads(self):
+        alive_shards = list()
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive_shards.append((thread, shard))
+            else:
+                self._add_shard(self._retired_shard, shard)
+        self._shards = alive_shards
+
+    def _add_shard(self, total, shard):
+        for labels, values in list(shard.items()):
+            total_values = total.get(labels, None)
+            if total_values is None:
+                total_values = total[labels] = self._new_values()
+            for index, value in enumerate(values):
+                total_values[index] += value
+
+    def collect(self):
+        """
+        :return: dictionary where key is tuple of label values and value is list of summed values
+        """
+        with self._shards_lock:
+            self._merge_finished_threads()
+            total = dict()
+            self._add_shard(total, self._retired_shard)
+            for _, shard in self._shards:
+                self._add_shard(total, shard)
+        return total
+
+    def _format_labels(self, labels, extra=()):
+        pairs = list(zip(self.label_names, labels)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join('{0}="{1}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+                              for name, value in pairs) + "}"
+
+    def render(self):
+        lines = ["# HELP {0} {1}".format(self.name, self.documentation),
+                 "# TYPE {0} {1}".format(self.name, self.metric_type)]
+        for labels, values in sorted(self.collect().items()):
+            lines.extend(self._render_values(labels, values))
+        return lines
+
+    def _render_values(self, labels, values):
+        return ["{0}{1} {2}".format(self.name, self._format_labels(labels), _format_number(values[0]))]
+
+
+class Counter(_ShardedMetric):
+    metric_type = "counter"
+
+    def _new_values(self):
+        return [0]
+
+    def inc(self, labels=(), amount=1):
+        self._get_values(labels)[0] += amount
+
+
+class Gauge(Counter):
+    """
+    Value which goes up and down, e.g. number of requests in progress.
+    """
+    metric_type = "gauge"
+
+    def dec(self, labels=(), amount=1):
+        self._get_values(labels)[0] -= amount
+
+
+class Histogram(_ShardedMetric):
+    """
+    Values: count of observations in each bucket (preallocated, the last one is +Inf), sum and count.
+    """
+    metric_type = "histogram"
+
+    def __init__(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        super(Histogram, self).__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_values(self):
+        return [0] * (len(self.buckets) + 3)
+
+    def observe(self, value, labels=()):
+        values = self._get_values(labels)
+        values[bisect.bisect_left(self.buckets, value)] += 1
+        values[-2] += value
+        values[-1] += 1
+
+    def _render_values(self, labels, values):
+        lines = list()
+        cumulative = 0
+        for upper_bound, count in zip(self.buckets + ("+Inf",), values):
+            cumulative += count
+            lines.append("{0}_bucket{1} {2}".format(self.name, self._format_labels(labels, [("le", upper_bound)]),
+                                                    cumulative))
+        lines.append("{0}_sum{1} {2}".format(self.name, self._format_labels(labels), _format_number(values[-2])))
+        lines.append("{0}_count{1} {2}".format(self.name, self._format_labels(labels), values[-1]))
+        return lines
+
+
+def _format_number(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def get_statement_label(query):
+    """
+    :return: statement type and table name, e.g. 'SELECT RESULTS', cached for each query text
+    """
+    label = _statement_labels.get(query, None)
+    if label is None:
+        match = _STATEMENT_RE.match(query)
+        label = match.group(1).upper() if match else "OTHER"
+        match = _TABLE_RE.search(query)
+        if match:
+            label += " " + match.group(1).upper()
+        if len(_statement_labels) < _MAX_STATEMENT_LABELS:
+            _statement_labels[query] = label
+    return label
+
+
+class Metrics(object):
+    """
+    Request, database query and file write metrics of the service, rendered in Prometheus text format.
+    """
+    def __init__(self):
+        self.requests = Counter("sampleapp_http_requests_total", "Number of HTTP requests.",
+                                ("endpoint", "method", "status"))
+        self.request_latency = Histogram("sampleapp_http_request_duration_seconds", "Time of handling HTTP request.",
+                                         ("endpoint",))
+        self.requests_in_flight = Gauge("sampleapp_http_requests_in_flight", "Number of HTTP requests in progress.")
+        self.queries = Counter("sampleapp_db_queries_total", "Number of database statements.",
+                               ("database", "statement", "failure"))
+        self.query_latency = Histogram("sampleapp_db_query_duration_seconds",
+                                       "Time of database statement, including wait for connection and commit.",
+                                       ("database", "statement"))
+        self.query_rows = Histogram("sampleapp_db_query_rows", "Number of rows returned by database statement.",
+                                    ("database", "statement"), buckets=ROW_BUCKETS)
+        self.lock_wait = Histogram("sampleapp_db_lock_wait_seconds",
+                                   "Time of waiting for free connection of database pool.", ("database",))
+        self.file_write_latency = Histogram("sampleapp_file_write_duration_seconds",
+                                            "Time of writing (or queueing) bug and answer files.", ("kind",))
+        self._metrics = [self.requests, self.request_latency, self.requests_in_flight, self.queries,
+                         self.query_latency, self.query_rows, self.lock_wait, self.file_write_latency]
+
+    def observe_request(self, endpoint, method, status_code, seconds):
+        endpoint = endpoint or "not_found"
+        self.request_latency.observe(seconds, (endpoint,))
+        self.requests.inc((endpoint, method, str(status_code)))
+        self.requests_in_flight.dec()
+
+    def observe_query(self, database, query, seconds, response, failure):
+        statement = get_statement_label(query)
+        failure = failure or isinstance(response, Exception)
+        self.queries.inc((database, statement, "true" if failure else "false"))
+        self.query_latency.observe(seconds, (database, statement))
+        if isinstance(response, list):
+            self.query_rows.observe(len(response), (database, statement))
+
+    def render(self):
+        lines = list()
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+import collections
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+
+MODES = ("sample", "cprofile")
+MAX_SECONDS = 300
+MAX_REQUESTS = 1000
+MIN_INTERVAL = 0.001
+SORT_KEYS = ("cumulative", "tottime", "calls")
+
+
+def format_frame(frame):
+    code = frame.f_code
+    return "{0} ({1}:{2})".format(code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+
+
+def get_stack(frame):
+    """
+    :return: list of frame names from the outermost to the current one
+    """
+    stack = list()
+    while frame is not None:
+        stack.append(format_frame(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+class ProfilingSession(object):
+    """
+    One profiling run: stack samples of request threads taken by background thread ('sample' mode)
+    or cProfile of each of the next 'requests' requests ('cprofile' mode), optionally with SQL statements
+    of each request. Session ends after 'seconds' or when all requests are profiled.
+    """
+    def __init__(self, mode="sample", seconds=10, requests=100, interval=0.005, trace_sql=False, all_threads=False):
+        """
+        :param: mode - sample or cprofile
+        :param: seconds - max duration of session
+        :param: requests - number of requests profiled by cProfile, used only by cprofile mode
+        :param: interval - seconds between stack samples, used only by sample mode
+        :param: trace_sql - if True then SQL statements of each request are recorded
+        :param: all_threads - if True then all threads are sampled, otherwise only threads handling requests
+        """
+        if mode not in MODES:
+            raise ValueError("Unknown mode: '{0}', expected one of: {1}".format(mode, ", ".join(MODES)))
+        if not 0 < float(seconds) <= MAX_SECONDS:
+            raise ValueError("seconds should be greater than 0 and not greater than {0}".format(MAX_SECONDS))
+        if not 0 < int(requests) <= MAX_REQUESTS:
+            raise ValueError("requests should be greater than 0 and not greater than {0}".format(MAX_REQUESTS))
+        if float(interval) < MIN_INTERVAL:
+            raise ValueError("interval should not be less than {0}".format(MIN_INTERVAL))
+        self.mode = mode
+        self.seconds = float(seconds)
+        self.requests = int(requests)
+        self.interval = float(interval)
+        self.trace_sql = bool(trace_sql)
+        self.all_threads = bool(all_threads)
+
+        self.start_time = time.time()
+        self.end_time = None
+        self.samples = 0
+        self.profiled_requests = 0
+        self.skipped_requests = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._stacks = collections.Counter()  # key is collapsed stack
+        self._stats = None
+        self._request_slots = self.requests
+        self._active_threads = set()
+        self.traces = collections.deque(maxlen=MAX_REQUESTS)
+        self._sampler = None
+        if mode == "sample":
+            self._sampler = threading.Thread(target=self._sample, name="profiler-sampler")
+            self._sampler.daemon = True
+            self._sampler.start()
+
+    def is_running(self):
+        if self._stopped.is_set():
+            return False
+        if time.time() - self.start_time >= self.seconds or \
+                (self.mode == "cprofile" and self.profiled_requests + self.skipped_requests >= self.requests):
+            self.stop()
+            return False
+        return True
+
+    def stop(self):
+        with self._lock:
+            if self.end_time is None:
+                self.end_time = time.time()
+        self._stopped.set()
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        while not self._stopped.wait(self.interval) and self.is_running():
+            active_threads = None if self.all_threads else frozenset(self._active_threads)
+            names = dict((thread.ident, thread.name) for thread in threading.enumerate())
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (active_threads is not None and thread_id not in active_threads):
+                    continue
+                stack = [names.get(thread_id, str(thread_id))] + get_stack(frame)
+                self._stacks[";".join(stack)] += 1
+            self.samples += 1
+
+    def take_request_slot(self):
+        """
+        :return: bool - True if request should be profiled by cProfile
+        """
+        with self._lock:
+            if self._request_slots <= 0:
+                return False
+            self._request_slots -= 1
+            return True
+
+    def enter_request(self):
+        self._active_threads.add(threading.get_ident())
+
+    def leave_request(self):
+        self._active_threads.discard(threading.get_ident())
+
+    def add_profile(self, profile):
+        with self._lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            self.profiled_requests += 1
+
+    def skip_request(self):
+        with self._lock:
+            self.skipped_requests += 1
+
+    def add_trace(self, endpoint, seconds, queries):
+        self.traces.append({"endpoint": endpoint, "seconds": seconds, "queries": queries})
+
+    def get_collapsed_stacks(self):
+        """
+        :return: text with one stack per line: 'thread;outer frame;...;inner frame count', input of flamegraph.pl
+        """
+        stacks = dict(self._stacks)
+        return "".join("{0} {1}\n".format(stack, count) for stack, count in sorted(stacks.items()))
+
+    def get_top(self, top=20, sort="cumulative"):
+        """
+        :return: text of pstats report for cprofile mode, functions found on top of the most samples
+                 and in the most samples for sample mode
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError("Unknown sort: '{0}', expected one of: {1}".format(sort, ", ".join(SORT_KEYS)))
+        stream = io.StringIO()
+        if self.mode == "cprofile":
+            with self._lock:
+                if self._stats is None:
+                    return "No requests profiled.\n"
+                self._stats.stream = stream
+                self._stats.sort_stats(sort).print_stats(top)
+            return stream.getvalue()
+        own_samples = collections.Counter()
+        total_samples = collections.Counter()
+        for stack, count in dict(self._stacks).items():
+            frames = stack.split(";")[1:]
+            if frames:
+                own_samples[frames[-1]] += count
+            for frame in set(frames):
+                total_samples[frame] += count
+        samples = own_samples if sort == "tottime" else total_samples
+        stream.write("{0:>10} {1:>10}  function\n".format("own", "total"))
+        for frame, _ in samples.most_common(top):
+            stream.write("{0:>10} {1:>10}  {2}\n".format(own_samples[frame], total_samples[frame], frame))
+        return stream.getvalue()
+
+    def get_summary(self, top=20, sort="cumulative"):
+        return {
+            "mode": self.mode,
+            "running": self.is_running(),
+            "seconds": self.seconds,
+            "elapsed_seconds": (self.end_time or time.time()) - self.start_time,
+            "samples": self.samples,
+            "requests": self.requests,
+            "profiled_requests": self.profiled_requests,
+            "skipped_requests": self.skipped_requests,
+            "trace_sql": self.trace_sql,
+            "top": self.get_top(top, sort).splitlines(),
+            "traces": list(self.traces),
+        }
+
+
+class Profiler(object):
+    """
+    Runs at most one ProfilingSession at a time. start_request and finish_request are called for each request
+    and cost one attribute check when no session is running.
+    """
+    def __init__(self):
+        self.session = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def start(self, **options):
+        """
+        :param: options - see ProfilingSession
+        :return: ProfilingSession
+        """
+        with self._lock:
+            if self.session is not None and self.session.is_running():
+                raise RuntimeError("Profiling session is already running.")
+            self.session = ProfilingSession(**options)
+            return self.session
+
+    def stop(self):
+        session = self.session
+        if session is not None:
+            session.stop()
+        return session
+
+    def start_request(self):
+        session = self.session
+        if session is None or not session.is_running():
+            return
+        self._local.session = session
+        self._local.start = time.perf_counter()
+        self._local.profile = None
+        self._local.queries = list() if session.trace_sql else None
+        if session.mode == "sample":
+            session.enter_request()
+        elif session.take_request_slot():
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+                self._local.profile = profile
+            except ValueError:
+                # other profiler is active in this thread (Python 3.12+ allows one per process)
+                session.skip_request()
+
+    def finish_request(self, endpoint):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            return
+        self._local.session = None
+        profile = self._local.profile
+        if profile is not None:
+            profile.disable()
+            session.add_profile(profile)
+        if session.mode == "sample":
+            session.leave_request()
+        if self._local.queries is not None:
+            session.add_trace(endpoint, time.perf_counter() - self._local.start, self._local.queries)
+            self._local.queries = None
+
+    def record_query(self, database, query, seconds, response):
+        """
+        Records SQL statement of the current request if session traces SQL.
+        """
+        queries = getattr(self._local, "queries", None)
+        if queries is not None:
+            queries.append({"database": database, "query": " ".join(query.split()), "seconds": seconds,
+                            "rows": len(response) if isinstance(response, list) else None})
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+import collections
+import threading
+import time
+
+
+class TokenBucketRateLimiter(object):
+    """
+    Token bucket per team: bucket holds up to 'burst' tokens, refilled with 'requests_per_minute' tokens
+    per minute, and each accepted request takes one token.
+
+    Teams are spread over stripes, each with own lock and LRU ordered buckets, so parallel requests
+    of different teams rarely wait for each other. Memory is bounded by max_teams - least recently used
+    buckets are evicted when stripe is full, and buckets of teams idle for idle_seconds are evicted
+    when new team is added.
+    """
+    def __init__(self, requests_per_minute, burst, stripes=16, max_teams=10000, idle_seconds=600):
+        """
+        :param: requests_per_minute - number of tokens added to bucket per minute
+        :param: burst - max number of tokens in bucket (requests which can be sent at once)
+        :param: stripes - number of independently locked parts of the table
+        :param: max_teams - max number of remembered teams
+        :param: idle_seconds - bucket is forgotten when team did not send request for given number of seconds
+                               (full bucket is created again on next request)
+        """
+        self.requests_per_minute = float(requests_per_minute)
+        self.burst = float(burst)
+        self._refill_per_second = self.requests_per_minute / 60.0
+        self._idle_seconds = idle_seconds
+        self._stripes = [(threading.Lock(), collections.OrderedDict()) for _ in range(max(int(stripes), 1))]
+        self._max_stripe_size = max(int(max_teams) // len(self._stripes), 1)
+        self.evicted_teams = 0
+
+    def _get_stripe(self, team_id):
+        return self._stripes[hash(team_id) % len(self._stripes)]
+
+    def check(self, team_id):
+        """
+        Takes one token from bucket of the team.
+        :return: bool - True if request is accepted, False if team exceeded its limit
+        """
+        now = time.time()
+        lock, buckets = self._get_stripe(team_id)
+        with lock:
+            bucket = buckets.get(team_id, None)
+            if bucket is None:
+                # [tokens, time of last refill, number of rejected requests]
+                bucket = [self.burst, now, 0]
+                buckets[team_id] = bucket
+                self._evict(buckets, now)
+            else:
+                buckets.move_to_end(team_id)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self._refill_per_second)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True
+            bucket[2] += 1
+            return False
+
+    def _evict(self, buckets, now):
+        """
+        Removes least recently used buckets, called with stripe lock held.
+        """
+        while buckets:
+            team_id, bucket = next(iter(buckets.items()))
+            if len(buckets) <= self._max_stripe_size and now - bucket[1] < self._idle_seconds:
+                break
+            del buckets[team_id]
+            self.evicted_teams += 1
+
+    def get_rejected_requests(self):
+        """
+        :return: dictionary where key is team ID and value is number of rejected requests
+        """
+        rejected_requests = dict()
+        for lock, buckets in self._stripes:
+            with lock:
+                for team_id, bucket in buckets.items():
+                    if bucket[2]:
+                        rejected_requests[team_id] = bucket[2]
+        return rejected_requests
+
+    def get_stats(self):
+        return {
+            "requests_per_minute": self.requests_per_minute,
+            "burst": self.burst,
+            "teams": sum(len(buckets) for _, buckets in self._stripes),
+            "evicted_teams": self.evicted_teams,
+            "rejected_requests": self.get_rejected_requests(),
+        }
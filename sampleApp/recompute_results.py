@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Recomputes results of closed question answers from current question list and quickest_answer_bonus.
+Run it when service is stopped, or use POST /admin/recompute_results on running service,
+so its results page is refreshed as well.
+"""
+import argparse
+import os
+
+import yaml
+
+import common
+import data_manager
+import database_init
+
+
+def load_settings(config_path):
+    if os.path.exists(config_path) is False:
+        raise Exception("Missing configuration file:" + config_path)
+    with open(config_path, 'r') as stream:
+        return yaml.load(stream)
+
+
+def format_stats(stats):
+    return u"Answers: {answers}, closed answers: {closed_answers}, correct: {correct_answers}, " \
+           u"changed results: {changed_rows}, inserted results: {inserted_rows}, " \
+           u"time: {seconds:.2f}s, {rows_per_second:.0f} answers/s".format(**stats)
+
+
+if __name__ == '__main__':
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Grades all closed question answers again and rewrites their results.")
+    parser.add_argument("--config", default=common.get_config_path(script_dir))
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    settings = load_settings(args.config)
+    question_list_path = os.path.join(script_dir, settings["service_config"]["question_list"])
+    question_loader = common.YamlConfigFileLoader(question_list_path, index_builder=common.build_question_index)
+    primary_db_path = os.path.join(script_dir, settings["db_config"]["primary_db_path"])
+    result_db_path = os.path.join(script_dir, settings["db_config"]["result_db_path"])
+    database_init.init(primary_db_path, result_db_path)
+    manager = data_manager.DataManager(primary_db_path=primary_db_path,
+                                       result_db_path=result_db_path,
+                                       bug_files_path=os.path.join(script_dir, settings["db_config"]["bug_files_path"]),
+                                       open_questions_files_path=os.path.join(script_dir, settings["db_config"]["open_questions_files_path"]),
+                                       closed_questions_files_path=os.path.join(script_dir, settings["db_config"]["closed_questions_files_path"]),
+                                       pragmas=settings["db_config"]["pragmas"])
+    try:
+        stats = manager.recompute_results(question_loader.get_index().grading_engine,
+                                          quickest_answer_bonus=settings["service_config"]["quickest_answer_bonus"],
+                                          batch_size=args.batch_size)
+        print(format_stats(stats))
+    finally:
+        manager.close()
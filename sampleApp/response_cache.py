@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import gzip
+import hashlib
+import time
+
+from flask import Response
+
+DEFAULT_CONTENT_TYPE = "text/html; charset=utf-8"
+
+
+class CachedResponse(object):
+    """
+    Rendered page with its ETag (hash of content, the same in every worker process), time of rendering
+    (Last-Modified has one second resolution, changed keeps the exact time) and gzip compressed variant
+    for pages of at least gzip_min_size bytes.
+    """
+    def __init__(self, version, body, content_type=DEFAULT_CONTENT_TYPE, gzip_min_size=1024, gzip_level=6):
+        self.version = version
+        self.body = body
+        self.content_type = content_type
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.changed = time.time()
+        self.last_modified = int(self.changed)
+        self.gzip_body = None
+        if gzip_min_size is not None and len(body) >= gzip_min_size:
+            self.gzip_body = gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+class ResponseCache(object):
+    """
+    Pages rendered once for each version of their content. Version is any value compared with ==,
+    e.g. scoreboard version, and None for pages which never change.
+    Responses are conditional: request with matching If-None-Match gets 304. Request with If-Modified-Since only
+    gets 304 if page was rendered before the second given in the header, because page rendered later
+    in the same second has the same Last-Modified.
+    """
+    def __init__(self, gzip_min_size=1024, gzip_level=6):
+        """
+        :param: gzip_min_size - smaller pages are not compressed, None disables compression
+        :param: gzip_level - 1 (fastest) - 9 (smallest)
+        """
+        self._gzip_min_size = gzip_min_size
+        self._gzip_level = gzip_level
+        self._entries = dict()  # key is page name, value is CachedResponse
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version, render, content_type=DEFAULT_CONTENT_TYPE):
+        """
+        :param: render - function returning page (str or bytes), called only when version changed
+        :return: CachedResponse
+        """
+        entry = self._entries.get(key, None)
+        if entry is not None and entry.version == version:
+            self.hits += 1
+            return entry
+        body = render()
+        if not isinstance(body, bytes):
+            body = body.encode("utf-8")
+        entry = CachedResponse(version, body, content_type, self._gzip_min_size, self._gzip_level)
+        # page rendered by parallel request is simply replaced
+        self._entries[key] = entry
+        self.misses += 1
+        return entry
+
+    def make_response(self, entry, request, cache_control="no-cache"):
+        """
+        :return: flask.Response with body (compressed if client accepts gzip) or 304 Not Modified
+        """
+        if entry.gzip_body is not None and "gzip" in request.accept_encodings:
+            response = Response(entry.gzip_body, content_type=entry.content_type)
+            response.headers["Content-Encoding"] = "gzip"
+            response.set_etag(entry.etag + "-gzip")
+        else:
+            response = Response(entry.body, content_type=entry.content_type)
+            response.set_etag(entry.etag)
+        if entry.gzip_body is not None:
+            response.headers["Vary"] = "Accept-Encoding"
+        response.last_modified = entry.last_modified
+        response.headers["Cache-Control"] = cache_control
+        if not request.if_none_match and request.if_modified_since is not None and \
+                entry.changed >= request.if_modified_since.timestamp():
+            return response
+        return response.make_conditional(request)
+
+    def get_stats(self):
+        return {"pages": len(self._entries), "hits": self.hits, "misses": self.misses}
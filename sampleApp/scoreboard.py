@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import common
+
+
+class Scoreboard(object):
+    """
+    Points of each team kept in memory. Seeded once from RESULTS table and updated by DataManager
+    whenever points are inserted or changed, so results page does not need to query database.
+    """
+    def __init__(self, points_per_team=None):
+        """
+        :param: points_per_team - dictionary where key is team ID and value is number of points
+        """
+        self._points = dict()
+        self._lock = threading.Lock()
+        self._ranking = None
+        self.version = 0
+        self.reset(points_per_team)
+
+    def reset(self, points_per_team):
+        with self._lock:
+            self._points = dict(points_per_team or {})
+            self.version += 1
+
+    def add_points(self, team_id, points):
+        if not points:
+            return
+        with self._lock:
+            self._points[team_id] = self._points.get(team_id, 0.0) + points
+            self.version += 1
+
+    def get_points(self, team_id):
+        return self._points.get(team_id, 0.0)
+
+    def get_ranking(self, team_index):
+        """
+        Returns teams sorted by points. Ranking is sorted again only after points or list of teams change.
+        :param: team_index - common.TeamIndex
+        :return: sorted list of tuples, where [0] is team name, and [1] is points
+        """
+        ranking = self._ranking
+        version = self.version
+        if ranking is not None and ranking[0] == version and ranking[1] is team_index:
+            return ranking[2]
+        team_results_dict = dict()
+        for team_id, team_name in team_index.names_by_id.items():
+            team_results_dict[team_name] = self._points.get(team_id, 0.0)
+        sorted_results = common.sort_results(team_results_dict)
+        self._ranking = (version, team_index, sorted_results)
+        return sorted_results
@@ -1,11 +1,13 @@
 # -*- coding: utf-8 -*-
+import hmac
 import http.client
+import sys
 import time
 
-import copy
 import traceback
 
 from flask import Flask
+from flask import g
 from flask import jsonify
 from flask import request
 from flask import Response
@@ -18,26 +20,39 @@ from datetime import timedelta
 from functools import update_wrapper
 import common
 import app_context
+import metrics
 from enums.question import QuestionTypes
 import logger
 
+if __name__ == '__main__':
+    # Server is started by wsgi.py, which imports this module as 'service' in process handling requests,
+    # so AppContext is never created here, e.g. in gunicorn master process
+    import wsgi
+    wsgi.run()
+    sys.exit()
+
 app_context = app_context.AppContext()
 app = Flask(__name__)
 
 
 def spam_check(func):
     """
-    Decorator function that checks when last request was made and
-    if period is greater than given value request will be processed.
+    Decorator function that checks if team did not exceed its rate limit (service_config.rate_limit).
+    If rate limit is disabled, then it checks when last request was made and
+    if period is greater than post_delay request will be processed.
     Otherwise request will be treated as a spam.
     """
-    # TODO: add logic for blocking teams that made more than X request in last eg. 1m
     def checker(*args_, **kwargs_):
         """
         args_ contains: [team_id, ...]
         """
-        is_spam = common.check_if_spam(team_id=args_[0], spam_table=app_context.spam_table,
-                                       seconds=app_context.settings["service_config"]["post_delay"])
+        post_delay = app_context.settings["service_config"]["post_delay"]
+        if app_context.rate_limiter is not None:
+            is_spam = not app_context.rate_limiter.check(args_[0])
+        elif post_delay > 0:
+            is_spam = common.check_if_spam(team_id=args_[0], spam_table=app_context.spam_table, seconds=post_delay)
+        else:
+            is_spam = False
         if not is_spam:
             return func(*args_, **kwargs_)
         return "Too many requests. Please try again after a few seconds.", 429  # code for 'Too many requests'
@@ -52,7 +67,7 @@ def team_check(func):
         """
         args_ contains: [team_id, ...]
         """
-        if args_[0] is not None and common.is_id_present(id=args_[0], dict_obj=app_context.team_loader.get_key('teams')):
+        if args_[0] is not None and common.is_id_present(id=args_[0], dict_obj=app_context.team_loader.get_index()):
             return func(*args_, **kwargs_)
         return u"Team with id: '{0}' was not found.".format(args_[0]), http.client.UNAUTHORIZED
     return checker
@@ -69,9 +84,9 @@ def answer_check(func):
         """
         args_ contains: [team_id, question_id, question_type, ...]
         """
-        if args_[0] is not None and common.is_id_present(id=args_[1], dict_obj=app_context.question_loader.get_key('questions')):
-            if common.check_question_type(question_id=args_[1], question_type=args_[2],
-                                          question_dict=app_context.question_loader.get_key('questions')):
+        question_index = app_context.question_loader.get_index()
+        if args_[0] is not None and common.is_id_present(id=args_[1], dict_obj=question_index):
+            if common.check_question_type(question_id=args_[1], question_type=args_[2], question_dict=question_index):
                 if args_[1] is not None and not common.check_if_was_answered(team_id=args_[0], question_id=args_[1],
                             answered_question_table=app_context.answers_table):  # or app_context.allow_to_change_answer:
                     return func(*args_, **kwargs_)
@@ -80,79 +95,71 @@ def answer_check(func):
     return checker
 
 
-def get_all_open_questions_ids():
-    open_questions_ids = list()
-    questions_dict = app_context.question_loader.get_key('questions')
-    for question_key in questions_dict:
-        if questions_dict[question_key].get('type', None).lower() == QuestionTypes.OPEN:
-            open_questions_ids.append(questions_dict[question_key].get('id', None))
-    return open_questions_ids
-
-
-def get_team_name(team_id):
-    team_dict = app_context.team_loader.get_key('teams')
-    for team_key in team_dict:
-        if team_dict[team_key].get('id', None) == team_id:
-            return team_key
+def admin_check(func):
+    """
+    Decorator function that checks if request has X-Admin-Token header equal to service_config.admin_token.
+    Admin endpoints are disabled when admin_token is empty.
+    """
+    def checker(*args_, **kwargs_):
+        admin_token = app_context.settings["service_config"]["admin_token"]
+        if admin_token and hmac.compare_digest(str(request.headers.get('X-Admin-Token', '')), str(admin_token)):
+            return func(*args_, **kwargs_)
+        return u"Admin token is missing or invalid.", http.client.FORBIDDEN
+    return update_wrapper(checker, func)
 
 
-def get_answers(already_checked):
-    app_context.bugs = app_context.data_manager.get_bugs()
+def get_all_open_questions_ids():
+    return app_context.question_loader.get_index().open_questions_ids
 
-    open_questions_ids = get_all_open_questions_ids()
-    answers = app_context.data_manager.get_all_answers()
-    for answer in answers:
-        if int(answer[0]) in open_questions_ids:
-            app_context.bugs.append(answer)
 
-    app_context.already_checked = app_context.data_manager.get_already_checked_answers()
+def get_team_name(team_id):
+    return app_context.team_loader.get_index().get_name(team_id)
 
-    extended_bugs = list()
-
-    for bug in app_context.bugs:
-        if int(bug[0]) in open_questions_ids:
-            question_id = (int(bug[0]),)
-        else:
-            question_id = ('NULL',)
-        element = question_id + bug
-        extended_bugs.append(element)
 
+def get_answers(already_checked, team_id=None, question_id=None, limit=-1, offset=0):
+    """
+    Returns bugs and answers for open questions joined with their marks.
+    :param: already_checked - if True only marked bugs and answers are returned, otherwise only not marked
+    :param: team_id - optional filter
+    :param: question_id - optional filter, bugs are skipped if given
+    :param: limit - max number of returned bugs and answers, -1 for all
+    :param: offset - number of skipped bugs and answers
+    :return: list of tuples (question_id, id, guid, creation_time, team_id, content[, marks])
+    """
+    app_context.answers = app_context.data_manager.get_verification_answers(
+        get_all_open_questions_ids(), already_checked, team_id=team_id, question_id=question_id, limit=limit,
+        offset=offset)
+    return app_context.answers
 
-    marked_context = list()
-    not_marked_context = copy.deepcopy(extended_bugs)
 
-    for bug in extended_bugs:
-        for verified in app_context.already_checked:
-            if bug[2] in verified:
-                new_context_element = bug + (verified[7:12])
-                marked_context.append(new_context_element)
-                if bug in not_marked_context:
-                    not_marked_context.remove(bug)
+def get_results_version():
+    """
+    :return: version of results, changed when points or team list change
+    """
+    return app_context.data_manager.refresh_scoreboard().version, app_context.team_loader.get_index()
 
-    if already_checked:
-        app_context.answers = marked_context
-    else:
-        app_context.answers = not_marked_context
 
-    logger.logfile("New results: {0}".format(app_context.results))
-    return app_context.answers
+def cached_page(key, version, render, static=False):
+    """
+    Returns page from response cache, rendered again only when version changed.
+    :param: static - if True then clients can keep page for service_config.response_cache.static_max_age seconds
+    """
+    if app_context.response_cache is None:
+        return render()
+    entry = app_context.response_cache.get(key, version, render)
+    cache_control = "no-cache"
+    if static:
+        cache_control = "public, max-age={0}".format(app_context.settings["service_config"]["response_cache"]["static_max_age"])
+    return app_context.response_cache.make_response(entry, request, cache_control=cache_control)
 
 
 def process_results():
-    teams_data = app_context.team_loader.get_key('teams')
-    if app_context.results is None or app_context.last_results_request is None or \
-            time.time() - app_context.last_results_request > app_context.results_generation_delay:
-        team_results_dict = app_context.data_manager.get_results(teams_data)
-        app_context.results = common.sort_results(team_results_dict)
-
-        app_context.last_results_request = time.time()
-        logger.console("New results generated at {0}".format(common.get_date_time()))
-        logger.logfile("New results: {0}".format(app_context.results))
+    app_context.results = app_context.data_manager.refresh_scoreboard().get_ranking(app_context.team_loader.get_index())
     return app_context.results
 
 
-#@spam_check
 @team_check
+@spam_check
 @answer_check
 def process_answer(team_id, question_id, question_type, answer_content):
     team_name = get_team_name(team_id)
@@ -161,18 +168,22 @@ def process_answer(team_id, question_id, question_type, answer_content):
     if db_failure is False:
         if open_question is False:
             # check if answer is correct for closed questions
-            is_correct = common.is_question_correct(question_id, answer_content, question_dict=app_context.question_loader.get_key('questions'))
-            points = 0
-            if is_correct:
-                points = common.get_closed_answer_points(question_id, question_dict=app_context.question_loader.get_key('questions'))
-            failure, response = app_context.data_manager.insert_answer_result(team_id, question_id, question_guid, points=points)
+            grading_engine = app_context.question_loader.get_index().grading_engine
+            is_correct, points = grading_engine.grade(question_id, answer_content)
+            is_first = is_correct and not app_context.first_correct_answers.check_and_add(question_id)
+            bonus_for_first = points * app_context.bonuses.QUICKEST_ANSWER_BONUS if is_first else 0
+            failure, response = app_context.data_manager.insert_answer_result(team_id, question_id, question_guid,
+                                                                              points=points, bonus_for_first=bonus_for_first)
+            if is_first and (failure or isinstance(response, Exception)):
+                # result with the bonus was not saved, so the next correct answer gets it
+                app_context.first_correct_answers.discard(question_id)
         return "Answer for question '{0}' for team {1} added.".format(question_id, team_name, counter, creation_time), http.client.CREATED
     else:
         return "Answer was not created for team {0}.".format(team_name), http.client.UNPROCESSABLE_ENTITY
 
 
-#@spam_check
 @team_check
+@spam_check
 def process_bug(team_id, bug_content):
     team_name = get_team_name(team_id)
     db_failure, file_response, creation_time, counter = app_context.data_manager.add_bug(team_id, bug_content)
@@ -201,51 +212,203 @@ def _mark_bug(team_id, bug_guid, bug_id, points):
         return True, "Could not parse '{0}'".format(points)
 
 
+@app.template_filter('as_text')
+def as_text(value):
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    return value
+
+
+@app.before_request
+def start_request_timer():
+    # registered before inject_faults, so requests with injected faults are measured as well
+    if app_context.metrics is not None:
+        g.request_start = time.perf_counter()
+        app_context.metrics.requests_in_flight.inc()
+
+
+@app.after_request
+def observe_request(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        app_context.metrics.observe_request(request.endpoint, request.method, response.status_code,
+                                            time.perf_counter() - start)
+    return response
+
+
+@app.before_request
+def start_request_profile():
+    app_context.profiler.start_request()
+
+
+@app.teardown_request
+def finish_request_profile(exception=None):
+    app_context.profiler.finish_request(request.endpoint)
+
+
+@app.before_request
+def inject_faults():
+    return app_context.fault_injector.apply(request.endpoint)
+
+
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return cached_page('index', None, lambda: render_template('index.html'), static=True)
 
 @app.route('/send_bug')
 def send_bug():
-    time.sleep(5)
-    return render_template('send_bug.html')
+    return cached_page('send_bug', None, lambda: render_template('send_bug.html'), static=True)
 
 
 @app.route('/send_closed_answer')
 def send_closed_answer():
-    return render_template('send_closed_answer.html')
+    return cached_page('send_closed_answer', None, lambda: render_template('send_closed_answer.html'), static=True)
 
 
 @app.route('/send_open_answer')
 def send_open_answer():
-    return render_template('send_open_answer.html')
+    return cached_page('send_open_answer', None, lambda: render_template('send_open_answer.html'), static=True)
 
 
 @app.route('/rawresults', methods=['GET'])
 def get_rawresults():
-    return str(process_results()), http.client.OK
+    return cached_page('rawresults', get_results_version(), lambda: str(process_results()))
 
 
 @app.route('/results', methods=['GET'])
 def get_results():
     try:
-        results = process_results()
+        return cached_page('results', get_results_version(),
+                           lambda: render_template("results.html", results=process_results()))
     except Exception as e:
         results = [("Wystapil problem! Skontaktuj sie z administratorem!", "")]
         logger.console_fatal("Exception message='{0}'. Stack trace='{1}'".format(e, traceback.format_exc()))
     return render_template("results.html", results=results)
 
 
+@app.route('/config_stats', methods=['GET'])
+def get_config_stats():
+    return jsonify(teams=app_context.team_loader.get_stats(), questions=app_context.question_loader.get_stats())
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    if app_context.metrics is None:
+        abort(http.client.NOT_FOUND)
+    return Response(app_context.metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route('/admin/fault_injection', methods=['GET', 'POST'])
+@admin_check
+def fault_injection_config():
+    """
+    POST body: {"enabled": true, "routes": {"send_bug": {"delay": "uniform", "min_seconds": 1, "max_seconds": 3}}}
+    Route with null value is removed.
+    """
+    if request.method == 'POST':
+        config = request.get_json(force=True, silent=True)
+        if not isinstance(config, dict):
+            return u"Expected JSON object.", http.client.BAD_REQUEST
+        try:
+            for endpoint, rule_config in (config.get('routes', None) or {}).items():
+                app_context.fault_injector.set_rule(endpoint, rule_config)
+        except (TypeError, ValueError) as e:
+            return u"Invalid rule: {0}".format(e), http.client.BAD_REQUEST
+        if 'enabled' in config:
+            app_context.fault_injector.enabled = bool(config['enabled'])
+    return jsonify(app_context.fault_injector.get_config())
+
+
+@app.route('/admin/profile', methods=['GET', 'POST'])
+@admin_check
+def profile():
+    """
+    POST body starts profiling session: {"mode": "sample", "seconds": 30, "interval": 0.005, "trace_sql": true}
+    or {"mode": "cprofile", "requests": 100, "seconds": 60}.
+    GET returns results: JSON summary with top functions and SQL of each request,
+    ?format=collapsed - collapsed stacks for flamegraph.pl, ?format=top - pstats report.
+    Optional arguments: top (number of functions), sort (cumulative, tottime, calls).
+    """
+    if request.method == 'POST':
+        options = request.get_json(force=True, silent=True)
+        if not isinstance(options, dict):
+            return u"Expected JSON object.", http.client.BAD_REQUEST
+        try:
+            session = app_context.profiler.start(**options)
+        except (TypeError, ValueError) as e:
+            return u"Invalid options: {0}".format(e), http.client.BAD_REQUEST
+        except RuntimeError as e:
+            return u"{0}".format(e), http.client.CONFLICT
+        return jsonify(session.get_summary(top=0))
+    session = app_context.profiler.session
+    if session is None:
+        return u"No profiling session.", http.client.NOT_FOUND
+    was_parsed, top = common.get_float_from_string(request.args.get('top', 20))
+    top = int(top) if was_parsed else 20
+    sort = request.args.get('sort', 'cumulative')
+    try:
+        if request.args.get('format') == 'collapsed':
+            return Response(session.get_collapsed_stacks(), content_type="text/plain; charset=utf-8")
+        if request.args.get('format') == 'top':
+            return Response(session.get_top(top, sort), content_type="text/plain; charset=utf-8")
+        return jsonify(session.get_summary(top, sort))
+    except ValueError as e:
+        return u"{0}".format(e), http.client.BAD_REQUEST
+
+
+@app.route('/admin/profile/stop', methods=['POST'])
+@admin_check
+def stop_profile():
+    session = app_context.profiler.stop()
+    if session is None:
+        return u"No profiling session.", http.client.NOT_FOUND
+    return jsonify(session.get_summary(top=0))
+
+
+@app.route('/admin/rate_limit', methods=['GET'])
+@admin_check
+def rate_limit_stats():
+    if app_context.rate_limiter is None:
+        return jsonify(enabled=False)
+    return jsonify(enabled=True, **app_context.rate_limiter.get_stats())
+
+
+@app.route('/admin/recompute_results', methods=['POST'])
+@admin_check
+def recompute_results():
+    """
+    Grades all closed question answers again with current question list and quickest_answer_bonus.
+    """
+    stats = app_context.data_manager.recompute_results(app_context.question_loader.get_index().grading_engine,
+                                                       quickest_answer_bonus=app_context.bonuses.QUICKEST_ANSWER_BONUS)
+    logger.console(u"Results recomputed: {0}".format(stats))
+    return jsonify(stats)
+
+
 @app.route('/answer_verification', methods=['GET'])
 def verify_answers():
-    if request.args:
-        if 'already_checked' in request.args:
-            answers = get_answers(already_checked=1)
-        elif 'not_checked' in request.args:
-            answers = get_answers(already_checked=0)
-    else:
-        answers = get_answers(already_checked=0)
-    return render_template("verify_answers.html", answers=answers)
+    already_checked = 'already_checked' in request.args
+    team_id = request.args.get('team_id') or None
+    question_id = request.args.get('question_id') or None
+    page_size = app_context.settings["service_config"]["verification_page_size"]
+    was_parsed, page = common.get_float_from_string(request.args.get('page', 1))
+    page = max(int(page), 1) if was_parsed else 1
+
+    number_of_answers = app_context.data_manager.get_number_of_verification_answers(
+        get_all_open_questions_ids(), already_checked, team_id=team_id, question_id=question_id)
+    number_of_pages = max((number_of_answers + page_size - 1) // page_size, 1)
+    page = min(page, number_of_pages)
+    page_answers = get_answers(already_checked=already_checked, team_id=team_id, question_id=question_id,
+                               limit=page_size, offset=(page - 1) * page_size)
+
+    filters = dict()
+    filters['already_checked' if already_checked else 'not_checked'] = 1 if already_checked else 0
+    if team_id is not None:
+        filters['team_id'] = team_id
+    if question_id is not None:
+        filters['question_id'] = question_id
+    return render_template("verify_answers.html", answers=page_answers, page=page, number_of_pages=number_of_pages,
+                           number_of_answers=number_of_answers, filters=filters)
 
 
 @app.route('/answer_verification/update_points', methods=['POST'])
@@ -263,8 +426,10 @@ def update_points():
         print(str(response)), http.client.OK
     else:
         print(str(response)), http.client.UNPROCESSABLE_ENTITY
-    if 'answer_verification?already_checked=1' in request.headers.environ['HTTP_REFERER']:
-        return redirect(url_for('verify_answers', already_checked=1))
+    referer = request.headers.environ.get('HTTP_REFERER', '')
+    if '/answer_verification?' in referer:
+        # keeps filters and page of verification list
+        return redirect(referer)
     else:
         return redirect(url_for('verify_answers'))
 
@@ -341,7 +506,3 @@ def form_send_closed_answer():
 @app.errorhandler(http.client.NOT_FOUND)
 def not_found(error):
     return "Something went wrong! {0}".format(error), http.client.NOT_FOUND
-
-
-if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=app_context.settings["service_config"]["port"], debug=True)
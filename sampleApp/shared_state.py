@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+
+import common
+import connection_pool
+import id_generator
+import rate_limiter
+
+# Workers starting in parallel wait for registration of each other, which may rebuild large tables
+REGISTRATION_BUSY_TIMEOUT_MS = 120000
+
+
+def is_process_alive(pid):
+    """
+    :return: bool - True if process with given ID is running on this machine
+    """
+    if os.name == "nt":
+        import ctypes
+        synchronize = 0x00100000
+        wait_timeout = 0x00000102
+        handle = ctypes.windll.kernel32.OpenProcess(synchronize, False, pid)
+        if not handle:
+            return False
+        try:
+            return ctypes.windll.kernel32.WaitForSingleObject(handle, 0) == wait_timeout
+        finally:
+            ctypes.windll.kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SharedState(object):
+    """
+    State which has to be the same in all worker processes (answered questions, last request time of each
+    team, version of results) kept in separate SQLite database. Each check is a single atomic statement,
+    so parallel requests handled by different workers never get different decisions.
+    Each worker process registers itself and gets unique worker ID, see register_worker.
+    """
+    def __init__(self, db_path, pool_size=5, pragmas=None):
+        """
+        :param: db_path - path to shared state database file, created if missing
+        :param: pool_size - max number of open connections
+        :param: pragmas - dictionary of PRAGMA name and value executed for each new connection
+        """
+        self._pool = connection_pool.ConnectionPool(db_path, pool_size=pool_size, pragmas=pragmas)
+        with self._pool.connection() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS ANSWERED "
+                               "(TEAM_ID TEXT NOT NULL, QUESTION_ID TEXT NOT NULL, PRIMARY KEY (TEAM_ID, QUESTION_ID)) "
+                               "WITHOUT ROWID")
+            connection.execute("CREATE TABLE IF NOT EXISTS FIRST_CORRECT_ANSWERS "
+                               "(QUESTION_ID TEXT PRIMARY KEY NOT NULL) WITHOUT ROWID")
+            connection.execute("CREATE TABLE IF NOT EXISTS SPAM "
+                               "(TEAM_ID TEXT PRIMARY KEY NOT NULL, LAST_REQUEST REAL NOT NULL)")
+            connection.execute("CREATE TABLE IF NOT EXISTS RATE_LIMIT "
+                               "(TEAM_ID TEXT PRIMARY KEY NOT NULL, TOKENS REAL NOT NULL, LAST_REFILL REAL NOT NULL, "
+                               "REJECTED INTEGER NOT NULL DEFAULT 0)")
+            connection.execute("CREATE TABLE IF NOT EXISTS COUNTERS "
+                               "(NAME TEXT PRIMARY KEY NOT NULL, VALUE INTEGER NOT NULL)")
+            connection.execute("INSERT OR IGNORE INTO COUNTERS VALUES ('RESULTS_VERSION', 0)")
+            connection.execute("CREATE TABLE IF NOT EXISTS WORKERS "
+                               "(WORKER_ID INTEGER PRIMARY KEY NOT NULL, PID INTEGER NOT NULL, STARTED REAL NOT NULL)")
+            connection.commit()
+
+    def close(self):
+        self._pool.close()
+
+    def register_worker(self, answered_questions, first_correct_question_ids):
+        """
+        Gives the lowest worker ID which is not used by running process. The first worker which starts when
+        no other worker is running rebuilds answered questions and first correct answers from given data,
+        so rows left by previous run (e.g. before databases were reset) are removed. Workers which start
+        later (e.g. restarted by gunicorn) keep the tables, they are up to date.
+        Registration is one transaction which locks the database, so workers starting in parallel
+        see each other and only one of them rebuilds the tables.
+        :param: answered_questions - dictionary where key is team ID and value is set of question IDs
+        :param: first_correct_question_ids - IDs of questions which have correct answer
+        :return: worker ID (0 - id_generator.MAX_WORKER_ID)
+        """
+        with self._pool.connection() as connection:
+            busy_timeout = connection.execute("PRAGMA busy_timeout").fetchone()[0]
+            isolation_level = connection.isolation_level
+            connection.isolation_level = None
+            connection.execute("PRAGMA busy_timeout = {0}".format(REGISTRATION_BUSY_TIMEOUT_MS))
+            try:
+                connection.execute("BEGIN IMMEDIATE")
+                try:
+                    worker_id = self._register_worker(connection, answered_questions, first_correct_question_ids)
+                    connection.execute("COMMIT")
+                except Exception:
+                    connection.execute("ROLLBACK")
+                    raise
+            finally:
+                connection.execute("PRAGMA busy_timeout = {0}".format(busy_timeout))
+                connection.isolation_level = isolation_level
+        return worker_id
+
+    def _register_worker(self, connection, answered_questions, first_correct_question_ids):
+        used_worker_ids = set()
+        for worker_id, pid in connection.execute("SELECT WORKER_ID, PID FROM WORKERS").fetchall():
+            if is_process_alive(pid):
+                used_worker_ids.add(worker_id)
+            else:
+                connection.execute("DELETE FROM WORKERS WHERE WORKER_ID = ?", (worker_id,))
+        if not used_worker_ids:
+            connection.execute("DELETE FROM ANSWERED")
+            connection.executemany("INSERT OR IGNORE INTO ANSWERED VALUES (?, ?)",
+                                   ((str(team_id), str(question_id)) for team_id in answered_questions
+                                    for question_id in answered_questions[team_id]))
+            connection.execute("DELETE FROM FIRST_CORRECT_ANSWERS")
+            connection.executemany("INSERT OR IGNORE INTO FIRST_CORRECT_ANSWERS VALUES (?)",
+                                   ((str(question_id),) for question_id in first_correct_question_ids))
+        for worker_id in range(id_generator.MAX_WORKER_ID + 1):
+            if worker_id not in used_worker_ids:
+                connection.execute("INSERT INTO WORKERS VALUES (?, ?, ?)", (worker_id, os.getpid(), time.time()))
+                return worker_id
+        raise Exception("All {0} worker IDs are used by running processes".format(id_generator.MAX_WORKER_ID + 1))
+
+    def unregister_worker(self, worker_id):
+        self._execute("DELETE FROM WORKERS WHERE WORKER_ID = ?", (worker_id,))
+
+    def _execute(self, query, params=()):
+        """
+        Executes single statement in own transaction.
+        :return: number of changed rows
+        """
+        with self._pool.connection() as connection:
+            cursor = connection.execute(query, params)
+            connection.commit()
+            return cursor.rowcount
+
+    def _fetch(self, query, params=()):
+        with self._pool.connection() as connection:
+            return connection.execute(query, params).fetchall()
+
+    def add_answered_questions(self, answered_questions):
+        """
+        :param: answered_questions - dictionary where key is team ID and value is set of question IDs
+        """
+        rows = [(str(team_id), str(question_id)) for team_id in answered_questions
+                for question_id in answered_questions[team_id]]
+        with self._pool.connection() as connection:
+            connection.executemany("INSERT OR IGNORE INTO ANSWERED VALUES (?, ?)", rows)
+            connection.commit()
+
+    def check_and_add_answered_question(self, team_id, question_id):
+        """
+        :return: bool - True if question was already answered
+        """
+        return self._execute("INSERT OR IGNORE INTO ANSWERED VALUES (?, ?)", (str(team_id), str(question_id))) == 0
+
+    def is_question_answered(self, team_id, question_id):
+        return bool(self._fetch("SELECT 1 FROM ANSWERED WHERE TEAM_ID = ? AND QUESTION_ID = ?",
+                                (str(team_id), str(question_id))))
+
+    def get_answered_question_ids(self, team_id):
+        return frozenset(row[0] for row in self._fetch("SELECT QUESTION_ID FROM ANSWERED WHERE TEAM_ID = ?",
+                                                       (str(team_id),)))
+
+    def get_number_of_answered_questions(self):
+        return self._fetch("SELECT count(*) FROM ANSWERED")[0][0]
+
+    def add_first_correct_answers(self, question_ids, replace=False):
+        """
+        :param: replace - if True, then previous question IDs are removed
+        """
+        with self._pool.connection() as connection:
+            with connection:
+                if replace:
+                    connection.execute("DELETE FROM FIRST_CORRECT_ANSWERS")
+                connection.executemany("INSERT OR IGNORE INTO FIRST_CORRECT_ANSWERS VALUES (?)",
+                                       [(str(question_id),) for question_id in question_ids])
+
+    def check_and_add_first_correct_answer(self, question_id):
+        """
+        :return: bool - True if question already had correct answer
+        """
+        return self._execute("INSERT OR IGNORE INTO FIRST_CORRECT_ANSWERS VALUES (?)", (str(question_id),)) == 0
+
+    def remove_first_correct_answer(self, question_id):
+        self._execute("DELETE FROM FIRST_CORRECT_ANSWERS WHERE QUESTION_ID = ?", (str(question_id),))
+
+    def has_correct_answer(self, question_id):
+        return bool(self._fetch("SELECT 1 FROM FIRST_CORRECT_ANSWERS WHERE QUESTION_ID = ?", (str(question_id),)))
+
+    def get_number_of_correctly_answered_questions(self):
+        return self._fetch("SELECT count(*) FROM FIRST_CORRECT_ANSWERS")[0][0]
+
+    def check_if_spam(self, team_id, seconds):
+        """
+        Saves time of the request if previous one was made more than given number of seconds ago.
+        :return: bool - True if request is a spam
+        """
+        now = time.time()
+        if self._execute("INSERT OR IGNORE INTO SPAM VALUES (?, ?)", (str(team_id), now)) == 1:
+            return False
+        return self._execute("UPDATE SPAM SET LAST_REQUEST = ? WHERE TEAM_ID = ? AND LAST_REQUEST < ?",
+                             (now, str(team_id), now - seconds)) == 0
+
+    def take_token(self, team_id, burst, refill_per_second):
+        """
+        Takes one token from bucket of the team, bucket is refilled in the same statement.
+        :return: bool - True if request is accepted
+        """
+        now = time.time()
+        team_id = str(team_id)
+        if self._execute("INSERT OR IGNORE INTO RATE_LIMIT (TEAM_ID, TOKENS, LAST_REFILL) VALUES (?, ?, ?)",
+                         (team_id, burst - 1, now)) == 1:
+            return True
+        if self._execute("UPDATE RATE_LIMIT SET TOKENS = min(?, TOKENS + (? - LAST_REFILL) * ?) - 1, LAST_REFILL = ? "
+                         "WHERE TEAM_ID = ? AND min(?, TOKENS + (? - LAST_REFILL) * ?) >= 1",
+                         (burst, now, refill_per_second, now, team_id, burst, now, refill_per_second)) == 1:
+            return True
+        self._execute("UPDATE RATE_LIMIT SET REJECTED = REJECTED + 1 WHERE TEAM_ID = ?", (team_id,))
+        return False
+
+    def remove_idle_rate_limits(self, idle_seconds):
+        """
+        :return: number of removed buckets
+        """
+        return self._execute("DELETE FROM RATE_LIMIT WHERE LAST_REFILL < ?", (time.time() - idle_seconds,))
+
+    def get_rejected_requests(self):
+        return dict(self._fetch("SELECT TEAM_ID, REJECTED FROM RATE_LIMIT WHERE REJECTED > 0"))
+
+    def get_number_of_rate_limits(self):
+        return self._fetch("SELECT count(*) FROM RATE_LIMIT")[0][0]
+
+    def increment_results_version(self):
+        self._execute("UPDATE COUNTERS SET VALUE = VALUE + 1 WHERE NAME = 'RESULTS_VERSION'")
+
+    def get_results_version(self):
+        return self._fetch("SELECT VALUE FROM COUNTERS WHERE NAME = 'RESULTS_VERSION'")[0][0]
+
+
+class SharedAnsweredQuestionsIndex(common.AnsweredQuestionsIndex):
+    """
+    AnsweredQuestionsIndex kept in SharedState, used when service runs in more than one process.
+    """
+    def __init__(self, shared_state, answered_questions=None):
+        """
+        :param: shared_state - SharedState
+        :param: answered_questions - dictionary where key is team ID and value is set of question IDs
+        """
+        super(SharedAnsweredQuestionsIndex, self).__init__()
+        self._shared_state = shared_state
+        if answered_questions:
+            self._shared_state.add_answered_questions(answered_questions)
+
+    def __contains__(self, team_question):
+        team_id, question_id = team_question
+        return self._shared_state.is_question_answered(team_id, question_id)
+
+    def __len__(self):
+        return self._shared_state.get_number_of_answered_questions()
+
+    def get_question_ids(self, team_id):
+        return self._shared_state.get_answered_question_ids(team_id)
+
+    def add(self, team_id, question_id):
+        self._shared_state.check_and_add_answered_question(team_id, question_id)
+
+    def check_and_add(self, team_id, question_id):
+        return self._shared_state.check_and_add_answered_question(team_id, question_id)
+
+
+class SharedFirstCorrectAnswerIndex(common.FirstCorrectAnswerIndex):
+    """
+    FirstCorrectAnswerIndex kept in SharedState, used when service runs in more than one process.
+    """
+    def __init__(self, shared_state, question_ids=None):
+        super(SharedFirstCorrectAnswerIndex, self).__init__()
+        self._shared_state = shared_state
+        if question_ids:
+            self._shared_state.add_first_correct_answers(question_ids)
+
+    def __contains__(self, question_id):
+        return self._shared_state.has_correct_answer(question_id)
+
+    def __len__(self):
+        return self._shared_state.get_number_of_correctly_answered_questions()
+
+    def check_and_add(self, question_id):
+        return self._shared_state.check_and_add_first_correct_answer(question_id)
+
+    def discard(self, question_id):
+        self._shared_state.remove_first_correct_answer(question_id)
+
+    def reset(self, question_ids):
+        self._shared_state.add_first_correct_answers(question_ids, replace=True)
+
+
+class SharedSpamTable(common.SpamTable):
+    """
+    SpamTable kept in SharedState, used when service runs in more than one process.
+    """
+    def __init__(self, shared_state):
+        super(SharedSpamTable, self).__init__()
+        self._shared_state = shared_state
+
+    def check_and_update(self, team_id, seconds):
+        return self._shared_state.check_if_spam(team_id, seconds)
+
+
+class SharedRateLimiter(rate_limiter.TokenBucketRateLimiter):
+    """
+    TokenBucketRateLimiter kept in SharedState, used when service runs in more than one process.
+    Buckets of idle teams are removed every cleanup_interval checks.
+    """
+    def __init__(self, shared_state, requests_per_minute, burst, idle_seconds=600, cleanup_interval=1000):
+        super(SharedRateLimiter, self).__init__(requests_per_minute, burst, idle_seconds=idle_seconds)
+        self._shared_state = shared_state
+        self._cleanup_interval = cleanup_interval
+        self._checks = 0
+
+    def check(self, team_id):
+        self._checks += 1
+        if self._checks % self._cleanup_interval == 0:
+            self.evicted_teams += self._shared_state.remove_idle_rate_limits(self._idle_seconds)
+        return self._shared_state.take_token(team_id, self.burst, self._refill_per_second)
+
+    def get_rejected_requests(self):
+        return self._shared_state.get_rejected_requests()
+
+    def get_stats(self):
+        stats = super(SharedRateLimiter, self).get_stats()
+        stats["teams"] = self._shared_state.get_number_of_rate_limits()
+        return stats
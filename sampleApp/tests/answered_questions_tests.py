@@ -0,0 +1,79 @@
+import threading
+import unittest
+
+import common
+import data_manager_setup
+
+
+class AnsweredQuestionsTests(data_manager_setup.DataManagerTestSetUp):
+
+    def test_answered_questions_loaded_per_team(self):
+        self.data_manager.add_answer("AAA", "1", u"A", add_to_file=False)
+        self.data_manager.add_answer("AAA", "2", u"B", add_to_file=False)
+        self.data_manager.add_answer("BBB", "1", u"C", add_to_file=False)
+
+        answered_questions = self.data_manager.get_answered_qestions_per_team()
+
+        assert answered_questions == {"AAA": {"1", "2"}, "BBB": {"1"}}, \
+            "Unexpected answered questions: {0}".format(answered_questions)
+
+    def test_index_updated_by_add_answer(self):
+        answers_table = self.data_manager.get_answered_qestions()
+        self.data_manager.add_answer("AAA", "3", u"A", add_to_file=False)
+
+        assert common.check_if_was_answered("AAA", "3", answers_table), "Question 3 should be answered by AAA"
+        assert not common.check_if_was_answered("BBB", "3", answers_table), "Question 3 should not be answered by BBB"
+
+    def test_only_one_parallel_answer_accepted(self):
+        answers_table = common.AnsweredQuestionsIndex()
+        accepted = list()
+
+        def answer():
+            if not common.check_if_was_answered("AAA", "1", answers_table):
+                accepted.append(True)
+
+        threads = [threading.Thread(target=answer) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(accepted) == 1, "Expected 1 accepted answer, actual: {0}".format(len(accepted))
+
+    def test_first_correct_answers_loaded_from_results(self):
+        self.data_manager.insert_answer_result("AAA", "1", "guid_1", points=1)
+        self.data_manager.insert_answer_result("BBB", "2", "guid_2", points=0)
+        self.data_manager.mark_bug("CCC", "3", "7", "bug_guid_1", "1", "0", "0", "0", u"")
+
+        first_correct_answers = self.data_manager.get_first_correct_answers()
+
+        assert "1" in first_correct_answers, "Question 1 should have correct answer"
+        assert len(first_correct_answers) == 1, "Expected 1 question, actual: {0}".format(len(first_correct_answers))
+
+    def test_only_one_parallel_correct_answer_is_first(self):
+        first_correct_answers = common.FirstCorrectAnswerIndex()
+        first = list()
+
+        def answer():
+            if not first_correct_answers.check_and_add("1"):
+                first.append(True)
+
+        threads = [threading.Thread(target=answer) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(first) == 1, "Expected 1 first answer, actual: {0}".format(len(first))
+
+    def test_discarded_first_correct_answer_given_again(self):
+        first_correct_answers = common.FirstCorrectAnswerIndex()
+        first_correct_answers.check_and_add("1")
+
+        first_correct_answers.discard("1")
+
+        assert not first_correct_answers.check_and_add("1"), "Next correct answer should get bonus"
+
+
+if __name__ == "__main__":
+    unittest.main()
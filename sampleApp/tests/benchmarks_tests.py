@@ -0,0 +1,211 @@
+"""
+Micro-benchmarks of hot paths at 10 - 100k teams and rows. Requires pytest-benchmark, skipped without it.
+
+Save results and compare with the previous saved run:
+python -m pytest tests/benchmarks_tests.py --benchmark-autosave --benchmark-storage=tests/.benchmarks
+python -m pytest tests/benchmarks_tests.py --benchmark-storage=tests/.benchmarks --benchmark-compare --benchmark-compare-fail=mean:20%
+"""
+import importlib
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+import yaml
+
+pytest.importorskip("pytest_benchmark")
+
+import app_context
+import common
+import generate_data
+
+SCALES = [10, 1000, 100000]
+NUMBER_OF_QUESTIONS = 50
+# Teams without seeded answers, which send answers during benchmarks
+NUMBER_OF_LOAD_TEAMS = 100
+WRITE_ROUNDS = 200
+
+
+class Event(object):
+    """
+    Service with databases and team list seeded with given number of teams, answers and results.
+    """
+    def __init__(self, scale):
+        self.scale = scale
+        self.tmp_dir = tempfile.mkdtemp()
+        self.question_list_path = os.path.join(self.tmp_dir, "question_list.yaml")
+        team_list_path = os.path.join(self.tmp_dir, "team_list.yaml")
+        generate_data.generate(os.path.join(self.tmp_dir, "primary.db"), os.path.join(self.tmp_dir, "results.db"),
+                               team_list_path, self.question_list_path, number_of_teams=scale,
+                               number_of_questions=NUMBER_OF_QUESTIONS, number_of_bugs=max(scale // 10, 1),
+                               number_of_answers=scale, seed=1)
+        with open(team_list_path) as team_file:
+            team_list = yaml.safe_load(team_file)
+        self.team_ids = [team["id"] for team in team_list["teams"].values()]
+        self.load_team_ids = ["LOAD{0:05d}".format(number) for number in range(NUMBER_OF_LOAD_TEAMS)]
+        for team_id in self.load_team_ids:
+            team_list["teams"]["Team" + team_id] = {"id": team_id}
+        generate_data.write_yaml(team_list_path, team_list)
+
+        with open(common.get_config_path(os.path.join(os.path.dirname(__file__), os.pardir))) as config_file:
+            settings = yaml.safe_load(config_file)
+        settings["db_config"]["primary_db_path"] = os.path.join(self.tmp_dir, "primary.db")
+        settings["db_config"]["result_db_path"] = os.path.join(self.tmp_dir, "results.db")
+        for files_path in ("bug_files_path", "open_questions_files_path", "closed_questions_files_path"):
+            settings["db_config"][files_path] = os.path.join(self.tmp_dir, files_path)
+        settings["log"]["output"] = os.path.join(self.tmp_dir, "logs")
+        settings["log"]["level"] = "WARNING"
+        settings["service_config"]["team_list"] = team_list_path
+        settings["service_config"]["question_list"] = self.question_list_path
+        settings["service_config"]["post_delay"] = 0
+        settings["service_config"]["rate_limit"]["enabled"] = False
+        settings["service_config"]["server"]["shared_state"] = False
+        self.config_path = os.path.join(self.tmp_dir, "config.yaml")
+        generate_data.write_yaml(self.config_path, settings)
+        self.service = None
+        self.context = None
+        self.closed_question_ids = None
+        self.unanswered = None
+
+    def start(self):
+        """
+        Creates AppContext from config of the event. Service module creates its own AppContext on import,
+        so it is imported only here, when config points to temporary files, and reused by next events.
+        """
+        previous_config_path = os.environ.get("SAMPLEAPP_CONFIG")
+        os.environ["SAMPLEAPP_CONFIG"] = self.config_path
+        try:
+            if "service" in sys.modules:
+                self.service = sys.modules["service"]
+                self.context = app_context.AppContext()
+            else:
+                self.service = importlib.import_module("service")
+                self.context = self.service.app_context
+        finally:
+            if previous_config_path is None:
+                del os.environ["SAMPLEAPP_CONFIG"]
+            else:
+                os.environ["SAMPLEAPP_CONFIG"] = previous_config_path
+        open_questions_ids = self.context.question_loader.get_index().open_questions_ids
+        self.closed_question_ids = [question["id"] for question in self.context.question_loader.get_key("questions").values()
+                                    if question["id"] not in open_questions_ids]
+        # each answer sent during benchmarks is for other team and question, so it is never a duplicate
+        self.unanswered = itertools.product(self.load_team_ids, self.closed_question_ids)
+
+    def close(self):
+        self.context.data_manager.close()
+        shutil.rmtree(self.tmp_dir)
+
+
+@pytest.fixture(scope="module", params=SCALES, ids=lambda scale: "{0}_rows".format(scale))
+def event(request):
+    event = Event(request.param)
+    event.start()
+    previous_context = event.service.app_context
+    event.service.app_context = event.context
+    yield event
+    event.service.app_context = previous_context
+    event.close()
+
+
+@pytest.fixture
+def client(event):
+    return event.service.app.test_client()
+
+
+def test_is_id_present(benchmark, event):
+    team_index = event.context.team_loader.get_index()
+    team_id = event.team_ids[-1]
+
+    assert benchmark(common.is_id_present, id=team_id, dict_obj=team_index), "Team should be present"
+
+
+def test_is_question_correct(benchmark, event):
+    question_index = event.context.question_loader.get_index()
+    question_id = event.closed_question_ids[-1]
+    answer = question_index.get_question(question_id)["answer"]
+
+    assert benchmark(common.is_question_correct, question_id, answer, question_index), "Answer should be correct"
+
+
+def test_check_if_spam(benchmark, event):
+    spam_table = common.SpamTable()
+    for team_id in event.team_ids:
+        common.check_if_spam(team_id=team_id, spam_table=spam_table, seconds=5)
+
+    assert benchmark(common.check_if_spam, team_id=event.team_ids[-1], spam_table=spam_table, seconds=5), \
+        "Second request within 5 seconds should be spam"
+
+
+def test_check_if_was_answered(benchmark, event):
+    benchmark(common.check_if_was_answered, team_id=event.team_ids[0], question_id=event.closed_question_ids[0],
+              answered_question_table=event.context.answers_table)
+
+
+def test_yaml_config_file_loader_get_key(benchmark, event):
+    teams = benchmark(event.context.team_loader.get_key, "teams")
+
+    assert len(teams) == event.scale + NUMBER_OF_LOAD_TEAMS, "Unexpected number of teams: {0}".format(len(teams))
+
+
+def test_data_manager_add_bug(benchmark, event):
+    failure = benchmark.pedantic(lambda: event.context.data_manager.add_bug(event.load_team_ids[0], "bug")[0],
+                                 rounds=WRITE_ROUNDS, iterations=1)
+
+    assert failure is False, "Bug should be added"
+
+
+def test_data_manager_add_answer(benchmark, event):
+    def add_answer():
+        team_id, question_id = next(event.unanswered)
+        return event.context.data_manager.add_answer(team_id, question_id, u"A", open_question=False)[0]
+
+    failure = benchmark.pedantic(add_answer, rounds=WRITE_ROUNDS, iterations=1)
+
+    assert failure is False, "Answer should be added"
+
+
+def test_scoreboard_ranking(benchmark, event):
+    team_index = event.context.team_loader.get_index()
+
+    ranking = benchmark(lambda: event.context.data_manager.refresh_scoreboard().get_ranking(team_index))
+
+    assert len(ranking) == event.scale + NUMBER_OF_LOAD_TEAMS, "Unexpected number of results"
+
+
+def test_service_get_answers(benchmark, event):
+    with event.service.app.test_request_context():
+        benchmark(event.service.get_answers, already_checked=False)
+
+
+def test_post_bug(benchmark, event, client):
+    response = benchmark.pedantic(client.post, args=("/postformbug",),
+                                  kwargs={"data": {"team_id": event.load_team_ids[1], "bug_content": "bug"}},
+                                  rounds=WRITE_ROUNDS, iterations=1)
+
+    assert response.status_code == 201, "Unexpected status: {0}".format(response.status_code)
+
+
+def test_post_closed_answer(benchmark, event, client):
+    def post_answer():
+        team_id, question_id = next(event.unanswered)
+        return client.post("/postformanswer/closed", data={"team_id": team_id, "question_id": question_id,
+                                                           "answer": "A"})
+
+    response = benchmark.pedantic(post_answer, rounds=WRITE_ROUNDS, iterations=1)
+
+    assert b"added" in response.data, "Unexpected response: {0}".format(response.data)
+
+
+def test_get_results(benchmark, event, client):
+    response = benchmark(client.get, "/results")
+
+    assert response.status_code == 200, "Unexpected status: {0}".format(response.status_code)
+
+
+def test_get_answer_verification(benchmark, event, client):
+    response = benchmark(client.get, "/answer_verification")
+
+    assert response.status_code == 200, "Unexpected status: {0}".format(response.status_code)
@@ -0,0 +1,73 @@
+import io
+import os
+import sqlite3
+import unittest
+
+import bulk_import
+import csv_reader
+import data_manager_setup
+
+
+class BulkImportTests(data_manager_setup.DatabaseTestSetUp):
+
+    def _write_file(self, file_name, content):
+        file_path = os.path.join(self.tmp_dir, file_name)
+        with io.open(file_path, "w", encoding="utf-8") as csv_file:
+            csv_file.write(content)
+        return file_path
+
+    def test_reader_skips_spaces_and_converts_types(self):
+        file_path = self._write_file("key.csv", u"QuestionID, QuestionAnswer\n1, a\n2, b c\n3, d\n")
+        reader = csv_reader.CSVReader(file_path, column_types=bulk_import.ANSWER_KEY_COLUMN_TYPES)
+
+        chunks = list(reader.iter_chunks(chunk_size=2))
+
+        assert chunks == [[{"QuestionID": 1, "QuestionAnswer": "a"}, {"QuestionID": 2, "QuestionAnswer": "b c"}],
+                          [{"QuestionID": 3, "QuestionAnswer": "d"}]], "Unexpected chunks: {0}".format(chunks)
+
+    def test_invalid_value_reported_with_line(self):
+        file_path = self._write_file("key.csv", u"QuestionID, QuestionAnswer\n1, a\nx, b\n")
+        reader = csv_reader.CSVReader(file_path, column_types=bulk_import.ANSWER_KEY_COLUMN_TYPES)
+
+        self.assertRaisesRegex(ValueError, "key.csv:3", reader.read)
+
+    def test_answers_imported_and_graded_with_answer_key(self):
+        answers_path = self._write_file("answers.csv", u"TeamID, QuestionID, Answer\n"
+                                                       u"AAA, 1, C\nBBB, 1, A\nBBB, 2, zażółć\n")
+        key_path = self._write_file("key.csv", u"QuestionID, QuestionAnswer\n1, c\n")
+        questions = {1: {"id": 1, "type": "closed", "answer": "A", "points": 2},
+                     2: {"id": 2, "type": "closed", "answer": "B", "points": 1}}
+
+        stats = bulk_import.import_answers(self.primary_db_path, answers_path, chunk_size=2, chunks_per_transaction=1)
+        grading_engine = bulk_import.read_answer_key(key_path, questions)
+
+        assert stats["answers"] == 3, "Expected 3 imported answers, actual: {0}".format(stats["answers"])
+        connection = sqlite3.connect(self.primary_db_path)
+        rows = connection.execute("SELECT TEAM_ID, QUESTION_ID, ANSWER_CONTENT FROM ANSWERS ORDER BY CREATED_TS").fetchall()
+        connection.close()
+        assert rows[2] == ("BBB", "2", str(u"zażółć".encode("utf-8"))), "Unexpected answer: {0}".format(rows[2])
+        assert grading_engine.grade(1, u"C") == (True, 2), "Answer key should replace correct answer"
+        assert questions[1]["answer"] == "A", "Question list should not be changed"
+
+    def test_answers_to_answered_questions_skipped(self):
+        first_path = self._write_file("first.csv", u"TeamID, QuestionID, Answer\nAAA, 1, A\n")
+        second_path = self._write_file("second.csv", u"TeamID, QuestionID, Answer, CreatedTs\n"
+                                                     u"AAA, 1, B, 1\nBBB, 1, C,\nBBB, 1, D, 3\nBBB, 2, E, 4\n")
+        bulk_import.import_answers(self.primary_db_path, first_path)
+
+        stats = bulk_import.import_answers(self.primary_db_path, second_path, chunk_size=2)
+
+        assert stats["answers"] == 2, "Expected 2 imported answers, actual: {0}".format(stats["answers"])
+        assert stats["skipped_answers"] == 2, "Expected 2 skipped answers, actual: {0}".format(stats["skipped_answers"])
+        connection = sqlite3.connect(self.primary_db_path)
+        rows = connection.execute("SELECT TEAM_ID, QUESTION_ID, ANSWER_CONTENT FROM ANSWERS ORDER BY ID").fetchall()
+        created_ts = connection.execute("SELECT CREATED_TS FROM ANSWERS WHERE TEAM_ID = 'BBB' AND QUESTION_ID = '1'")\
+            .fetchone()[0]
+        connection.close()
+        assert rows == [("AAA", "1", "b'A'"), ("BBB", "1", "b'C'"), ("BBB", "2", "b'E'")], \
+            "Only the first answer of each team to each question should be imported: {0}".format(rows)
+        assert created_ts > 10 ** 15, "Blank CreatedTs should be replaced by current time, actual: {0}".format(created_ts)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import common
+
+
+class ConfigIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.team_list_path = os.path.join(self.tmp_dir, "team_list.yaml")
+        self._write_teams(["AAA", "BBB"])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _write_teams(self, team_ids):
+        with open(self.team_list_path, "w") as team_file:
+            team_file.write("teams:\n")
+            for number, team_id in enumerate(team_ids):
+                team_file.write("  Team{0}:\n    id: \"{1}\"\n".format(number + 1, team_id))
+
+    def test_team_index_lookup(self):
+        loader = common.YamlConfigFileLoader(self.team_list_path, index_builder=common.build_team_index)
+        team_index = loader.get_index()
+        assert common.is_id_present(id="BBB", dict_obj=team_index), "Team 'BBB' expected in index"
+        assert not common.is_id_present(id="ZZZ", dict_obj=team_index), "Team 'ZZZ' not expected in index"
+        assert team_index.get_name("AAA") == "Team1", "Expected 'Team1', actual: {0}".format(team_index.get_name("AAA"))
+
+    def test_team_index_rebuilt_after_file_change(self):
+        loader = common.YamlConfigFileLoader(self.team_list_path, index_builder=common.build_team_index)
+        first_index = loader.get_index()
+        assert loader.get_index() is first_index, "Index should not be rebuilt when file was not modified"
+
+        self._touch_team_list(["AAA", "BBB", "CCC"])
+
+        assert "CCC" in loader.get_index(), "Team 'CCC' expected in index after reload"
+
+    def _touch_team_list(self, team_ids):
+        self._write_teams(team_ids)
+        modification_time = os.stat(self.team_list_path).st_mtime + 10
+        os.utime(self.team_list_path, (modification_time, modification_time))
+
+    def test_no_reload_within_freshness_window(self):
+        loader = common.YamlConfigFileLoader(self.team_list_path, index_builder=common.build_team_index,
+                                             freshness_window=60)
+        loader.get_index()
+        loader.get_index()  # starts freshness window
+        self._touch_team_list(["AAA", "BBB", "CCC"])
+
+        assert "CCC" not in loader.get_index(), "File should not be checked within freshness window"
+        assert loader.get_stats()["reload_counter"] == 1, \
+            "Expected 1 reload, actual: {0}".format(loader.get_stats()["reload_counter"])
+
+    def test_watcher_swaps_snapshot(self):
+        loader = common.YamlConfigFileLoader(self.team_list_path, index_builder=common.build_team_index,
+                                             watch_interval=0.01)
+        try:
+            self._touch_team_list(["AAA", "BBB", "CCC"])
+            deadline = time.time() + 5
+            while "CCC" not in loader.get_index() and time.time() < deadline:
+                time.sleep(0.01)
+            assert "CCC" in loader.get_index(), "Watcher should load modified file"
+            assert loader.get_stats()["last_reload_latency"] is not None, "Reload latency should be recorded"
+        finally:
+            loader.stop_watcher()
+
+    def test_broken_file_keeps_previous_snapshot(self):
+        loader = common.YamlConfigFileLoader(self.team_list_path, index_builder=common.build_team_index)
+        loader.get_index()
+        with open(self.team_list_path, "w") as team_file:
+            team_file.write("teams: [\n")
+        modification_time = os.stat(self.team_list_path).st_mtime + 10
+        os.utime(self.team_list_path, (modification_time, modification_time))
+
+        assert "AAA" in loader.get_index(), "Previous snapshot should be used when file is broken"
+        assert loader.get_stats()["failed_reload_counter"] == 1, \
+            "Expected 1 failed reload, actual: {0}".format(loader.get_stats()["failed_reload_counter"])
+
+    def test_question_index(self):
+        questions = {
+            1: {'id': 1, 'type': 'closed', 'answer': 'A', 'points': 1},
+            2: {'id': 2, 'type': 'open', 'points': 2},
+        }
+        question_index = common.QuestionIndex(questions)
+        assert common.check_question_type("1", "closed", question_index), "Question 1 should be closed"
+        assert not common.check_question_type("2", "closed", question_index), "Question 2 should be open"
+        assert not common.check_question_type("3", "closed", question_index), "Question 3 should not exist"
+        assert question_index.open_questions_ids == frozenset([2]), \
+            "Expected open questions: [2], actual: {0}".format(list(question_index.open_questions_ids))
+
+
+if __name__ == "__main__":
+    unittest.main()
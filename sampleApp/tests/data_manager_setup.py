@@ -0,0 +1,48 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import data_manager
+import database_init
+
+
+class DatabaseTestSetUp(unittest.TestCase):
+    """
+    Creates primary and results databases in temporary directory, which is removed after each test
+    (after DataManagers are closed and other cleanups are done).
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.primary_db_path = os.path.join(self.tmp_dir, "primary.db")
+        self.results_db_path = os.path.join(self.tmp_dir, "results.db")
+        database_init.init(self.primary_db_path, self.results_db_path)
+        self._data_managers = list()
+
+    def tearDown(self):
+        for manager in self._data_managers:
+            manager.close()
+
+    def create_data_manager(self, **kwargs):
+        """
+        :param: kwargs - other DataManager parameters, e.g. shared_state or pool_size
+        :return: DataManager of the temporary databases, closed after the test
+        """
+        manager = data_manager.DataManager(primary_db_path=self.primary_db_path,
+                                           result_db_path=self.results_db_path,
+                                           bug_files_path=self.tmp_dir,
+                                           open_questions_files_path=self.tmp_dir,
+                                           closed_questions_files_path=self.tmp_dir,
+                                           **kwargs)
+        self._data_managers.append(manager)
+        return manager
+
+
+class DataManagerTestSetUp(DatabaseTestSetUp):
+    """
+    DatabaseTestSetUp with DataManager of the databases in self.data_manager.
+    """
+    def setUp(self):
+        super(DataManagerTestSetUp, self).setUp()
+        self.data_manager = self.create_data_manager()
@@ -0,0 +1,66 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import database_init
+
+
+class DatabaseInitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.primary_db_path = os.path.join(self.tmp_dir, "primary.db")
+        self.results_db_path = os.path.join(self.tmp_dir, "results.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _query(self, db_path, query):
+        connection = sqlite3.connect(db_path)
+        try:
+            return connection.execute(query).fetchall()
+        finally:
+            connection.close()
+
+    def _create_legacy_primary_db(self, bug_guids):
+        connection = sqlite3.connect(self.primary_db_path)
+        connection.execute("CREATE TABLE BUGS (ID INT,BUG_GUID TEXT,CREATED_DATE_TIME DATETIME,TEAM_ID TEXT, BUG_CONTENT TEXT)")
+        for number, bug_guid in enumerate(bug_guids):
+            connection.execute("INSERT INTO BUGS VALUES(?, ?, '10:00:00', 'AAA', 'content')", (number, bug_guid))
+        connection.commit()
+        connection.close()
+
+    def test_init_creates_latest_schema(self):
+        database_init.init(self.primary_db_path, self.results_db_path)
+        database_init.init(self.primary_db_path, self.results_db_path)
+
+        primary_version = self._query(self.primary_db_path, "PRAGMA user_version")[0][0]
+        results_version = self._query(self.results_db_path, "PRAGMA user_version")[0][0]
+        assert primary_version == len(database_init.PRIMARY_MIGRATIONS), \
+            "Expected version: {0}, actual: {1}".format(len(database_init.PRIMARY_MIGRATIONS), primary_version)
+        assert results_version == len(database_init.RESULTS_MIGRATIONS), \
+            "Expected version: {0}, actual: {1}".format(len(database_init.RESULTS_MIGRATIONS), results_version)
+
+    def test_existing_database_upgraded_in_place(self):
+        self._create_legacy_primary_db(["guid_1", "guid_2"])
+
+        database_init.init(self.primary_db_path, self.results_db_path)
+
+        indexes = [row[0] for row in self._query(self.primary_db_path, "SELECT name FROM sqlite_master WHERE type = 'index'")]
+        assert "BUGS_BUG_GUID_IDX" in indexes, "Expected BUGS_BUG_GUID_IDX in: {0}".format(indexes)
+        bugs = self._query(self.primary_db_path, "SELECT COUNT(*) FROM BUGS")[0][0]
+        assert bugs == 2, "Expected 2 bugs, actual: {0}".format(bugs)
+
+    def test_failed_migration_keeps_previous_version(self):
+        self._create_legacy_primary_db(["guid_1", "guid_1"])
+
+        self.assertRaises(Exception, database_init.init, self.primary_db_path, self.results_db_path)
+
+        primary_version = self._query(self.primary_db_path, "PRAGMA user_version")[0][0]
+        assert primary_version == 0, "Expected version: 0, actual: {0}".format(primary_version)
+
+
+if __name__ == "__main__":
+    unittest.main()
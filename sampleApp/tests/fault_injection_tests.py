@@ -0,0 +1,84 @@
+import random
+import threading
+import time
+import unittest
+
+import fault_injection
+
+
+class FaultInjectionTests(unittest.TestCase):
+
+    def test_delay_distributions(self):
+        random_generator = random.Random(1)
+        fixed = fault_injection.FaultRule(delay="fixed", seconds=2)
+        uniform = fault_injection.FaultRule(delay="uniform", min_seconds=1, max_seconds=3)
+        exponential = fault_injection.FaultRule(delay="exponential", mean_seconds=2)
+
+        assert fixed.get_delay(random_generator) == 2, "Fixed delay should be 2s"
+        delays = [uniform.get_delay(random_generator) for _ in range(1000)]
+        assert all(1 <= delay <= 3 for delay in delays), "Uniform delay should be between 1s and 3s"
+        mean = sum(exponential.get_delay(random_generator) for _ in range(10000)) / 10000
+        assert 1.8 < mean < 2.2, "Mean of exponential delay should be about 2s, actual: {0}".format(mean)
+
+    def test_error_rate(self):
+        injector = fault_injection.FaultInjector({"enabled": True,
+                                                  "routes": {"send_bug": {"error_rate": 0.25, "error_code": 503}}},
+                                                 random_generator=random.Random(1))
+        responses = [injector.apply("send_bug") for _ in range(4000)]
+        errors = [response for response in responses if response is not None]
+
+        assert 800 < len(errors) < 1200, "Expected about 1000 errors, actual: {0}".format(len(errors))
+        assert all(code == 503 for _, code in errors), "Expected 503 responses"
+        assert injector.apply("index") is None, "Endpoint without rule should not fail"
+
+    def test_rules_changed_at_runtime(self):
+        injector = fault_injection.FaultInjector({"enabled": True, "routes": {"send_bug": {"error_rate": 1}}})
+        assert injector.apply("send_bug") is not None, "Request should fail"
+
+        injector.set_rule("send_bug", None)
+        injector.set_rule("results", {"error_rate": 1})
+
+        assert injector.apply("send_bug") is None, "Rule should be removed"
+        assert injector.apply("results") is not None, "Rule should be added"
+        self.assertRaises(ValueError, injector.set_rule, "results", {"delay": "normal"})
+
+    def test_delays_above_limit_queued(self):
+        injector = fault_injection.FaultInjector({"enabled": True, "max_delayed_requests": 2,
+                                                  "routes": {"send_bug": {"delay": "fixed", "seconds": 0.3}}})
+        responses = list()
+        threads = [threading.Thread(target=lambda: responses.append(injector.apply("send_bug"))) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+
+        start = time.time()
+        response = injector.apply("send_bug")
+        elapsed = time.time() - start
+        for thread in threads:
+            thread.join()
+
+        assert response is None, "Request above the limit should be processed: {0}".format(response)
+        assert elapsed >= 0.45, "Request above the limit should wait for free slot, actual: {0}s".format(elapsed)
+        assert responses == [None, None], "Delayed requests should be processed: {0}".format(responses)
+        config = injector.get_config()
+        assert config["delayed_requests"] == 3, "Expected 3 delayed requests: {0}".format(config)
+        assert config["queued_delays"] == 1, "Expected 1 queued delay: {0}".format(config)
+
+    def test_counters_updated_by_parallel_requests(self):
+        injector = fault_injection.FaultInjector({"enabled": True, "routes": {"send_bug": {"error_rate": 1}}})
+
+        def send_bugs():
+            for _ in range(1000):
+                injector.apply("send_bug")
+
+        threads = [threading.Thread(target=send_bugs) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        failed_requests = injector.get_config()["failed_requests"]
+        assert failed_requests == 8000, "Expected 8000 failed requests, actual: {0}".format(failed_requests)
+
+if __name__ == "__main__":
+    unittest.main()
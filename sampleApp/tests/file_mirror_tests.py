@@ -0,0 +1,38 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import file_mirror
+
+
+class FileMirrorTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_queued_files_written_on_close(self):
+        mirror = file_mirror.FileMirror(max_queue_size=2, batch_size=10)
+        for number in range(20):
+            mirror.write(self.tmp_dir, "{0}.txt".format(number), b"content")
+        mirror.close()
+
+        files = os.listdir(self.tmp_dir)
+        assert len(files) == 20, "Expected 20 files, actual: {0}".format(len(files))
+        stats = mirror.get_stats()
+        assert stats["written_files"] == 20, "Expected 20 written files, actual: {0}".format(stats["written_files"])
+
+    def test_files_sharded_by_guid(self):
+        mirror = file_mirror.FileMirror(shard_directories=True)
+        mirror.write(self.tmp_dir, "bug.txt", b"content", shard_key="ab12cd")
+        mirror.close()
+
+        file_path = os.path.join(self.tmp_dir, "ab", "bug.txt")
+        assert os.path.isfile(file_path), "Expected file: {0}".format(file_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import sqlite3
+import unittest
+
+import yaml
+
+import common
+import data_manager_setup
+import generate_data
+
+
+class GenerateDataTests(data_manager_setup.DatabaseTestSetUp):
+
+    def setUp(self):
+        super(GenerateDataTests, self).setUp()
+        self.team_list_path = os.path.join(self.tmp_dir, "team_list.yaml")
+        self.question_list_path = os.path.join(self.tmp_dir, "question_list.yaml")
+
+    def _generate(self, **kwargs):
+        return generate_data.generate(self.primary_db_path, self.results_db_path, self.team_list_path,
+                                      self.question_list_path, chunk_size=100, seed=1, **kwargs)
+
+    def test_team_ids_unique(self):
+        team_ids = generate_data.generate_team_ids(20000)
+
+        assert len(set(team_ids)) == 20000, "Team IDs are not unique"
+        assert team_ids[:2] == ["AAA", "AAB"], "Unexpected first team IDs: {0}".format(team_ids[:2])
+
+    def test_config_files_loaded_by_service(self):
+        self._generate(number_of_teams=30, number_of_questions=40, number_of_bugs=0, number_of_answers=0)
+
+        with open(self.team_list_path) as team_file:
+            teams = yaml.safe_load(team_file)["teams"]
+        questions = common.YamlConfigFileLoader(self.question_list_path,
+                                                index_builder=common.build_question_index).get_index()
+        assert len(teams) == 30, "Expected 30 teams, actual: {0}".format(len(teams))
+        assert len(questions.questions_by_id) == 40, "Expected 40 questions"
+
+    def test_rows_generated_with_skewed_activity(self):
+        stats = self._generate(number_of_teams=10, number_of_questions=10, number_of_bugs=300, number_of_answers=1000,
+                               marked_rate=0.5)
+
+        connection = sqlite3.connect(self.primary_db_path)
+        answers_per_team = connection.execute("SELECT TEAM_ID, COUNT(*) FROM ANSWERS GROUP BY TEAM_ID "
+                                              "ORDER BY COUNT(*) DESC").fetchall()
+        number_of_bugs = connection.execute("SELECT COUNT(*) FROM BUGS").fetchone()[0]
+        connection.close()
+        connection = sqlite3.connect(self.results_db_path)
+        marked_bugs = connection.execute("SELECT COUNT(*) FROM RESULTS WHERE BUG_ID != 'NULL'").fetchone()[0]
+        connection.close()
+        assert number_of_bugs == 300, "Expected 300 bugs, actual: {0}".format(number_of_bugs)
+        assert sum(count for _, count in answers_per_team) == 1000, "Expected 1000 answers"
+        assert answers_per_team[0][0] == "AAA", "First team should be most active: {0}".format(answers_per_team)
+        assert 0 < marked_bugs < 300, "Part of bugs should be marked, actual: {0}".format(marked_bugs)
+        assert stats["results"] > marked_bugs, "Closed answers should have results"
+
+    def test_generated_results_match_grading(self):
+        self._generate(number_of_teams=5, number_of_questions=8, number_of_bugs=10, number_of_answers=300,
+                       quickest_answer_bonus=0.2)
+        manager = self.create_data_manager()
+        questions = common.YamlConfigFileLoader(self.question_list_path,
+                                                index_builder=common.build_question_index).get_index()
+
+        stats = manager.recompute_results(questions.grading_engine, quickest_answer_bonus=0.2)
+
+        assert stats["changed_rows"] == 0, "Generated results differ from grading: {0}".format(stats)
+        assert stats["inserted_rows"] == 0, "Closed answers without results: {0}".format(stats)
+
+    def _get_index_names(self, db_path):
+        connection = sqlite3.connect(db_path)
+        names = set(row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'"))
+        connection.close()
+        return names
+
+    def test_non_empty_database_rejected(self):
+        self._generate(number_of_teams=5, number_of_questions=5, number_of_bugs=10, number_of_answers=10)
+        indexes = self._get_index_names(self.primary_db_path)
+
+        with self.assertRaises(Exception):
+            self._generate(number_of_teams=5, number_of_questions=5, number_of_bugs=10, number_of_answers=10)
+
+        connection = sqlite3.connect(self.primary_db_path)
+        number_of_bugs = connection.execute("SELECT COUNT(*) FROM BUGS").fetchone()[0]
+        connection.close()
+        assert number_of_bugs == 10, "Rows should not be added, actual number of bugs: {0}".format(number_of_bugs)
+        assert self._get_index_names(self.primary_db_path) == indexes, "Indexes should not change"
+
+    def test_failed_load_rolled_back_with_indexes(self):
+        def failing_answer_rows(row_generator, number, total):
+            if number == 150:
+                raise ValueError("generator failed")
+            return original_answer_rows(row_generator, number, total)
+
+        original_answer_rows = generate_data.RowGenerator.answer_rows
+        generate_data.RowGenerator.answer_rows = failing_answer_rows
+        try:
+            with self.assertRaises(ValueError):
+                self._generate(number_of_teams=5, number_of_questions=5, number_of_bugs=10, number_of_answers=300)
+        finally:
+            generate_data.RowGenerator.answer_rows = original_answer_rows
+
+        connection = sqlite3.connect(self.primary_db_path)
+        number_of_rows = connection.execute("SELECT (SELECT COUNT(*) FROM BUGS) + (SELECT COUNT(*) FROM ANSWERS)").fetchone()[0]
+        connection.close()
+        assert number_of_rows == 0, "Failed load should be rolled back, actual rows: {0}".format(number_of_rows)
+        assert "BUGS_BUG_GUID_IDX" in self._get_index_names(self.primary_db_path), "Indexes should be restored"
+        assert "RESULTS_QUESTION_GUID_UNIQUE_IDX" in self._get_index_names(self.results_db_path), \
+            "Indexes should be restored"
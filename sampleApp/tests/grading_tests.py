@@ -0,0 +1,93 @@
+import itertools
+import unittest
+
+import common
+import data_manager_setup
+import grading
+
+
+QUESTIONS = {
+    1: {"id": 1, "type": "closed", "answer": "A", "points": 1},
+    2: {"id": 2, "type": "closed", "answer": "B D", "points": 2},
+    3: {"id": 3, "type": "open", "points": 3},
+}
+
+
+class GradingTests(unittest.TestCase):
+
+    def test_same_result_as_is_question_correct(self):
+        engine = grading.GradingEngine(QUESTIONS)
+        words = ["A", "b", "D", " ", "", "c"]
+        for question_id in (1, 2):
+            for number_of_words in range(1, 4):
+                for answer_words in itertools.product(words, repeat=number_of_words):
+                    answer = " ".join(answer_words)
+                    expected = common.is_question_correct(question_id, answer, QUESTIONS)
+                    actual = engine.is_correct(question_id, answer)
+                    assert actual == expected, "Question {0}, answer '{1}': expected {2}, actual {3}".format(
+                        question_id, answer, expected, actual)
+
+    def test_grade_many(self):
+        engine = grading.GradingEngine(QUESTIONS)
+
+        grades = engine.grade_many([(1, "a"), ("2", b"d  b"), ("2", b"D B"), (3, "x"), (4, "A")])
+
+        assert grades == [(True, 1), (False, 0), (True, 2), (False, 0), (False, 0)], "Unexpected grades: {0}".format(grades)
+
+
+class RescoreTests(data_manager_setup.DataManagerTestSetUp):
+
+    def _answer(self, engine, team_id, question_id, answer):
+        _, _, _, _, question_guid = self.data_manager.add_answer(team_id, question_id, answer, add_to_file=False,
+                                                                 open_question=False)
+        _, points = engine.grade(question_id, answer)
+        self.data_manager.insert_answer_result(team_id, question_id, question_guid, points=points)
+
+    def test_recompute_after_answer_key_fix(self):
+        engine = grading.GradingEngine(QUESTIONS)
+        self._answer(engine, "AAA", "1", u"A")
+        self._answer(engine, "BBB", "1", u"C")
+        self._answer(engine, "BBB", "2", u"D B")
+        fixed_questions = dict(QUESTIONS)
+        fixed_questions[1] = {"id": 1, "type": "closed", "answer": "C", "points": 1}
+
+        stats = self.data_manager.recompute_results(grading.GradingEngine(fixed_questions), batch_size=2)
+
+        assert stats["changed_rows"] == 2, "Expected 2 changed rows, actual: {0}".format(stats["changed_rows"])
+        points = self.data_manager.get_points_per_team()
+        assert points == {"AAA": 0.0, "BBB": 3.0}, "Unexpected points: {0}".format(points)
+        assert self.data_manager.scoreboard.get_points("BBB") == 3.0, "Scoreboard should be reloaded"
+
+    def test_bonus_for_first_correct_answer(self):
+        engine = grading.GradingEngine(QUESTIONS)
+        self._answer(engine, "AAA", "2", u"B C")
+        self._answer(engine, "BBB", "2", u"B D")
+        self._answer(engine, "CCC", "2", u"D B")
+        # answer without result is graded as well
+        self.data_manager.add_answer("DDD", "1", u"A", add_to_file=False, open_question=False)
+
+        stats = self.data_manager.recompute_results(engine, quickest_answer_bonus=0.5)
+
+        assert stats["correct_answers"] == 3, "Expected 3 correct answers, actual: {0}".format(stats["correct_answers"])
+        assert stats["inserted_rows"] == 1, "Expected 1 inserted row, actual: {0}".format(stats["inserted_rows"])
+        points = self.data_manager.get_points_per_team()
+        assert points == {"AAA": 0.0, "BBB": 3.0, "CCC": 2.0, "DDD": 1.5}, "Unexpected points: {0}".format(points)
+
+        stats = self.data_manager.recompute_results(engine, quickest_answer_bonus=0.5)
+
+        assert stats["changed_rows"] == 0, "Second recompute should not change results"
+
+    def test_recompute_with_single_connection_pool(self):
+        self.data_manager.close()
+        self.data_manager = self.create_data_manager(pool_size=1)
+        engine = grading.GradingEngine(QUESTIONS)
+        self._answer(engine, "AAA", "1", u"A")
+        self._answer(engine, "BBB", "1", u"A")
+
+        stats = self.data_manager.recompute_results(engine, quickest_answer_bonus=0.5, batch_size=1)
+
+        assert stats["changed_rows"] == 1, "Expected 1 changed row, actual: {0}".format(stats["changed_rows"])
+        assert self.data_manager.scoreboard.get_points("AAA") == 1.5, "Scoreboard should be reloaded"
+
+if __name__ == "__main__":
+    unittest.main()
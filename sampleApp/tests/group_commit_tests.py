@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import connection_pool
+import data_manager_setup
+import group_commit_writer
+
+
+class GroupCommitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.pool = connection_pool.ConnectionPool(os.path.join(self.tmp_dir, "primary.db"), pool_size=4)
+        with self.pool.connection() as connection:
+            connection.execute("CREATE TABLE BUGS (ID INT, BUG_GUID TEXT UNIQUE)")
+        self.writer = group_commit_writer.GroupCommitWriter(self.pool, flush_interval=0.01, max_batch_rows=50)
+
+    def tearDown(self):
+        self.writer.close()
+        self.pool.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def _count_bugs(self):
+        with self.pool.connection() as connection:
+            return connection.execute("SELECT COUNT(*) FROM BUGS").fetchone()[0]
+
+    def test_concurrent_inserts_are_committed(self):
+        query = "INSERT INTO BUGS (ID, BUG_GUID) VALUES(?, ?)"
+
+        def insert_bugs(thread_number):
+            for bug_number in range(25):
+                self.writer.execute(query, (bug_number, "{0}_{1}".format(thread_number, bug_number)))
+
+        threads = [threading.Thread(target=insert_bugs, args=(number,)) for number in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert self._count_bugs() == 200, "Expected 200 bugs, actual: {0}".format(self._count_bugs())
+        assert self.writer.flushed_batches < 200, "Rows should be committed in groups"
+
+    def test_failed_row_does_not_fail_batch(self):
+        query = "INSERT INTO BUGS (ID, BUG_GUID) VALUES(?, ?)"
+        futures = [self.writer.submit(query, (1, "guid_1")),
+                   self.writer.submit(query, (2, "guid_1")),
+                   self.writer.submit(query, (3, "guid_3"))]
+
+        assert futures[0].result() == [], "First row should be committed"
+        self.assertRaises(Exception, futures[1].result)
+        assert futures[2].result() == [], "Third row should be committed"
+        assert self._count_bugs() == 2, "Expected 2 bugs, actual: {0}".format(self._count_bugs())
+
+
+class GroupCommitDataManagerTests(data_manager_setup.DatabaseTestSetUp):
+
+    def test_data_manager_commits_durably(self):
+        manager = self.create_data_manager(pragmas={"journal_mode": "WAL", "synchronous": "NORMAL"},
+                                           group_commit_config={"enabled": True})
+        with manager._primary_pool.connection() as connection:
+            synchronous = connection.execute("PRAGMA synchronous").fetchone()[0]
+
+        assert synchronous == 2, "Expected synchronous FULL (2), actual: {0}".format(synchronous)
+
+
+if __name__ == "__main__":
+    unittest.main()
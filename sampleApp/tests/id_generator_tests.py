@@ -0,0 +1,46 @@
+import threading
+import time
+import unittest
+
+import id_generator
+
+
+class IdGeneratorTests(unittest.TestCase):
+
+    def test_ids_unique_and_sorted_in_parallel(self):
+        generator = id_generator.IdGenerator(worker_id=1)
+        ids_per_thread = list()
+
+        def generate():
+            ids = [generator.next_id() for _ in range(5000)]
+            ids_per_thread.append(ids)
+
+        threads = [threading.Thread(target=generate) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        all_ids = [generated_id for ids in ids_per_thread for generated_id in ids]
+        assert len(set(all_ids)) == 40000, "Expected 40000 unique IDs, actual: {0}".format(len(set(all_ids)))
+        for ids in ids_per_thread:
+            assert ids == sorted(ids), "IDs of one thread should grow"
+
+    def test_id_time_and_worker(self):
+        before = time.time()
+        first_id = id_generator.IdGenerator(worker_id=1).next_id()
+        second_id = id_generator.IdGenerator(worker_id=2).next_id()
+
+        assert first_id != second_id, "IDs of different workers should differ"
+        assert abs(id_generator.get_id_time(first_id) - before) < 1, "ID should contain time of creation"
+
+    def test_timestamps_do_not_go_back(self):
+        generator = id_generator.IdGenerator()
+        timestamps = [generator.timestamp_us() for _ in range(1000)]
+
+        assert timestamps == sorted(timestamps), "Timestamps should not go back"
+        assert abs(timestamps[0] / 1000000.0 - time.time()) < 1, "Timestamp should be in microseconds"
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import io
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+import logger
+
+
+class LoggerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.log_file_name = os.path.join(self.tmp_dir, "runner.log")
+        self.root_level = logging.getLogger().level
+
+    def tearDown(self):
+        logger._stop_listeners()
+        logger._query_log_sample_rate = 1
+        logger._query_log_max_length = None
+        logging.getLogger().setLevel(self.root_level)
+        shutil.rmtree(self.tmp_dir)
+
+    def _read_log(self):
+        # stopping listeners writes all queued records
+        logger._stop_listeners()
+        with io.open(self.log_file_name, encoding='utf-8') as log_file:
+            return log_file.read()
+
+    def test_records_written_by_listener(self):
+        logger.basicConfig(self.log_file_name, logging.DEBUG, '%(message)s', False)
+        logger.info(u"zażółć")
+        logger.console(u"console message")
+
+        content = self._read_log()
+
+        assert u"zażółć" in content, "Expected message in log: {0}".format(content)
+        assert u"console message" in content, "Expected console message in log: {0}".format(content)
+        assert "logger_tests.test_records_written_by_listener()" in content, \
+            "Expected caller info in log: {0}".format(content)
+
+    def test_lazy_message_not_built_when_level_disabled(self):
+        logger.basicConfig(self.log_file_name, logging.INFO, '%(message)s', False)
+        calls = list()
+        logger.debug(lambda: calls.append(True) or "debug message")
+
+        content = self._read_log()
+
+        assert not calls, "Message should not be built"
+        assert "debug message" not in content, "Unexpected message in log: {0}".format(content)
+
+    def test_query_log_sampled_and_truncated(self):
+        logger.basicConfig(self.log_file_name, logging.DEBUG, '%(message)s', False,
+                           query_log_sample_rate=2, query_log_max_length=10)
+        for number in range(10):
+            logger.query("SELECT {0}".format(number), "x" * 100)
+
+        lines = [line for line in self._read_log().splitlines() if "query:" in line]
+
+        assert len(lines) == 5, "Expected 5 logged queries, actual: {0}".format(len(lines))
+        assert all(line.endswith("x" * 10 + "... (100 characters)") for line in lines), \
+            "Expected truncated responses: {0}".format(lines)
+
+    def test_console_arguments_formatted_by_listener(self):
+        logger.basicConfig(self.log_file_name, logging.INFO, '%(message)s', False)
+        queue_handler = logging.getLogger('CONSOLE').handlers[-1]
+        record = logging.LogRecord('CONSOLE', logging.INFO, __file__, 1, u"message: %s", ("argument",), None)
+
+        assert queue_handler.prepare(record).args == ("argument",), "Arguments should be formatted by listener thread"
+        logger.console(u"console message: %s", "argument")
+        assert u"console message: argument" in self._read_log(), "Expected formatted console message"
+
+    def test_only_logged_rows_converted_to_text(self):
+        logger.basicConfig(self.log_file_name, logging.DEBUG, '%(message)s', False, query_log_max_length=20)
+        converted = list()
+
+        class Row(object):
+            def __repr__(self):
+                converted.append(True)
+                return "(1, 'row')"
+
+        logger.query("SELECT 1", [Row() for _ in range(1000)])
+
+        lines = [line for line in self._read_log().splitlines() if "query:" in line]
+        assert len(converted) < 10, "Expected only first rows converted, actual: {0}".format(len(converted))
+        assert lines[0].endswith("... (1000 rows)"), "Expected number of rows in log: {0}".format(lines)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import threading
+import unittest
+
+import data_manager_setup
+import metrics
+
+
+class MetricsTests(unittest.TestCase):
+
+    def test_counters_of_all_threads_summed(self):
+        counter = metrics.Counter("requests_total", "Requests.", ("endpoint",))
+
+        def count():
+            for _ in range(1000):
+                counter.inc(("index",))
+        threads = [threading.Thread(target=count) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counter.inc(("results",), 5)
+
+        assert counter.collect() == {("index",): [8000], ("results",): [5]}, \
+            "Unexpected values: {0}".format(counter.collect())
+        assert len(counter._shards) == 1, "Shards of finished threads should be merged"
+
+    def test_histogram_rendered_with_cumulative_buckets(self):
+        histogram = metrics.Histogram("latency_seconds", "Latency.", ("endpoint",), buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 2):
+            histogram.observe(value, ("index",))
+
+        lines = histogram.render()
+
+        assert lines == ['# HELP latency_seconds Latency.',
+                         '# TYPE latency_seconds histogram',
+                         'latency_seconds_bucket{endpoint="index",le="0.1"} 2',
+                         'latency_seconds_bucket{endpoint="index",le="1"} 3',
+                         'latency_seconds_bucket{endpoint="index",le="+Inf"} 4',
+                         'latency_seconds_sum{endpoint="index"} 2.65',
+                         'latency_seconds_count{endpoint="index"} 4'], "Unexpected lines: {0}".format(lines)
+
+    def test_statement_label(self):
+        assert metrics.get_statement_label("SELECT * FROM RESULTS WHERE ID = ?") == "SELECT RESULTS"
+        assert metrics.get_statement_label("INSERT INTO BUGS (ID) VALUES(?)") == "INSERT BUGS"
+        assert metrics.get_statement_label("UPDATE RESULTS SET BASE_POINTS = ?") == "UPDATE RESULTS"
+        assert metrics.get_statement_label("PRAGMA user_version") == "PRAGMA"
+
+
+class DataManagerMetricsTests(data_manager_setup.DatabaseTestSetUp):
+
+    def test_queries_and_file_writes_measured(self):
+        service_metrics = metrics.Metrics()
+        manager = self.create_data_manager(metrics=service_metrics)
+        manager.add_bug("AAA", "bug")
+        manager.get_bugs()
+        manager.close()
+
+        text = service_metrics.render()
+
+        assert 'sampleapp_db_queries_total{database="primary.db",statement="INSERT BUGS",failure="false"} 1' in text, \
+            "Insert should be counted: {0}".format(text)
+        assert 'sampleapp_db_query_rows_count{database="primary.db",statement="SELECT BUGS"} 1' in text, \
+            "Returned rows should be measured"
+        assert 'sampleapp_file_write_duration_seconds_count{kind="bug"} 1' in text, "File write should be measured"
+
+
+if __name__ == "__main__":
+    unittest.main()
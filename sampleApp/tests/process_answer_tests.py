@@ -0,0 +1,61 @@
+import sqlite3
+import unittest
+
+import common
+import data_manager_setup
+import service
+
+
+class ProcessAnswerTests(data_manager_setup.DatabaseTestSetUp):
+
+    def setUp(self):
+        super(ProcessAnswerTests, self).setUp()
+        context = service.app_context
+        self.data_manager = self.create_data_manager()
+        for name, value in (("data_manager", self.data_manager),
+                            ("answers_table", self.data_manager.get_answered_qestions()),
+                            ("first_correct_answers", self.data_manager.get_first_correct_answers()),
+                            ("rate_limiter", None),
+                            ("spam_table", common.SpamTable())):
+            self.addCleanup(setattr, context, name, getattr(context, name))
+            setattr(context, name, value)
+        self.team_ids = [team["id"] for team in context.team_loader.get_key("teams").values()]
+        question_index = context.question_loader.get_index()
+        self.question = [question for question in context.question_loader.get_key("questions").values()
+                         if question["id"] not in question_index.open_questions_ids][0]
+        self.bonuses = list()
+
+    def _fail_first_result(self, failure, response):
+        insert_answer_result = self.data_manager.insert_answer_result
+
+        def failing_insert_answer_result(team_id, question_id, question_guid, points=0, bonus_for_first=0):
+            self.bonuses.append(bonus_for_first)
+            if len(self.bonuses) == 1:
+                return failure, response
+            return insert_answer_result(team_id, question_id, question_guid, points=points,
+                                        bonus_for_first=bonus_for_first)
+        self.data_manager.insert_answer_result = failing_insert_answer_result
+
+    def _send_correct_answers(self):
+        for team_id in self.team_ids[:2]:
+            service.process_answer(team_id, self.question["id"], "closed", str(self.question["answer"]))
+
+    def test_bonus_given_again_after_failed_insert(self):
+        self._fail_first_result(True, None)
+
+        self._send_correct_answers()
+
+        assert self.bonuses[0] > 0 and self.bonuses[1] == self.bonuses[0], \
+            "Next correct answer should get the bonus: {0}".format(self.bonuses)
+
+    def test_bonus_given_again_after_database_error(self):
+        self._fail_first_result(False, sqlite3.OperationalError("database is locked"))
+
+        self._send_correct_answers()
+
+        assert self.bonuses[0] > 0 and self.bonuses[1] == self.bonuses[0], \
+            "Next correct answer should get the bonus: {0}".format(self.bonuses)
+
+
+if __name__ == "__main__":
+    unittest.main()
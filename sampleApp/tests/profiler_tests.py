@@ -0,0 +1,69 @@
+import threading
+import time
+import unittest
+
+import profiler
+
+
+def busy_function(seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        sum(range(100))
+
+
+class ProfilerTests(unittest.TestCase):
+
+    def test_invalid_options_rejected(self):
+        self.assertRaises(ValueError, profiler.ProfilingSession, mode="trace")
+        self.assertRaises(ValueError, profiler.ProfilingSession, seconds=profiler.MAX_SECONDS + 1)
+        self.assertRaises(ValueError, profiler.ProfilingSession, mode="cprofile", requests=0)
+
+    def test_cprofile_of_next_requests_with_sql_trace(self):
+        request_profiler = profiler.Profiler()
+        request_profiler.start(mode="cprofile", requests=2, seconds=10, trace_sql=True)
+
+        for _ in range(3):
+            request_profiler.start_request()
+            busy_function(0.01)
+            request_profiler.record_query("primary.db", "SELECT *\n  FROM BUGS", 0.001, [(1,), (2,)])
+            request_profiler.finish_request("get_bugs")
+        session = request_profiler.session
+
+        assert session.profiled_requests == 2, "Expected 2 profiled requests: {0}".format(session.profiled_requests)
+        assert not session.is_running(), "Session should end after 2 requests"
+        assert "busy_function" in session.get_top(10, "cumulative"), "Profiled function should be in report"
+        assert list(session.traces)[0]["queries"] == [{"database": "primary.db", "query": "SELECT * FROM BUGS",
+                                                      "seconds": 0.001, "rows": 2}], \
+            "Unexpected trace: {0}".format(session.traces)
+        self.assertRaises(ValueError, session.get_top, 10, "name")
+
+    def test_one_session_at_a_time(self):
+        request_profiler = profiler.Profiler()
+        request_profiler.start(mode="cprofile", requests=1)
+
+        self.assertRaises(RuntimeError, request_profiler.start, mode="sample")
+        request_profiler.stop()
+        request_profiler.start(mode="sample", seconds=1)
+        request_profiler.stop()
+
+    def test_sampler_collapses_stacks_of_request_threads(self):
+        request_profiler = profiler.Profiler()
+        request_profiler.start(mode="sample", seconds=10, interval=0.001)
+
+        def handle_request():
+            request_profiler.start_request()
+            busy_function(0.2)
+            request_profiler.finish_request("index")
+        thread = threading.Thread(target=handle_request, name="request-thread")
+        thread.start()
+        thread.join()
+        session = request_profiler.stop()
+
+        stacks = session.get_collapsed_stacks().splitlines()
+        assert stacks, "Stacks should be sampled"
+        assert all(stack.startswith("request-thread;") for stack in stacks), "Only request thread should be sampled"
+        assert any("busy_function (profiler_tests.py" in stack for stack in stacks), "Unexpected stacks: {0}".format(stacks)
+
+
+if __name__ == "__main__":
+    unittest.main()
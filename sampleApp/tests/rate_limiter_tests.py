@@ -0,0 +1,56 @@
+import threading
+import time
+import unittest
+
+import rate_limiter
+
+
+class RateLimiterTests(unittest.TestCase):
+
+    def test_burst_then_rejected(self):
+        limiter = rate_limiter.TokenBucketRateLimiter(requests_per_minute=60, burst=3)
+        accepted = [limiter.check("AAA") for _ in range(5)]
+
+        assert accepted == [True, True, True, False, False], "Unexpected decisions: {0}".format(accepted)
+        assert limiter.check("BBB"), "Other team should have own bucket"
+        assert limiter.get_rejected_requests() == {"AAA": 2}, \
+            "Unexpected rejected requests: {0}".format(limiter.get_rejected_requests())
+
+    def test_bucket_refilled(self):
+        limiter = rate_limiter.TokenBucketRateLimiter(requests_per_minute=600, burst=1)
+        assert limiter.check("AAA"), "First request should be accepted"
+        assert not limiter.check("AAA"), "Second request should be rejected"
+
+        time.sleep(0.15)
+
+        assert limiter.check("AAA"), "Request after refill should be accepted"
+
+    def test_memory_bounded(self):
+        limiter = rate_limiter.TokenBucketRateLimiter(requests_per_minute=60, burst=1, stripes=4, max_teams=100)
+        for team_number in range(1000):
+            limiter.check("team_{0}".format(team_number))
+
+        stats = limiter.get_stats()
+        assert stats["teams"] <= 100, "Expected at most 100 teams, actual: {0}".format(stats["teams"])
+        assert stats["evicted_teams"] >= 900, "Expected at least 900 evicted teams, actual: {0}".format(stats["evicted_teams"])
+
+    def test_parallel_requests_limited(self):
+        limiter = rate_limiter.TokenBucketRateLimiter(requests_per_minute=1, burst=10)
+        accepted = list()
+
+        def send():
+            for _ in range(10):
+                if limiter.check("AAA"):
+                    accepted.append(True)
+
+        threads = [threading.Thread(target=send) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(accepted) == 10, "Expected 10 accepted requests, actual: {0}".format(len(accepted))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import datetime
+import gzip
+import unittest
+
+from flask import Flask, request
+from werkzeug.http import http_date
+
+import response_cache
+
+
+class ResponseCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = response_cache.ResponseCache(gzip_min_size=100)
+        self.renders = list()
+        self.version = 1
+        self.app = Flask(__name__)
+
+        @self.app.route('/page')
+        def page():
+            entry = self.cache.get('page', self.version, self._render)
+            return self.cache.make_response(entry, request)
+        self.client = self.app.test_client()
+
+    def _render(self):
+        self.renders.append(self.version)
+        return u"version {0} ".format(self.version) * 50
+
+    def test_page_rendered_once_per_version(self):
+        first = self.client.get('/page')
+        second = self.client.get('/page')
+        self.version = 2
+        third = self.client.get('/page')
+
+        assert self.renders == [1, 2], "Page should be rendered once per version: {0}".format(self.renders)
+        assert first.data == second.data, "Cached page should be sent"
+        assert first.headers['ETag'] != third.headers['ETag'], "ETag should change with content"
+        assert self.cache.get_stats() == {"pages": 1, "hits": 1, "misses": 2}, "Unexpected stats"
+
+    def test_conditional_requests(self):
+        response = self.client.get('/page')
+
+        not_modified = self.client.get('/page', headers={'If-None-Match': response.headers['ETag']})
+        next_second = http_date(response.last_modified + datetime.timedelta(seconds=1))
+        not_modified_since = self.client.get('/page', headers={'If-Modified-Since': next_second})
+        same_second = self.client.get('/page', headers={'If-Modified-Since': response.headers['Last-Modified']})
+        self.version = 2
+        modified = self.client.get('/page', headers={'If-None-Match': response.headers['ETag']})
+
+        assert not_modified.status_code == 304 and not_modified.data == b"", "Expected 304 for matching ETag"
+        assert not_modified_since.status_code == 304, "Expected 304 for If-Modified-Since after page was rendered"
+        assert same_second.status_code == 200, "Page could change in the second of If-Modified-Since, expected 200"
+        assert modified.status_code == 200, "Expected new page after version change"
+
+    def test_gzip_variant(self):
+        response = self.client.get('/page', headers={'Accept-Encoding': 'gzip, deflate'})
+        plain = self.client.get('/page')
+
+        assert response.headers['Content-Encoding'] == 'gzip', "Expected compressed page"
+        assert gzip.decompress(response.data) == plain.data, "Compressed page should have the same content"
+        assert response.headers['ETag'] != plain.headers['ETag'], "Variants should have different ETags"
+        assert plain.headers['Vary'] == 'Accept-Encoding', "Expected Vary header"
+
+
+if __name__ == "__main__":
+    unittest.main()
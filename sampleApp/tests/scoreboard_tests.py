@@ -0,0 +1,44 @@
+import unittest
+
+import common
+import data_manager_setup
+
+
+class ScoreboardTests(data_manager_setup.DataManagerTestSetUp):
+
+    def setUp(self):
+        super(ScoreboardTests, self).setUp()
+        self.team_index = common.TeamIndex({"Team1": {"id": "AAA"}, "Team2": {"id": "BBB"}, "Team3": {"id": "CCC"}})
+
+    def test_ranking_updated_on_insert_and_update(self):
+        self.data_manager.insert_answer_result("AAA", "1", "guid_1", points=2)
+        self.data_manager.mark_bug("BBB", "NULL", "7", "bug_guid_1", "1", "0", "0", "0", u"")
+        self.data_manager.mark_bug("BBB", "NULL", "7", "bug_guid_1", "3", "1", "0", "0", u"")
+
+        ranking = self.data_manager.scoreboard.get_ranking(self.team_index)
+
+        assert ranking == [("Team2", 4.0), ("Team1", 2.0), ("Team3", 0.0)], "Unexpected ranking: {0}".format(ranking)
+
+    def test_scoreboard_matches_database_after_restart(self):
+        self.data_manager.insert_answer_result("AAA", "1", "guid_1", points=2)
+        self.data_manager.mark_bug("CCC", "NULL", "7", "bug_guid_1", "5", "0", "0", "1", u"")
+        expected_ranking = self.data_manager.scoreboard.get_ranking(self.team_index)
+        self.data_manager.close()
+
+        self.data_manager = self.create_data_manager()
+        ranking = self.data_manager.scoreboard.get_ranking(self.team_index)
+
+        assert ranking == expected_ranking, "Expected ranking: {0}, actual: {1}".format(expected_ranking, ranking)
+
+    def test_ranking_cached_until_points_change(self):
+        first_ranking = self.data_manager.scoreboard.get_ranking(self.team_index)
+        assert self.data_manager.scoreboard.get_ranking(self.team_index) is first_ranking, "Ranking should be cached"
+
+        self.data_manager.insert_answer_result("AAA", "1", "guid_1", points=1)
+
+        assert self.data_manager.scoreboard.get_ranking(self.team_index) is not first_ranking, \
+            "Ranking should be rebuilt after points change"
+
+
+if __name__ == "__main__":
+    unittest.main()
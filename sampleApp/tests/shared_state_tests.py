@@ -0,0 +1,119 @@
+import os
+import subprocess
+import sys
+import unittest
+
+import common
+import data_manager_setup
+import shared_state
+
+
+class SharedStateTests(data_manager_setup.DatabaseTestSetUp):
+
+    def setUp(self):
+        super(SharedStateTests, self).setUp()
+        self.shared_db_path = os.path.join(self.tmp_dir, "shared.db")
+        # each worker process has own SharedState and DataManager
+        self.shared_states = [self._create_shared_state(self.shared_db_path) for _ in range(2)]
+        self.data_managers = [self.create_data_manager(shared_state=state) for state in self.shared_states]
+
+    def _create_shared_state(self, db_path):
+        state = shared_state.SharedState(db_path)
+        # cleanups run after DataManagers are closed in tearDown
+        self.addCleanup(state.close)
+        return state
+
+    def test_question_answered_in_other_worker(self):
+        first_table = self.data_managers[0].get_answered_qestions()
+        second_table = self.data_managers[1].get_answered_qestions()
+
+        assert not common.check_if_was_answered("AAA", "1", first_table), "First answer should be accepted"
+        assert common.check_if_was_answered("AAA", "1", second_table), "Answer in other worker should be rejected"
+        assert not common.check_if_was_answered("BBB", "1", second_table), "Answer of other team should be accepted"
+
+    def test_answered_questions_seeded_from_database(self):
+        self.data_managers[0].add_answer("AAA", "2", u"A", add_to_file=False)
+        state = self._create_shared_state(os.path.join(self.tmp_dir, "new_shared.db"))
+        manager = self.create_data_manager(shared_state=state)
+
+        assert ("AAA", "2") in manager.get_answered_qestions(), "Question 2 should be answered by AAA"
+
+    def test_first_correct_answer_in_other_worker(self):
+        first_index = shared_state.SharedFirstCorrectAnswerIndex(self.shared_states[0])
+        second_index = shared_state.SharedFirstCorrectAnswerIndex(self.shared_states[1])
+
+        assert not first_index.check_and_add(5), "First correct answer should get bonus"
+        assert second_index.check_and_add(5), "Correct answer in other worker should not get bonus"
+
+        second_index.reset([7])
+
+        assert 5 not in first_index and 7 in first_index, "Reset should replace questions in all workers"
+
+        first_index.discard(7)
+
+        assert not second_index.check_and_add(7), "Discarded question should get bonus in other worker"
+
+    def test_spam_detected_in_other_worker(self):
+        first_table = shared_state.SharedSpamTable(self.shared_states[0])
+        second_table = shared_state.SharedSpamTable(self.shared_states[1])
+
+        assert not common.check_if_spam("AAA", first_table, seconds=60), "First request should be accepted"
+        assert common.check_if_spam("AAA", second_table, seconds=60), "Request in other worker should be a spam"
+        assert not common.check_if_spam("AAA", second_table, seconds=0), "Request after delay should be accepted"
+
+    def test_rate_limit_shared_by_workers(self):
+        limiters = [shared_state.SharedRateLimiter(state, requests_per_minute=1, burst=2) for state in self.shared_states]
+
+        accepted = [limiters[number % 2].check("AAA") for number in range(4)]
+
+        assert accepted == [True, True, False, False], "Unexpected decisions: {0}".format(accepted)
+        assert limiters[0].get_rejected_requests() == {"AAA": 2}, \
+            "Unexpected rejected requests: {0}".format(limiters[0].get_rejected_requests())
+
+    def test_points_from_other_worker_visible_in_results(self):
+        team_index = common.TeamIndex({"Team1": {"id": "AAA"}, "Team2": {"id": "BBB"}})
+        self.data_managers[1].refresh_scoreboard().get_ranking(team_index)
+
+        self.data_managers[0].insert_answer_result("BBB", "1", "guid_1", points=2)
+        ranking = self.data_managers[1].refresh_scoreboard().get_ranking(team_index)
+
+        assert ranking == [("Team2", 2.0), ("Team1", 0.0)], "Unexpected ranking: {0}".format(ranking)
+
+    def test_worker_ids_unique(self):
+        worker_ids = [manager._id_generator.worker_id for manager in self.data_managers]
+
+        assert worker_ids == [0, 1], "Unexpected worker IDs: {0}".format(worker_ids)
+
+    def test_stale_state_rebuilt_when_no_worker_is_running(self):
+        for manager in self.data_managers:
+            manager.close()
+        # rows left by previous run, e.g. before databases were reset
+        self.shared_states[0].add_answered_questions({"AAA": {"1"}})
+        self.shared_states[0].add_first_correct_answers(["1"])
+        self.data_managers = [self.create_data_manager(shared_state=self.shared_states[0])]
+
+        assert ("AAA", "1") not in self.data_managers[0].get_answered_qestions(), "Stale answer should be removed"
+        assert "1" not in self.data_managers[0].get_first_correct_answers(), "Stale correct answer should be removed"
+
+    def test_state_kept_when_worker_restarts(self):
+        self.data_managers[0].get_answered_qestions().check_and_add("AAA", "1")
+        self.data_managers.pop().close()
+        self.data_managers.append(self.create_data_manager(shared_state=self.shared_states[1]))
+
+        assert ("AAA", "1") in self.data_managers[1].get_answered_qestions(), "Answer of running worker should be kept"
+        assert self.data_managers[1]._id_generator.worker_id == 1, "Worker ID of stopped worker should be reused"
+
+    def test_worker_id_of_finished_process_reused(self):
+        self.data_managers.pop().close()
+        process = subprocess.Popen([sys.executable, "-c", "pass"])
+        process.wait()
+        with self.shared_states[0]._pool.connection() as connection:
+            connection.execute("INSERT INTO WORKERS VALUES (1, ?, 0)", (process.pid,))
+            connection.commit()
+        self.data_managers.append(self.create_data_manager(shared_state=self.shared_states[1]))
+
+        assert self.data_managers[1]._id_generator.worker_id == 1, "Worker ID of finished process should be reused"
+
+
+if __name__ == "__main__":
+    unittest.main()
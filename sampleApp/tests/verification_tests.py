@@ -0,0 +1,66 @@
+import unittest
+
+import data_manager_setup
+
+OPEN_QUESTION_IDS = frozenset([1, 2])
+
+
+class VerificationTests(data_manager_setup.DataManagerTestSetUp):
+
+    def setUp(self):
+        super(VerificationTests, self).setUp()
+        self.data_manager.add_bug("AAA", u"bug", add_to_file=False)
+        self.bug_guid = self.data_manager.get_bugs()[0][1]
+        self.answer_guids = dict()
+        for team_id, question_id in (("AAA", "1"), ("BBB", "1"), ("AAA", "2"), ("AAA", "3")):
+            question_guid = self.data_manager.add_answer(team_id, question_id, u"answer", add_to_file=False)[4]
+            self.answer_guids[(team_id, question_id)] = str(question_guid)
+
+    def _get_guids(self, already_checked, **kwargs):
+        answers = self.data_manager.get_verification_answers(OPEN_QUESTION_IDS, already_checked, **kwargs)
+        return [answer[2] for answer in answers]
+
+    def test_not_checked_answers_in_order_they_were_added(self):
+        guids = self._get_guids(False)
+
+        expected_guids = [self.bug_guid, self.answer_guids[("AAA", "1")], self.answer_guids[("BBB", "1")],
+                          self.answer_guids[("AAA", "2")]]
+        assert guids == expected_guids, "Unexpected answers: {0}".format(guids)
+        number_of_answers = self.data_manager.get_number_of_verification_answers(OPEN_QUESTION_IDS, False)
+        assert number_of_answers == 4, "Expected 4 answers, actual: {0}".format(number_of_answers)
+
+    def test_marked_answers_returned_with_marks(self):
+        self.data_manager.mark_bug("AAA", "1", "1", self.answer_guids[("AAA", "1")], "2", "0", "0", "0", u"ok")
+        self.data_manager.mark_question_answer("AAA", self.answer_guids[("AAA", "2")], "2", 3)
+
+        checked = self.data_manager.get_verification_answers(OPEN_QUESTION_IDS, True)
+        guids = self._get_guids(False)
+
+        assert [answer[2] for answer in checked] == [self.answer_guids[("AAA", "1")], self.answer_guids[("AAA", "2")]], \
+            "Unexpected checked answers: {0}".format(checked)
+        assert checked[0][6:10] == (2.0, 0.0, 0.0, 0.0), "Unexpected marks: {0}".format(checked[0][6:])
+        assert guids == [self.bug_guid, self.answer_guids[("BBB", "1")]], "Unexpected answers: {0}".format(guids)
+
+    def test_filters_applied(self):
+        team_guids = self._get_guids(False, team_id="AAA")
+        question_guids = self._get_guids(False, question_id="1")
+
+        assert team_guids == [self.bug_guid, self.answer_guids[("AAA", "1")], self.answer_guids[("AAA", "2")]], \
+            "Unexpected answers of team: {0}".format(team_guids)
+        assert question_guids == [self.answer_guids[("AAA", "1")], self.answer_guids[("BBB", "1")]], \
+            "Unexpected answers for question: {0}".format(question_guids)
+        number_of_answers = self.data_manager.get_number_of_verification_answers(OPEN_QUESTION_IDS, False,
+                                                                                 team_id="BBB", question_id="1")
+        assert number_of_answers == 1, "Expected 1 answer, actual: {0}".format(number_of_answers)
+
+    def test_page_of_answers(self):
+        guids = self._get_guids(False, limit=2, offset=1)
+        last_page_guids = self._get_guids(False, limit=2, offset=4)
+
+        assert guids == [self.answer_guids[("AAA", "1")], self.answer_guids[("BBB", "1")]], \
+            "Unexpected page: {0}".format(guids)
+        assert last_page_guids == [], "Page after the last answer should be empty"
+
+
+if __name__ == "__main__":
+    unittest.main()
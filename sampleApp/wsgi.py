@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Production entry point of the service.
+
+python wsgi.py - starts server configured in service_config.server section of config.yaml
+gunicorn -w 4 -b 0.0.0.0:5002 wsgi:application - set service_config.server.shared_state to True
+waitress-serve --port=5002 --threads=8 wsgi:application
+"""
+import os
+
+import yaml
+
+import common
+
+
+def load_settings():
+    config_path = common.get_config_path(os.path.dirname(__file__))
+    if os.path.exists(config_path) is False:
+        raise Exception("Missing configuration file:" + config_path)
+    with open(config_path, 'r') as stream:
+        return yaml.load(stream)
+
+
+def load_application():
+    """
+    Imports service, so AppContext (database connections and background threads) is created
+    in the process which handles requests, never in gunicorn master process.
+    """
+    import service
+    return service.app
+
+
+def __getattr__(name):
+    # 'application' is loaded on first use, e.g. by gunicorn worker
+    if name == 'application':
+        return load_application()
+    raise AttributeError("module '{0}' has no attribute '{1}'".format(__name__, name))
+
+
+def run_waitress(application, server_config, port):
+    try:
+        import waitress
+    except ImportError:
+        raise Exception("Server mode 'waitress' requires waitress package: pipenv install waitress")
+    waitress.serve(application, host=server_config["host"], port=port, threads=server_config["threads"])
+
+
+def run_gunicorn(server_config, port):
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise Exception("Server mode 'gunicorn' requires gunicorn package (Pipfile, not available on Windows): pipenv install")
+
+    class GunicornApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", "{0}:{1}".format(server_config["host"], port))
+            self.cfg.set("workers", server_config["workers"])
+            self.cfg.set("threads", server_config["threads"])
+            self.cfg.set("worker_class", server_config["worker_class"])
+            # each worker has to create own connections and background threads
+            self.cfg.set("preload_app", False)
+
+        def load(self):
+            return load_application()
+
+    GunicornApplication().run()
+
+
+def run(settings=None, application=None):
+    """
+    :param: settings - content of config.yaml, loaded if not given
+    :param: application - Flask app used by single process modes, imported if not given
+    """
+    if settings is None:
+        settings = load_settings()
+    if application is None and settings["service_config"]["server"]["mode"] != "gunicorn":
+        application = load_application()
+    server_config = settings["service_config"]["server"]
+    port = settings["service_config"]["port"]
+    if server_config["mode"] == "waitress":
+        run_waitress(application, server_config, port)
+    elif server_config["mode"] == "gunicorn":
+        run_gunicorn(server_config, port)
+    elif server_config["mode"] == "development":
+        application.run(host=server_config["host"], port=port, debug=server_config["debug"])
+    else:
+        raise Exception("Unknown server mode: {0}".format(server_config["mode"]))
+
+
+if __name__ == '__main__':
+    run()